@@ -1,7 +1,6 @@
 import openai
 import os
-import docx
-import PyPDF2
+from app.services.extraction_cache import document_pages
 
 # Set up Azure OpenAI API credentials
 openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
@@ -19,16 +18,8 @@ def read_document(file_path):
     Returns:
         str: The extracted text from the document.
     """
-    if file_path.endswith('.txt'):
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    elif file_path.endswith('.docx'):
-        doc = docx.Document(file_path)
-        return '\n'.join([para.text for para in doc.paragraphs])
-    elif file_path.endswith('.pdf'):
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            return '\n'.join([page.extract_text() for page in reader.pages])
+    if file_path.endswith(('.txt', '.docx', '.pdf')):
+        return '\n'.join(document_pages(file_path))
     else:
         raise ValueError("Unsupported file format. Please provide a .txt, .docx, or .pdf file.")
 
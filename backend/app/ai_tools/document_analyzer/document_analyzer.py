@@ -1,6 +1,8 @@
 import openai
 import os
 import json
+from app.utils.extraction import supported
+from app.services.extraction_cache import document_pages
 
 # Set up Azure OpenAI API credentials
 openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
@@ -24,14 +26,18 @@ def extract_topics(document_text):
 def analyze_document(file_path):
     print(f"Analyzing document at: {file_path}")
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            document_text = file.read()
-        print("Document read with UTF-8 encoding.")
-    except UnicodeDecodeError:
-        with open(file_path, 'r', encoding='latin-1') as file:
-            document_text = file.read()
-        print("Document read with Latin-1 encoding.")
+    if supported(file_path):
+        document_text = '\n'.join(document_pages(file_path))
+        print("Document read with the shared extractor.")
+    else:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                document_text = file.read()
+            print("Document read with UTF-8 encoding.")
+        except UnicodeDecodeError:
+            with open(file_path, 'r', encoding='latin-1') as file:
+                document_text = file.read()
+            print("Document read with Latin-1 encoding.")
 
     print(f"Document text: {document_text[:500]}...")  # Print the first 500 characters of the document text
 
@@ -14,4 +14,16 @@ import app.tasks.math_visualizer_tasks  # noqa: F401
 import app.tasks.visual_guide_tasks  # noqa: F401
 import app.tasks.doc_analysis_tasks  # noqa: F401
 import app.tasks.chrono_tasks  # noqa: F401
-import app.tasks.web_scraper_tasks  # noqa: F401
\ No newline at end of file
+import app.tasks.web_scraper_tasks  # noqa: F401
+import app.tasks.vault_tasks  # noqa: F401
+
+# Periodic tasks; they run only while a beat process is up next to the workers:
+#   celery -A app.celery_worker beat
+from celery.schedules import crontab  # noqa: E402
+
+celery_app.conf.beat_schedule = {
+    "purge-upload-sessions": {
+        "task": "app.tasks.vault_tasks.purge_upload_sessions",
+        "schedule": crontab(hour=3, minute=30),
+    },
+}
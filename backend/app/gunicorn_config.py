@@ -2,6 +2,9 @@ import os
 
 bind = "0.0.0.0:8000"
 workers = 4
+# Threaded workers so streamed (SSE) responses don't pin a whole worker each
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
 
 # Default to stdout/stderr to avoid filesystem issues; allow override via env
 accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
@@ -3,6 +3,7 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 import logging
 import os
+import threading
 import jwt as pyjwt
 from app import make_celery
 from flask_jwt_extended import JWTManager
@@ -43,15 +44,35 @@ app.logger.info("Flask application has started successfully!")
 # Enable CORS for all domains and all routes
 CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": "*"}})
 
-# Optionally auto-create tables in dev environments
-if os.getenv("AUTO_CREATE_DB", "true").lower() == "true":
+# Optionally auto-create tables in dev environments. This runs on the first request
+# (or via `flask --app app.main create-db`) rather than at import, so Celery workers
+# and tooling that import the app don't open a DB connection just to start.
+_tables_ensured = threading.Event()
+_tables_lock = threading.Lock()
+
+
+def ensure_tables():
     try:
-        with app.app_context():
-            db.create_all()
-            app.logger.info("Database tables ensured via create_all()")
+        db.create_all()
+        app.logger.info("Database tables ensured via create_all()")
     except Exception as _e:
         app.logger.warning(f"DB create_all skipped or failed: {_e}")
 
+
+@app.cli.command("create-db")
+def create_db_command():
+    ensure_tables()
+
+
+@app.before_request
+def _ensure_tables_once():
+    if _tables_ensured.is_set() or os.getenv("AUTO_CREATE_DB", "true").lower() != "true":
+        return
+    with _tables_lock:
+        if not _tables_ensured.is_set():
+            ensure_tables()
+            _tables_ensured.set()
+
 # Import Blueprints
 # Auth
 from app.routes.auth import auth_bp
@@ -65,7 +86,7 @@ from app.routes.stages.discover.summarizer_batch_routes import summ_batch_bp
 # from app.stages.discover.segmenter.segmenter_routes import segmenter_bp
 # from app.stages.discover.interactive_timeline_explorer.timeline_explorer_routes import timeline_explorer_bp
 # from app.stages.discover.visual_study_guide.study_guide_routes import study_guide_bp
-from app.stages.discover.math_problem_visualizer.math_problem_visualizer_routes import math_problem_visualiser_bp
+# from app.stages.discover.math_problem_visualizer.math_problem_visualizer_routes import math_problem_visualiser_bp
 from app.stages.discover.topic_modeller.modeller_routes import modeller_bp
 from app.routes.stages.discover.chrono_routes import chrono_bp
 from app.routes.stages.discover.sentiment_routes import sentiment_bp
@@ -96,6 +117,9 @@ from app.ai_tools.document_analyzer.document_analyzer_routes import document_ana
 from app.routes.progress_routes import progress_bp
 from app.routes.web_scraper_routes import web_bp
 
+# LLM slot introspection
+from app.routes.llm_routes import llm_bp
+
 
 # Register Blueprints
 # Auth
@@ -136,6 +160,9 @@ app.register_blueprint(document_analyzer_bp, url_prefix='/api/document_analyzer'
 app.register_blueprint(progress_bp, url_prefix='/api/progress')
 app.register_blueprint(web_bp, url_prefix='/api/web')
 
+# LLM slot introspection
+app.register_blueprint(llm_bp, url_prefix='/api/llm')
+
 
 # Default route (temporary)
 @app.route('/')
@@ -1,4 +1,4 @@
-from .files import UploadedFile, FilePage
+from .files import UploadedFile, FilePage, ExtractedDocument, PageResult, UploadSession
 from .status import ProcessingStatus, Progress
 from .logs import EndpointLog  # If applicable
 from .users import Users
@@ -5,12 +5,16 @@ from datetime import datetime
 from app.db import db  # This is your instance of SQLAlchemy from db.py
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKey, Text, Integer, DateTime, String
+from sqlalchemy import ForeignKey, Text, Integer, BigInteger, DateTime, String, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB  # if Postgres; else use db.JSON
+from sqlalchemy.ext.hybrid import hybrid_property
 
 
 class UploadedFile(db.Model):
     __tablename__ = "uploaded_files"
+    # Vault listing: a user's files newest first, paged by (created_at, id).
+    # Existing DBs: index, created_at backfill and status_before_missing come from migrations/versions/8b4e6d2c5a31.
+    __table_args__ = (db.Index("ix_uploaded_files_user_created", "user_id", "created_at", "id"),)
 
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = db.Column(db.String, nullable=False)  # ✅ NEW
@@ -19,8 +23,9 @@ class UploadedFile(db.Model):
     file_path = db.Column(Text, nullable=False)
     file_type = db.Column(Text, nullable=False)
     total_pages = db.Column(Integer)
-    created_at = db.Column(DateTime, default=datetime.utcnow)
-    status = db.Column(Text, default="pending")
+    created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
+    status = db.Column(Text, default="pending")  # "missing": blob gone from storage (see reconcile_vault)
+    status_before_missing = db.Column(Text)  # what status was until reconcile_vault marked the row missing
     hash = db.Column(String(64), unique=True, nullable=True)
 
     pages = db.relationship("FilePage", backref="file", cascade="all, delete-orphan")
@@ -33,6 +38,61 @@ class FilePage(db.Model):
     file_id = db.Column(UUID(as_uuid=True), db.ForeignKey("uploaded_files.id"), nullable=False)
     page_number = db.Column(Integer, nullable=False)
     page_text = db.Column(Text, nullable=False)
+    # page_text minus running headers/footers/boilerplate, whitespace collapsed.
+    # Existing DBs: added by migrations/versions/3f1c2a9d7b10 (`alembic upgrade head`).
+    clean_text = db.Column(Text)
     page_summary = db.Column(Text)
     page_topics = db.Column(JSONB)  # or JSONB if Postgres
     created_at = db.Column(DateTime, default=datetime.utcnow)
+
+    @hybrid_property
+    def llm_text(self):
+        """The text to send to a model: cleaned when available (older rows only have raw)."""
+        return self.clean_text if self.clean_text is not None else self.page_text
+
+    @llm_text.expression
+    def llm_text(cls):
+        return db.func.coalesce(cls.clean_text, cls.page_text)
+
+
+class ExtractedDocument(db.Model):
+    """Page texts extracted from a file, keyed by content SHA-256 (UploadedFile.hash) and shared by all tools."""
+    __tablename__ = "extracted_documents"
+    hash = db.Column(String(64), primary_key=True)
+    extractor = db.Column(String(32), nullable=False)  # format version; a mismatch counts as a miss
+    page_count = db.Column(Integer, nullable=False)
+    pages = db.Column(LargeBinary, nullable=False)  # zlib-compressed JSON list of page strings
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+
+
+class PageResult(db.Model):
+    """
+    A per-page tool result keyed by content: sha256 over (page text, tool, tool params, model),
+    so any upload containing the same page reuses it. Carries no user or file ids; access is
+    still decided by the FilePage/UploadedFile the caller reached the text through.
+    """
+    __tablename__ = "page_results"
+    key = db.Column(String(64), primary_key=True)
+    tool = db.Column(String(64), nullable=False)
+    model = db.Column(String(100))
+    result = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(db.Model):
+    """
+    A resumable upload (see /api/upload/uploads): chunk N is staged as Azure block N; once all
+    arrived the block list is committed, the blob hashed and an UploadedFile saved.
+    """
+    __tablename__ = "upload_sessions"
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(db.String, nullable=False)
+    original_file_name = db.Column(Text, nullable=False)
+    blob_path = db.Column(Text, nullable=False)
+    content_type = db.Column(Text, nullable=False)
+    total_size = db.Column(BigInteger, nullable=False)
+    chunk_size = db.Column(Integer, nullable=False)
+    received = db.Column(BigInteger, nullable=False, default=0)  # bytes staged so far
+    file_id = db.Column(UUID(as_uuid=True), db.ForeignKey("uploaded_files.id", ondelete="SET NULL"))  # set on commit
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
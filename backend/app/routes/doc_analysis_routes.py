@@ -62,11 +62,12 @@ def doc_analysis_results():
     svc = DocAnalysisService()
 
     # per-page compute
-    rows = (db.session.query(FilePage.page_number, FilePage.page_text)
+    rows = (db.session.query(FilePage.page_number, FilePage.llm_text)
             .filter_by(file_id=file_id).order_by(asc(FilePage.page_number)).all())
+    results = svc.analyze_pages([(pn, txt or "") for pn, txt in rows])
     per_page = []
-    for pn, txt in rows:
-        per_page.append({"page": pn, "analysis": svc.analyze_page(txt or "")})
+    for pn, _ in rows:
+        per_page.append({"page": pn, "analysis": results[pn]})
 
     doc_summary = svc.aggregate([(pp["page"], pp["analysis"]) for pp in per_page])
 
@@ -90,7 +91,7 @@ def doc_analysis_mind_map():
     if not file_id:
         return jsonify({"error":"file_id required"}), 400
 
-    rows = (db.session.query(FilePage.page_text)
+    rows = (db.session.query(FilePage.llm_text)
             .filter_by(file_id=file_id).order_by(asc(FilePage.page_number)).all())
     full_text = " ".join((r[0] or "") for r in rows)
     svc = DocAnalysisService()
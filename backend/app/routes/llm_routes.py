@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from app.services.openai_key_manager import key_manager
+from app.services.llm_cache import llm_cache
+from app.services.llm_gateway import gateway
+
+llm_bp = Blueprint('llm', __name__)
+
+
+@llm_bp.route('/slots', methods=['GET'])
+@jwt_required()
+def slot_health():
+    """
+    Health of each Azure OpenAI slot as seen by this worker
+    (in-flight, latency, error rate, breaker state) plus hedging counters.
+    Keys are never returned.
+    """
+    try:
+        return jsonify({"slots": key_manager.snapshot(), "hedging": gateway.hedge_stats()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@llm_bp.route('/cache', methods=['GET'])
+@jwt_required()
+def cache_stats():
+    """LLM response cache hit/miss counters per tool (this worker and, with Redis, cluster-wide)."""
+    try:
+        return jsonify(llm_cache.stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -64,7 +64,7 @@ def chronology_results():
     if not file_id:
         return jsonify({"error":"file_id required"}), 400
 
-    rows = (db.session.query(FilePage.page_number, FilePage.page_text)
+    rows = (db.session.query(FilePage.page_number, FilePage.llm_text)
             .filter_by(file_id=file_id).order_by(asc(FilePage.page_number)).all())
 
     # If you added a page_chronology column, prefer it; else compute quickly via service
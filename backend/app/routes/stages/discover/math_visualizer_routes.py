@@ -7,6 +7,7 @@ from celery.result import AsyncResult
 
 from app.services.stages.discover.math_visualizer_service import MathVisualizerService, MathVisualizerInput
 from app.tasks.math_visualizer_tasks import math_visualizer_solve_task
+from app.utils.sse import sse_response, wants_stream
 
 math_visualizer_bp = Blueprint("math_visualizer", __name__, url_prefix="/math_visualizer")
 
@@ -37,9 +38,12 @@ def solve_math_problem():
 
     Query:
       ?async=true -> enqueue Celery (only for method=text in this baseline)
+      ?stream=true -> server-sent events: step / diagram / practice items as they
+                      are generated, then `result` with the full output
     """
     try:
         use_async = str(request.args.get("async", "false")).lower() == "true"
+        stream = wants_stream(request)
         svc = MathVisualizerService()
 
         # JSON flow
@@ -70,6 +74,9 @@ def solve_math_problem():
                 practice_count=int(data.get("practice_count", 3)),
                 visualize_types=data.get("visualize_types"),
             )
+            if stream:
+                # validation errors still surface as a plain 400 before the stream opens
+                return sse_response(svc.solve_stream(*svc.prepare(mvi)))
             result = svc.solve(mvi)
             return jsonify(result), 200
 
@@ -94,6 +101,9 @@ def solve_math_problem():
                 practice_count=int(request.form.get("practice_count", 3)),
                 visualize_types=visualize_types,
             )
+            if stream:
+                # validation errors still surface as a plain 400 before the stream opens
+                return sse_response(svc.solve_stream(*svc.prepare(mvi)))
             result = svc.solve(mvi)
             return jsonify(result), 200
 
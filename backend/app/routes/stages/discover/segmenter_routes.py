@@ -72,7 +72,7 @@ def segments_results():
         for pn, segs in rows:
             per_page.append({"page": pn, "segments": (segs or [])})
     else:
-        rows = (db.session.query(FilePage.page_number, FilePage.page_text)
+        rows = (db.session.query(FilePage.page_number, FilePage.llm_text)
                 .filter_by(file_id=file_id).order_by(asc(FilePage.page_number)).all())
         for pn, txt in rows:
             per_page.append({"page": pn, "segments": svc.segment_page(txt or "")})
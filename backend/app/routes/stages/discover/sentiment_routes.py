@@ -73,10 +73,11 @@ def sentiment_results():
         for pn, sdict in rows:
             per_page.append({"page": pn, "sentiment": sdict or {"label":"neutral","score":0.0,"rationale":""}})
     else:
-        rows = (db.session.query(FilePage.page_number, FilePage.page_text)
+        rows = (db.session.query(FilePage.page_number, FilePage.llm_text)
                 .filter_by(file_id=file_id).order_by(asc(FilePage.page_number)).all())
-        for pn, txt in rows:
-            per_page.append({"page": pn, "sentiment": svc.analyze_page(txt or "")})
+        results = svc.analyze_pages([(pn, txt or "") for pn, txt in rows])
+        for pn, _ in rows:
+            per_page.append({"page": pn, "sentiment": results[pn]})
 
     # Aggregate doc-wise
     doc_summary = svc.aggregate_document([(pp["page"], pp["sentiment"]) for pp in per_page])
@@ -100,12 +100,10 @@ def start_batch():
         db.session.add(batch)
         db.session.commit()
 
-        # Fan-out per-file kickoff tasks (small stagger optional)
-        STAGGER = 3  # seconds
-        for idx, spec in enumerate(file_specs):
+        # Fan-out per-file kickoff tasks (LLM pacing is handled by key_manager's rate limiter)
+        for spec in file_specs:
             summarize_file_kickoff.apply_async(
-                args=[spec["file_id"], spec["progress_id"]],
-                countdown=idx * STAGGER
+                args=[spec["file_id"], spec["progress_id"]]
             )
 
         return jsonify({"batch_id": str(batch.id), "files": file_specs}), 200
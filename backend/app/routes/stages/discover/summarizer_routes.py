@@ -1,14 +1,11 @@
 from flask import Blueprint, request, jsonify
 from ....services.stages.discover.summarizer_service import Summarizer
-from app.tasks.summarizer_tasks import summarize_page_batch
-import os
+from app.tasks.summarizer_tasks import summarize_page_batch, extract_and_summarize_file
+from functools import lru_cache
 import logging
-import tempfile
-from app.routes.upload import download_blob_to_tmp
 from app.db import db
 from app.models import FilePage, UploadedFile
 from uuid import uuid4
-from app.utils.file_utils import extract_text_by_pages
 from math import ceil
 from app.models import Progress
 from app.routes.auth import require_access
@@ -19,8 +16,12 @@ logger = logging.getLogger(__name__)
 # logger.info("This is a log message from a blueprint.")
 
 summarizer_bp = Blueprint('summarizer', __name__)
-# Create an instance of the Summarizer class
-summarizer = Summarizer()
+
+@lru_cache(maxsize=1)
+def get_summarizer():
+    """Shared Summarizer, built on first use rather than at import."""
+    return Summarizer()
+
 
 @summarizer_bp.route('/summarize_text', methods=['POST'])
 @require_access
@@ -32,7 +33,7 @@ def summarize_text_route():
         return jsonify({"error": "No text provided"}), 400
 
     logger.info("Received text for summarization")
-    summary_data = summarizer._summarize_text(text)
+    summary_data = get_summarizer()._summarize_text(text)
     logger.info("Text summarization completed successfully")
     return jsonify(summary_data)
 
@@ -41,7 +42,8 @@ def summarize_text_route():
 @require_access
 def summarize_file_route():
     try:
-        # 1. Extract file
+        # 1. Locate file. It must already be in the vault: the extraction task (possibly on
+        #    another host) downloads it from blob storage, so nothing is saved locally here.
         if request.is_json:
             data = request.get_json()
             filename = data.get('filename')
@@ -49,12 +51,9 @@ def summarize_file_route():
             from_vault = data.get('fromVault', False)
             if not filename or not from_vault:
                 return jsonify({"error": "Missing filename or vault flag"}), 400
-            file_path = download_blob_to_tmp(filename)
 
         elif 'file' in request.files:
-            file = request.files['file']
-            file_path = os.path.join(tempfile.gettempdir(), file.filename)
-            file.save(file_path)
+            filename = request.files['file'].filename
 
         else:
             return jsonify({"error": "No valid file provided"}), 400
@@ -87,29 +86,14 @@ def summarize_file_route():
             processed_pages = existing_pages
 
         else:
-            pages = extract_text_by_pages(file_path)
-            pages = [p for p in pages if p.strip()]  # Skip empty
-            uploaded_file.total_pages = len(pages)
-            db.session.commit()
-
-            new_pages = []
-            for i, page_text in enumerate(pages, start=1):
-                file_page = FilePage(
-                    id=uuid4(),
-                    file_id=uploaded_file.id,
-                    page_number=i,
-                    page_text=page_text
-                )
-                db.session.add(file_page)
-                db.session.flush()
-                new_pages.append(file_page)
-                processed_pages.append(file_page)
-
-            db.session.commit()
-
-            for chunk in chunk_list(new_pages, 5):
-                page_ids = [str(p.id) for p in chunk if p.page_text]
-                summarize_page_batch.delay(page_ids)
+            # Extraction runs in a Celery task that stores pages and enqueues
+            # their summaries as it goes; the request returns immediately.
+            extract_and_summarize_file.delay(str(uploaded_file.id), blob_name=filename)
+            return jsonify({
+                "message": "Extracting pages in background",
+                "file_id": str(uploaded_file.id),
+                "progress_id": str(progress.id)
+            })
 
         return jsonify({
             "message": f"Processing {len(processed_pages)} pages in background",
@@ -137,7 +121,7 @@ def export_segments_route():
 
     logger.info(f"Exporting segments in {format} format")
     try:
-        exported_data = summarizer._export_segments(segments, format)
+        exported_data = get_summarizer()._export_segments(segments, format)
         logger.info("Segments exported successfully")
     except ValueError as e:
         logger.error(f"Error during segment export: {e}")
@@ -208,6 +192,17 @@ def summarization_progress(progress_id):
         if not uploaded_file:
             return jsonify({"error": "File not found"}), 404
 
+        if progress.status == "transcribing":
+            # audio/video: pages don't exist until transcription ends; the task reports its own percentage
+            return jsonify({
+                "progress_id": str(progress.id),
+                "file_id": str(uploaded_file.id),
+                "status": progress.status,
+                "total_pages": 0,
+                "pages_summarized": 0,
+                "percentage": progress.percentage
+            })
+
         total_pages = uploaded_file.total_pages or 0
         summarized_count = db.session.query(FilePage).filter(
             FilePage.file_id == uploaded_file.id,
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
 import os, tempfile
 from app.services.stages.discover.visual_guide_service import VisualGuideService
+from app.utils.sse import sse_response, wants_stream
+from app.services.extraction_cache import vault_document_pages, document_text
 
 # If you want vault usage for docs:
 try:
@@ -22,9 +24,12 @@ def generate_visual_study_guide():
         file=<uploaded file>, method=document
     Returns:
       { "summary": str, "topics":[{name, study_method, time?, order, resources?}, ...] }
+    With ?stream=true (or "stream": true), server-sent events instead:
+      `topic` per topic as soon as it is generated, then `result` with the full guide.
     """
     svc = VisualGuideService()
     tmp_path = None
+    stream = wants_stream(request)
 
     try:
         # === Multipart (upload) ===
@@ -42,6 +47,9 @@ def generate_visual_study_guide():
             f.save(tmp_path)
             current_app.logger.info(f"[VSG] Uploaded file saved at {tmp_path}")
 
+            if stream:
+                # text is extracted now, before the temp file is removed below
+                return sse_response(svc.stream(svc.document_text(tmp_path)))
             out = svc.from_document(tmp_path)
             return jsonify(out), 200
 
@@ -54,12 +62,16 @@ def generate_visual_study_guide():
                 category = (data.get("category") or "").strip()
                 if not category:
                     return jsonify({"error": "Missing category"}), 400
+                if stream:
+                    return sse_response(svc.stream(f"TOPIC: {category}"))
                 return jsonify(svc.from_category(category)), 200
 
             if method == "text":
                 txt = (data.get("text") or "").strip()
                 if not txt:
                     return jsonify({"error": "Missing text"}), 400
+                if stream:
+                    return sse_response(svc.stream(txt))
                 return jsonify(svc.from_text(txt)), 200
 
             if method == "document":
@@ -69,9 +81,11 @@ def generate_visual_study_guide():
                 if from_vault and filename:
                     if not download_blob_to_tmp:
                         return jsonify({"error": "Vault download not available on server"}), 500
-                    tmp_path = download_blob_to_tmp(filename)
-                    current_app.logger.info(f"[VSG] Vault file downloaded to: {tmp_path}")
-                    return jsonify(svc.from_document(tmp_path)), 200
+                    # cached pages skip the blob download and parse entirely
+                    doc_text = document_text(vault_document_pages(filename))
+                    if stream:
+                        return sse_response(svc.stream(doc_text))
+                    return jsonify(svc.from_text(doc_text)), 200
 
                 return jsonify({"error": "Document method requires multipart upload OR fromVault+filename"}), 400
 
@@ -150,7 +150,7 @@ def quiz_creator_results():
         return jsonify({"error": "file_id or filename required"}), 400
 
     # ---- existing logic below (unchanged) ----
-    rows = (db.session.query(FilePage.page_number, FilePage.page_text)
+    rows = (db.session.query(FilePage.page_number, FilePage.llm_text)
             .filter_by(file_id=file_id)
             .order_by(asc(FilePage.page_number))
             .all())
@@ -1,15 +1,17 @@
-import tempfile, uuid, os
+import tempfile, uuid, os, json, base64
 # upload.py
 from flask import Blueprint, request, jsonify, has_request_context
-from azure.storage.blob import BlobServiceClient, ContentSettings
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.services.file_service import save_uploaded_file_metadata
-from app.utils.hash_utils import calculate_sha256
-from app.models.files import UploadedFile
+from app.services.blob_storage import upload_stream, get_blob_service_client, block_id, hash_blob, UPLOAD_BLOCK_SIZE
+from app.services import blob_cache
+from app.models.files import UploadedFile, UploadSession
 from app.db import db
 import logging
 from urllib.parse import urlparse
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 upload_bp = Blueprint('upload', __name__)
@@ -19,12 +21,11 @@ AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 
 logger = logging.getLogger(__name__)
 CONTAINER_NAME = "scoolish"
-
-def get_blob_service_client():
-    conn = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-    if not conn:
-        raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not set")
-    return BlobServiceClient.from_connection_string(conn)
+VAULT_MAX_PAGE_SIZE = int(os.getenv("VAULT_MAX_PAGE_SIZE", "200"))
+# Resumable uploads: one chunk per request, staged as one block (Azure allows 50,000 per blob)
+RESUMABLE_CHUNK_SIZE = UPLOAD_BLOCK_SIZE
+RESUMABLE_MAX_BYTES = int(os.getenv("RESUMABLE_MAX_BYTES", str(20 * 1024 ** 3)))
+UPLOAD_SESSION_TTL = timedelta(days=7)  # Azure discards uncommitted blocks after a week
 
 def get_current_user_id():
     # Replace with actual auth logic
@@ -42,83 +43,344 @@ def upload_file():
 
     user_id = get_jwt_identity()
     filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    unique_filename = f"{timestamp}_{uuid.uuid4().hex}_{filename}"
-    blob_path = f"{user_id}/uploads/{unique_filename}"
-
-     # 👉 Calculate hash
-    file_hash = calculate_sha256(file)
-
-    # Check for duplicate
-    existing_file = UploadedFile.query.filter_by(hash=file_hash).first()
-    if existing_file:
-        bs = get_blob_service_client()
-        return jsonify({
-            'message': 'File already uploaded previously',
-            'file_url': f"https://{bs.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{existing_file.file_path}",
-            'file_name': existing_file.original_file_name,
-            'stored_as': existing_file.file_path.split('/')[-1]
-        }), 200
-    
-    # 👉 Save metadata (including hash)
-    new_file = save_uploaded_file_metadata(
-    user_id=user_id,  # ✅ Add this
-    original_file_name=filename,
-    blob_path=blob_path,
-    file_type=file.content_type,
-    file_hash=file_hash
-)
+    blob_path = _new_blob_path(user_id, filename)
 
     try:
+        from azure.storage.blob import ContentSettings
         blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=blob_path)
         content_settings = ContentSettings(content_type=file.content_type)
-        blob_client.upload_blob(file, overwrite=True, content_settings=content_settings)
+        # 👉 One pass: the hash is computed while blocks are staged; a duplicate is never committed
+        result = upload_stream(
+            blob_client, file.stream, content_settings,
+            keep=lambda file_hash: UploadedFile.query.filter_by(hash=file_hash).first() is None,
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if not result.committed:
+        return _already_uploaded(UploadedFile.query.filter_by(hash=result.sha256).first())
+
+    # 👉 Save metadata (including hash) only once the blob exists
+    try:
+        save_uploaded_file_metadata(
+            user_id=user_id,
+            original_file_name=filename,
+            blob_path=blob_path,
+            file_type=file.content_type,
+            file_hash=result.sha256
+        )
+    except IntegrityError:
+        # the same content was committed by a concurrent upload; keep theirs
+        db.session.rollback()
+        blob_client.delete_blob()
+        return _already_uploaded(UploadedFile.query.filter_by(hash=result.sha256).first())
+
+    return _uploaded(blob_client, filename)
+
+
+def _new_blob_path(user_id, filename):
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    return f"{user_id}/uploads/{timestamp}_{uuid.uuid4().hex}_{filename}"
+
+
+def _uploaded(blob_client, filename):
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'file_url': blob_client.url,
+        'original_name': filename,
+        'stored_as': blob_client.blob_name.split('/')[-1]
+    })
+
+
+def _already_uploaded(existing_file):
+    bs = get_blob_service_client()
+    return jsonify({
+        'message': 'File already uploaded previously',
+        'file_url': f"https://{bs.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{existing_file.file_path}",
+        'file_name': existing_file.original_file_name,
+        'stored_as': existing_file.file_path.split('/')[-1]
+    }), 200
+
+
+# ---------- Resumable uploads ----------
+# POST /uploads {filename, size, content_type}  -> upload_id, chunk_size, offset
+# PUT  /uploads/<id>/chunks/<n>  raw body, Upload-Offset: n * chunk_size
+# GET  /uploads/<id>             -> offset to continue from after an interruption
+# POST /uploads/<id>/commit      -> same response as /upload
+# Each chunk request moves one chunk, so no web worker is held while the file arrives;
+# commit reads the blob back once to hash it.
+
+@upload_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def start_upload():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename:
+        return jsonify({'error': 'filename is required'}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size (bytes) is required'}), 400
+    if size <= 0 or size > RESUMABLE_MAX_BYTES:
+        return jsonify({'error': f'size must be between 1 and {RESUMABLE_MAX_BYTES} bytes'}), 400
+
+    user_id = get_jwt_identity()
+    session = UploadSession(
+        user_id=user_id,
+        original_file_name=filename,
+        blob_path=_new_blob_path(user_id, filename),
+        content_type=data.get('content_type') or 'application/octet-stream',
+        total_size=size,
+        chunk_size=RESUMABLE_CHUNK_SIZE,
+        received=0,
+    )
+    db.session.add(session)
+    db.session.commit()
+    return jsonify(_upload_status(session)), 201
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def upload_status(upload_id):
+    session, error = _upload_session(upload_id)
+    if error:
+        return error
+    return jsonify(_upload_status(session))
+
+
+@upload_bp.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(upload_id, index):
+    """
+    Chunk `index` (the raw body) becomes staged block `index`. Chunks go in
+    order; one that was already received is
+    acknowledged without being staged again, so a client that lost a
+    response can simply resend it.
+    """
+    session, error = _upload_session(upload_id, lock=True)
+    if error:
+        return error
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+    except ValueError:
+        db.session.rollback()
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    if offset != index * session.chunk_size or offset >= session.total_size:
+        db.session.rollback()
+        return jsonify({'error': f'chunk {index} starts at offset {index * session.chunk_size}', **_upload_status(session)}), 400
+    if offset < session.received:
+        db.session.rollback()
+        return jsonify(_upload_status(session))
+    if offset > session.received:
+        db.session.rollback()
+        return jsonify({'error': 'Chunks must be sent in order', **_upload_status(session)}), 409
+
+    expected = min(session.chunk_size, session.total_size - offset)
+    if request.content_length != expected:
+        db.session.rollback()
+        return jsonify({'error': f'chunk {index} must be {expected} bytes'}), 400
+    data = request.get_data(cache=False)
+    if len(data) != expected:
+        db.session.rollback()
+        return jsonify({'error': f'chunk {index} must be {expected} bytes'}), 400
+
+    try:
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=session.blob_path)
+        blob_client.stage_block(block_id(index), data, length=len(data))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    session.received = offset + len(data)
+    db.session.commit()
+    return jsonify(_upload_status(session))
 
-        return jsonify({
-            'message': 'File uploaded successfully',
-            'file_url': blob_client.url,
-            'original_name': filename,
-            'stored_as': unique_filename
-        })
 
+@upload_bp.route('/uploads/<upload_id>/commit', methods=['POST'])
+@jwt_required()
+def commit_upload(upload_id):
+    """
+    Commits the staged blocks, hashes the blob and records the file. Content
+    the vault already holds is deleted again and the existing file returned.
+    Repeating a commit returns the same answer.
+    """
+    session, error = _upload_session(upload_id, lock=True)
+    if error:
+        return error
+    blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=session.blob_path)
+    if session.file_id is not None:
+        db.session.rollback()
+        return _committed(session, blob_client)
+    if session.received != session.total_size:
+        db.session.rollback()
+        return jsonify({'error': 'Upload is incomplete', **_upload_status(session)}), 409
+
+    try:
+        from azure.storage.blob import BlobBlock, ContentSettings
+        blocks = [BlobBlock(block_id=block_id(i)) for i in range(-(-session.total_size // session.chunk_size))]
+        blob_client.commit_block_list(blocks, content_settings=ContentSettings(content_type=session.content_type))
+        file_hash = hash_blob(blob_client)
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
-    
+
+    existing = UploadedFile.query.filter_by(hash=file_hash).first()
+    if existing is not None:
+        if existing.file_path != session.blob_path:
+            blob_client.delete_blob()  # already in the vault
+        session.file_id = existing.id
+        db.session.commit()
+        return _committed(session, blob_client)
+
+    upload_id = session.id
+    try:
+        new_file = save_uploaded_file_metadata(
+            user_id=session.user_id,
+            original_file_name=session.original_file_name,
+            blob_path=session.blob_path,
+            file_type=session.content_type,
+            file_hash=file_hash
+        )
+    except IntegrityError:
+        # the same content was committed by a concurrent upload; keep theirs
+        db.session.rollback()
+        blob_client.delete_blob()
+        new_file = UploadedFile.query.filter_by(hash=file_hash).first()
+    session = db.session.get(UploadSession, upload_id)
+    session.file_id = new_file.id
+    db.session.commit()
+    return _committed(session, blob_client)
+
+
+@upload_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload(upload_id):
+    session, error = _upload_session(upload_id)
+    if error:
+        return error
+    db.session.delete(session)  # staged blocks are discarded by Azure
+    db.session.commit()
+    return jsonify({'message': 'Upload cancelled'})
+
+
+def _upload_session(upload_id, lock=False):
+    """The caller's UploadSession, or an error response (unknown, someone else's, or expired)."""
+    try:
+        query = UploadSession.query.filter_by(id=uuid.UUID(upload_id), user_id=get_jwt_identity())
+    except ValueError:
+        return None, (jsonify({'error': 'Upload not found'}), 404)
+    session = (query.with_for_update() if lock else query).first()
+    if session is None:
+        return None, (jsonify({'error': 'Upload not found'}), 404)
+    if session.file_id is None and session.created_at < datetime.utcnow() - UPLOAD_SESSION_TTL:
+        db.session.delete(session)
+        db.session.commit()
+        return None, (jsonify({'error': 'Upload expired, please start again'}), 410)
+    return session, None
+
+
+def _upload_status(session):
+    return {
+        'upload_id': str(session.id),
+        'size': session.total_size,
+        'chunk_size': session.chunk_size,
+        'offset': session.received,
+        'next_chunk': session.received // session.chunk_size,
+        'committed': session.file_id is not None,
+    }
+
+
+def _committed(session, blob_client):
+    uploaded = db.session.get(UploadedFile, session.file_id)
+    if uploaded is None or uploaded.file_path != session.blob_path:
+        return _already_uploaded(uploaded) if uploaded else (jsonify({'error': 'Upload not found'}), 404)
+    return _uploaded(blob_client, session.original_file_name)
+
 
 @upload_bp.route('/files', methods=['GET'])
 @jwt_required()
 def list_files():
+    """
+    The user's vault, newest first, served from uploaded_files alone.
+    Optional query params:
+      limit   page size (max VAULT_MAX_PAGE_SIZE); without it every file is returned
+      cursor  next_cursor from the previous page
+      type    "video", "audio", ... (MIME major type) or a full MIME type
+      q       original file name prefix, case-insensitive
+    """
     user_id = get_jwt_identity()
-    prefix = f"{user_id}/uploads/"
 
     try:
-        # 1. Get all blobs from Azure
-        container_client = get_blob_service_client().get_container_client(CONTAINER_NAME)
-        blob_list = container_client.list_blobs(name_starts_with=prefix)
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({"error": "limit must be positive"}), 400
+        if limit is not None:
+            limit = min(limit, VAULT_MAX_PAGE_SIZE)
+
+        query = db.session.query(UploadedFile).filter(
+            UploadedFile.user_id == user_id,
+            # rows from before the status column have NULL there, and `!=` drops NULLs
+            or_(UploadedFile.status.is_(None), UploadedFile.status != "missing"),
+        )
 
-        # 2. Extract stored file names from Azure blob paths
-        stored_file_names = [blob.name.split('/')[-1] for blob in blob_list]
+        file_type = request.args.get('type')
+        if file_type:
+            if '/' in file_type:
+                query = query.filter(UploadedFile.file_type == file_type)
+            else:
+                query = query.filter(UploadedFile.file_type.like(f"{_like_escape(file_type)}/%", escape="\\"))
 
-        # 3. Fetch original_file_name for matching stored_file_names from DB
-        uploaded_files = db.session.query(UploadedFile).filter(
-            UploadedFile.stored_file_name.in_(stored_file_names)
-        ).all()
+        name_prefix = request.args.get('q')
+        if name_prefix:
+            query = query.filter(UploadedFile.original_file_name.ilike(f"{_like_escape(name_prefix)}%", escape="\\"))
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                created_at, file_id = _decode_cursor(cursor)
+            except Exception:
+                return jsonify({"error": "Invalid cursor"}), 400
+            # keyset: rows strictly after the last one of the previous page
+            query = query.filter(db.tuple_(UploadedFile.created_at, UploadedFile.id) < (created_at, file_id))
+
+        query = query.order_by(UploadedFile.created_at.desc(), UploadedFile.id.desc())
+        rows = query.limit(limit + 1).all() if limit else query.all()
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1])
 
-        # 4. Return only original_file_name
         files = [
                     {
                         "name": file.original_file_name,
-                        "stored_name": file.stored_file_name
+                        "stored_name": file.stored_file_name,
+                        "file_type": file.file_type,
+                        "created_at": file.created_at.isoformat() if file.created_at else None
                     }
-                    for file in uploaded_files
+                    for file in rows
                 ]
 
-        return jsonify({ "files": files })
+        return jsonify({ "files": files, "next_cursor": next_cursor })
 
     except Exception as e:
         return jsonify({ "error": str(e) }), 500
 
 
+def _like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _encode_cursor(row):
+    raw = json.dumps([row.created_at.isoformat(), str(row.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    created_at, file_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), uuid.UUID(file_id)
+
+
 def download_blob_to_tmp(filename_or_url, user_id: str = None):
     # Extract stored filename safely
     parsed = urlparse(filename_or_url)
@@ -131,14 +393,14 @@ def download_blob_to_tmp(filename_or_url, user_id: str = None):
         except Exception:
             user_id = None
 
-    # Fallback: resolve user_id from DB by stored filename
-    if not user_id:
-        try:
-            rec = UploadedFile.query.filter_by(stored_file_name=stored_filename).first()
-            if rec:
-                user_id = rec.user_id
-        except Exception:
-            pass
+    # DB record: content hash for the local cache, and user_id fallback
+    rec = None
+    try:
+        rec = UploadedFile.query.filter_by(stored_file_name=stored_filename).first()
+    except Exception:
+        pass
+    if not user_id and rec:
+        user_id = rec.user_id
 
     if not user_id:
         raise RuntimeError("Unable to determine user_id for vault download")
@@ -148,10 +410,12 @@ def download_blob_to_tmp(filename_or_url, user_id: str = None):
     bs = get_blob_service_client()
     blob_client = bs.get_blob_client(container=CONTAINER_NAME, blob=blob_path)
 
-    tmp_path = os.path.join("/tmp", stored_filename)  # ✅ Only actual filename, no full URL
+    # ✅ Only actual filename, no full URL; prefixed so concurrent callers never share a path
+    tmp_path = os.path.join("/tmp", f"{uuid.uuid4().hex[:8]}_{stored_filename}")
     logger.info(f"Downloading blob to temporary path: {tmp_path}")
 
-    with open(tmp_path, "wb") as f:
-        download_stream = blob_client.download_blob()
-        f.write(download_stream.readall())
+    # streamed to disk in parallel ranges (never whole in memory); repeat downloads come from the local cache
+    # (the cached copy is only trusted for the record's owner: no reading other users' files via the cache)
+    file_hash = rec.hash if rec is not None and rec.user_id == user_id else None
+    blob_cache.fetch(blob_client, file_hash, tmp_path)
     return tmp_path
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Size-bounded local cache of vault blobs, keyed by content hash (UploadedFile.hash),
+so repeated runs over the same file (timeline, visual guide, summarizer, ...)
+don't download it again. Entries are verified against their hash when written,
+evicted least recently used first, and shared safely between worker processes
+on the same machine through file locks.
+
+Entries are read-only; callers always get their own copy, which they may
+modify or delete as before without touching the cached one.
+"""
+import os
+import uuid
+import shutil
+import hashlib
+import logging
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: no cross-process locking
+    fcntl = None
+
+from app.services.blob_storage import download_to_file
+
+log = logging.getLogger(__name__)
+
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", "/tmp/blob-cache")
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))  # 0 disables the cache
+_EVICT_LOCK = ".evict.lock"
+
+
+@contextmanager
+def _locked(path):
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _copy_out(entry, dest):
+    # never a hardlink: a caller writing to its file would write to the entry too
+    # (the entry's read-only mode doesn't stop a worker running as root)
+    shutil.copyfile(entry, dest)
+    os.utime(entry)  # mtime doubles as the LRU clock
+
+
+def _drop_lock(path):
+    """Deletes an entry's lock file unless a worker holds it right now."""
+    try:
+        with open(path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.remove(path)
+    except (BlockingIOError, FileNotFoundError):
+        pass
+
+
+def fetch(blob_client, file_hash, dest):
+    """
+    Writes the blob to `dest`, from the cache when an entry for `file_hash`
+    exists, otherwise downloading it once (concurrent callers wait on the
+    same download) and adding it to the cache.
+    """
+    if not file_hash or BLOB_CACHE_MAX_BYTES <= 0:
+        download_to_file(blob_client, dest)
+        return dest
+
+    os.makedirs(BLOB_CACHE_DIR, exist_ok=True)
+    entry = os.path.join(BLOB_CACHE_DIR, file_hash)
+    if os.path.exists(entry):
+        try:
+            _copy_out(entry, dest)
+            log.info(f"[blob-cache] hit {file_hash[:12]}")
+            return dest
+        except FileNotFoundError:
+            pass  # evicted just now; fetch it again
+
+    with _locked(entry + ".lock"):
+        if not os.path.exists(entry):  # another worker may have fetched it meanwhile
+            part = f"{entry}.{uuid.uuid4().hex}.part"
+            try:
+                size = download_to_file(blob_client, part)
+                # ranges arrive out of order, so the hash is taken from the finished file
+                digest = _sha256(part)
+                if digest != file_hash:
+                    raise ValueError(f"blob content hash {digest[:12]} does not match {file_hash[:12]}")
+                os.chmod(part, 0o444)
+                os.replace(part, entry)
+            finally:
+                if os.path.exists(part):
+                    os.remove(part)
+            log.info(f"[blob-cache] stored {file_hash[:12]} ({size} bytes)")
+        _copy_out(entry, dest)
+    evict()
+    return dest
+
+
+def evict(max_bytes=None):
+    """
+    Removes least recently used entries until the cache fits in max_bytes,
+    along with the lock files of entries that are gone.
+    """
+    max_bytes = BLOB_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _locked(os.path.join(BLOB_CACHE_DIR, _EVICT_LOCK)):
+        entries, locks = [], []
+        for e in os.scandir(BLOB_CACHE_DIR):
+            if e.is_file() and len(e.name) == 64:  # sha256 names only; skip locks and partial files
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+            elif e.name.endswith(".lock") and len(e.name) == 69:
+                locks.append(e.path)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        for lock in locks:
+            if not os.path.exists(lock[:-len(".lock")]):
+                _drop_lock(lock)
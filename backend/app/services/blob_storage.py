@@ -0,0 +1,145 @@
+import os
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional
+
+# Uploads are read and staged in blocks of this size (Azure allows up to 4000 MiB per block)
+UPLOAD_BLOCK_SIZE = int(os.getenv("BLOB_UPLOAD_BLOCK_SIZE", str(8 * 1024 * 1024)))
+# Parallel block uploads / ranged downloads per transfer
+BLOB_MAX_CONCURRENCY = int(os.getenv("BLOB_MAX_CONCURRENCY", "4"))
+# Downloads are fetched in ranges of this size
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("BLOB_DOWNLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Keep-alive HTTP connections per process, shared by every blob/container client
+BLOB_POOL_SIZE = int(os.getenv("BLOB_POOL_SIZE", "16"))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_blob_service_client(conn: str = None):
+    """
+    The process-wide BlobServiceClient for a connection string. All blob and
+    container clients derived from it share one pooled HTTP session, so
+    connections (and their TLS handshakes) are reused across requests and
+    tasks. Keyed by pid, so forked workers never share a socket pool.
+    """
+    conn = conn or os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    if not conn:
+        raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not set")
+    key = (os.getpid(), conn)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = _build_client(conn)
+    return client
+
+
+def _build_client(conn):
+    # the Azure SDK is slow to import; only pay for it when storage is actually used
+    import requests
+    from requests.adapters import HTTPAdapter
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.storage.blob import BlobServiceClient
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BLOB_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return BlobServiceClient.from_connection_string(
+        conn,
+        transport=RequestsTransport(session=session, session_owner=False),
+        max_block_size=UPLOAD_BLOCK_SIZE,
+        max_single_put_size=UPLOAD_BLOCK_SIZE,
+        max_single_get_size=DOWNLOAD_CHUNK_SIZE,
+        max_chunk_get_size=DOWNLOAD_CHUNK_SIZE,
+    )
+
+
+def download_to_file(blob_client, path: str, max_concurrency: int = BLOB_MAX_CONCURRENCY) -> int:
+    """Streams a blob into `path`, fetching up to max_concurrency ranges at once; returns its size."""
+    with open(path, "wb") as f:
+        return blob_client.download_blob(max_concurrency=max_concurrency).readinto(f)
+
+
+def hash_blob(blob_client) -> str:
+    """SHA-256 of a blob's content, read range by range so only one range is held in memory."""
+    sha256 = hashlib.sha256()
+    for chunk in blob_client.download_blob().chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def block_id(index: int) -> str:
+    """Staged block ids must all have the same length; the SDK base64-encodes them."""
+    return f"{index:08d}"
+
+
+class StreamUpload(NamedTuple):
+    sha256: str
+    size: int
+    committed: bool
+
+
+def upload_stream(blob_client, stream, content_settings=None,
+                  keep: Optional[Callable[[str], bool]] = None,
+                  block_size: int = UPLOAD_BLOCK_SIZE,
+                  max_concurrency: int = BLOB_MAX_CONCURRENCY) -> StreamUpload:
+    """
+    Uploads a file-like object to a block blob in a single pass: every block
+    read is added to the SHA-256 and staged straight away (up to
+    max_concurrency blocks at a time), so the stream is read once and at most
+    max_concurrency + 1 blocks are held in memory.
+
+    Once the whole stream is hashed, keep(sha256) decides whether the blob is
+    created at all. When it returns False the block list is never committed;
+    Azure discards uncommitted blocks on its own, so nothing is left behind.
+    """
+    from azure.storage.blob import BlobBlock
+
+    sha256 = hashlib.sha256()
+    first = stream.read(block_size)
+    sha256.update(first)
+    data = stream.read(block_size)
+
+    if not data:
+        # fits in one block: a single Put Blob request
+        digest = sha256.hexdigest()
+        if keep is not None and not keep(digest):
+            return StreamUpload(digest, len(first), False)
+        blob_client.upload_blob(first, overwrite=True, content_settings=content_settings)
+        return StreamUpload(digest, len(first), True)
+
+    sha256.update(data)
+    head = [first, data]
+    first = data = None  # so sent blocks can be freed
+
+    def rest():
+        while head:
+            yield head.pop(0)
+        for block in iter(lambda: stream.read(block_size), b""):
+            sha256.update(block)
+            yield block
+
+    # up to max_concurrency blocks are in flight; reading waits for the oldest
+    blocks, size, pending = [], 0, deque()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        for block in rest():
+            if len(pending) >= max_concurrency:
+                pending.popleft().result()
+            bid = block_id(len(blocks))
+            pending.append(pool.submit(blob_client.stage_block, bid, block, length=len(block)))
+            blocks.append(bid)
+            size += len(block)
+        for fut in pending:
+            fut.result()
+
+    digest = sha256.hexdigest()
+    if keep is not None and not keep(digest):
+        return StreamUpload(digest, size, False)
+    blob_client.commit_block_list([BlobBlock(block_id=b) for b in blocks], content_settings=content_settings)
+    return StreamUpload(digest, size, True)
+
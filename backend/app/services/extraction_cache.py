@@ -0,0 +1,128 @@
+import os
+import json
+import zlib
+import hashlib
+import logging
+from urllib.parse import urlparse
+
+from sqlalchemy.exc import IntegrityError
+
+from app.db import db
+from app.models import ExtractedDocument, UploadedFile
+from app.utils.file_utils import iter_pages
+from app.utils.extraction.boilerplate import clean_pages
+
+log = logging.getLogger(__name__)
+
+# Bump when iter_pages output changes, so older entries are re-extracted
+EXTRACTOR_VERSION = "pages-v3"
+CACHE_ENABLED = os.getenv("EXTRACTION_CACHE", "true").lower() == "true"
+
+
+def file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class PageWriter:
+    """
+    Compresses pages as they are produced, so a whole document can be cached
+    without holding its uncompressed text in memory.
+    """
+    def __init__(self):
+        self._z = zlib.compressobj(6)
+        self._parts = [self._z.compress(b"[")]
+        self.count = 0
+
+    def add(self, page: str):
+        sep = b"," if self.count else b""
+        self._parts.append(self._z.compress(sep + json.dumps(page, ensure_ascii=False).encode("utf-8")))
+        self.count += 1
+
+    def finish(self) -> bytes:
+        self._parts.append(self._z.compress(b"]"))
+        self._parts.append(self._z.flush())
+        return b"".join(self._parts)
+
+
+def get_pages(file_hash: str):
+    """Cached page list for a content hash, or None."""
+    if not CACHE_ENABLED or not file_hash:
+        return None
+    try:
+        row = db.session.get(ExtractedDocument, file_hash)
+    except Exception as e:
+        log.warning(f"[extraction-cache] lookup failed: {e}")
+        db.session.rollback()
+        return None
+    if row is None or row.extractor != EXTRACTOR_VERSION:
+        return None
+    return json.loads(zlib.decompress(row.pages))
+
+
+def put_pages(file_hash: str, writer: PageWriter):
+    if not CACHE_ENABLED or not file_hash:
+        return
+    try:
+        db.session.merge(ExtractedDocument(
+            hash=file_hash,
+            extractor=EXTRACTOR_VERSION,
+            page_count=writer.count,
+            pages=writer.finish(),
+        ))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # another worker cached the same file first
+    except Exception as e:
+        db.session.rollback()
+        log.warning(f"[extraction-cache] store failed: {e}")
+
+
+def document_pages(file_path: str, file_hash: str = None, clean: bool = True):
+    """
+    Page texts of a local file (see file_utils.iter_pages), parsed only if this
+    content has never been extracted before. Raw pages are cached; with clean=True
+    (what LLM prompts want) running headers/footers and boilerplate are stripped.
+    """
+    file_hash = file_hash or file_sha256(file_path)
+    pages = get_pages(file_hash)
+    if pages is not None:
+        log.info(f"[extraction-cache] hit {file_hash[:12]}")
+    else:
+        writer, pages = PageWriter(), []
+        for page in iter_pages(file_path):
+            pages.append(page)
+            writer.add(page)
+        put_pages(file_hash, writer)
+    return clean_pages(pages) if clean else pages
+
+
+def vault_document_pages(filename_or_url: str, user_id: str = None, clean: bool = True):
+    """
+    Page texts of a vault file. When its UploadedFile.hash is already cached the
+    blob is neither downloaded nor parsed.
+    """
+    parsed = urlparse(filename_or_url)
+    stored_filename = os.path.basename(parsed.path) if parsed.scheme else filename_or_url
+    rec = UploadedFile.query.filter_by(stored_file_name=stored_filename).first()
+    if rec is not None:
+        pages = get_pages(rec.hash)
+        if pages is not None:
+            log.info(f"[extraction-cache] hit {rec.hash[:12]} for {stored_filename}")
+            return clean_pages(pages) if clean else pages
+        user_id = user_id or rec.user_id
+
+    from app.routes.upload import download_blob_to_tmp
+    path = download_blob_to_tmp(filename_or_url, user_id=user_id)
+    try:
+        return document_pages(path, file_hash=rec.hash if rec is not None else None, clean=clean)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def document_text(pages) -> str:
+    return "\n\n".join(p for p in pages if p.strip())
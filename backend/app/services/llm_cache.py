@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from threading import Lock, Event
+
+log = logging.getLogger(__name__)
+
+# "redis" (in-process LRU in front of Redis), "local" (LRU only) or "off"
+CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "redis").lower()
+LOCAL_MAX_BYTES = int(os.getenv("LLM_CACHE_LOCAL_MAX_BYTES", str(64 * 1024 * 1024)))
+MAX_ENTRY_BYTES = int(os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Calls at or below this temperature are treated as deterministic and cached by default
+DETERMINISTIC_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+
+_DAY = 24 * 3600
+# Per-tool TTLs (seconds); override with LLM_CACHE_TTL_<TOOL>, e.g. LLM_CACHE_TTL_SENTIMENT=3600
+TOOL_TTLS = {
+    "summarizer": 7 * _DAY,
+    "sentiment": 7 * _DAY,
+    "doc_analysis": 7 * _DAY,
+    "chronology": 7 * _DAY,
+    "quiz_creator": 7 * _DAY,
+    "topics": 7 * _DAY,
+    "segmenter": 7 * _DAY,
+    "math_visualizer": 30 * _DAY,
+    "visual_guide": _DAY,
+    "timeline_explorer": _DAY,
+    "creative_prompts": _DAY,
+    "web_scraper": 6 * 3600,
+}
+
+_REDIS_PREFIX = "llm_cache:"
+_REDIS_STATS_KEY = "llm_cache_stats"
+_REDIS_RETRY_SECONDS = 30
+
+# Single-flight: identical requests already in flight are awaited instead of re-sent
+SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "1") not in ("0", "false", "False")
+_FLIGHT_LOCK_PREFIX = "llm_flight:"
+_FLIGHT_RESULT_PREFIX = "llm_flight_result:"
+_FLIGHT_RESULT_TTL = 30
+_FLIGHT_POLL_SECONDS = 0.1
+
+# Delete the flight lock only if we still own it
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def ttl_for(tool: str = None) -> int:
+    if tool:
+        env = os.getenv(f"LLM_CACHE_TTL_{tool.upper()}")
+        if env:
+            return int(env)
+        return TOOL_TTLS.get(tool, DEFAULT_TTL)
+    return DEFAULT_TTL
+
+
+def make_key(deployment: str, messages, temperature=None, max_tokens=None, extra: dict = None) -> str:
+    """Content address of a chat request: sha256 over its canonical JSON."""
+    payload = {
+        "deployment": deployment,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "extra": extra or {},
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class _LRU:
+    """In-process LRU bounded by total payload bytes; entries carry their own expiry."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data = OrderedDict()   # key -> (expires_at, payload)
+        self._lock = Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, payload = item
+            if expires_at < time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: str, ttl: int):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.time() + ttl, payload)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._data:
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key: str):
+        _, payload = self._data.pop(key)
+        self.bytes -= len(payload)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LLMCache:
+    """
+    Two-tier response cache for the LLM gateway: an in-process LRU (size-bounded)
+    in front of Redis (shared by all workers, TTL per tool, eviction left to
+    Redis' maxmemory policy). Redis errors never fail a call; the tier is skipped
+    for a short while instead.
+    """
+    def __init__(self, backend: str = CACHE_BACKEND):
+        self.backend = backend
+        self._local = _LRU(LOCAL_MAX_BYTES) if backend in ("local", "redis") else None
+        self._redis = None
+        self._redis_down_until = 0.0
+        self._stats = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "off"
+
+    def _client(self):
+        if self.backend != "redis" or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.from_url(
+                os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                decode_responses=True,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5,
+            )
+        return self._redis
+
+    def _redis_failed(self, e):
+        log.warning(f"[LLMCache] Redis unavailable, using local tier only for {_REDIS_RETRY_SECONDS}s: {e}")
+        self._redis_down_until = time.monotonic() + _REDIS_RETRY_SECONDS
+
+    def _count(self, tool: str, field: str):
+        tool = tool or "default"
+        with self._lock:
+            node = self._stats.setdefault(tool, {"hits_local": 0, "hits_redis": 0, "misses": 0})
+            node[field] = node.get(field, 0) + 1
+        r = self._client()
+        if r is not None:
+            try:
+                r.hincrby(_REDIS_STATS_KEY, f"{tool}:{field}", 1)
+            except Exception as e:
+                self._redis_failed(e)
+
+    # ---------- get / set ----------
+    def get(self, key: str, tool: str = None):
+        """Cached response dict or None."""
+        if not self.enabled:
+            return None
+        payload = self._local.get(key)
+        if payload is not None:
+            self._count(tool, "hits_local")
+            return json.loads(payload)
+
+        r = self._client()
+        if r is not None:
+            try:
+                payload = r.get(_REDIS_PREFIX + key)
+            except Exception as e:
+                self._redis_failed(e)
+                payload = None
+            if payload is not None:
+                # promote to the local tier for the rest of this process
+                self._local.set(key, payload, ttl_for(tool))
+                self._count(tool, "hits_redis")
+                return json.loads(payload)
+
+        self._count(tool, "misses")
+        return None
+
+    def set(self, key: str, value: dict, tool: str = None):
+        if not self.enabled:
+            return
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        if len(payload) > MAX_ENTRY_BYTES:
+            return
+        ttl = ttl_for(tool)
+        self._local.set(key, payload, ttl)
+        r = self._client()
+        if r is not None:
+            try:
+                r.set(_REDIS_PREFIX + key, payload, ex=ttl)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def count(self, tool: str, field: str):
+        """Bump a named counter (e.g. "coalesced_local") shown alongside hits/misses."""
+        self._count(tool, field)
+
+    def stats(self) -> dict:
+        """Hit/miss counters: this process, plus cluster-wide totals in Redis mode."""
+        with self._lock:
+            out = {
+                "backend": self.backend,
+                "local_entries": len(self._local) if self._local else 0,
+                "local_bytes": self._local.bytes if self._local else 0,
+                "process": {k: dict(v) for k, v in self._stats.items()},
+            }
+        r = self._client()
+        if r is not None:
+            try:
+                cluster = {}
+                for field, val in (r.hgetall(_REDIS_STATS_KEY) or {}).items():
+                    tool, _, name = field.rpartition(":")
+                    cluster.setdefault(tool, {})[name] = int(val)
+                out["cluster"] = cluster
+            except Exception as e:
+                self._redis_failed(e)
+        return out
+
+
+
+class _Flight:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical LLM requests.
+
+    Within a process, followers wait on the leader's Event and share its result
+    (or its exception). Across gunicorn/celery workers, the leader holds
+    `llm_flight:<key>` in Redis (SET NX, expiring after `wait` seconds) and
+    publishes its response under `llm_flight_result:<key>`; followers poll
+    for it. If the leader dies or fails, followers fall back to their own call.
+    """
+    def __init__(self, cache: LLMCache, enabled: bool = SINGLE_FLIGHT):
+        self._cache = cache
+        self.enabled = enabled
+        self._flights = {}
+        self._lock = Lock()
+        self._unlock = None
+
+    def do(self, key: str, fn, wait: float, tool: str = None) -> dict:
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(wait):
+                if flight.error is not None:
+                    raise flight.error
+                self._cache.count(tool, "coalesced_local")
+                return flight.result
+            return fn()
+
+        try:
+            flight.result = self._lead(key, fn, wait, tool)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _lead(self, key: str, fn, wait: float, tool: str = None) -> dict:
+        r = self._cache._client()
+        if r is None:
+            return fn()
+        lock_key = _FLIGHT_LOCK_PREFIX + key
+        result_key = _FLIGHT_RESULT_PREFIX + key
+        token = f"{os.getpid()}:{time.monotonic()}"
+        try:
+            owner = r.set(lock_key, token, nx=True, px=max(1, int(wait * 1000)))
+        except Exception as e:
+            self._cache._redis_failed(e)
+            return fn()
+
+        if owner:
+            try:
+                # a result left by an earlier flight must not be mistaken for this one's
+                r.delete(result_key)
+            except Exception as e:
+                self._cache._redis_failed(e)
+            try:
+                result = fn()
+                try:
+                    r.set(result_key, json.dumps(result, ensure_ascii=False), ex=_FLIGHT_RESULT_TTL)
+                except Exception as e:
+                    self._cache._redis_failed(e)
+                return result
+            finally:
+                try:
+                    if self._unlock is None:
+                        self._unlock = r.register_script(_UNLOCK_LUA)
+                    self._unlock(keys=[lock_key], args=[token])
+                except Exception as e:
+                    self._cache._redis_failed(e)
+
+        # another worker is already asking the same question
+        deadline = time.monotonic() + wait
+        try:
+            while time.monotonic() < deadline:
+                payload = r.get(result_key)
+                if payload is not None:
+                    self._cache.count(tool, "coalesced_redis")
+                    return json.loads(payload)
+                if not r.exists(lock_key):
+                    payload = r.get(result_key)
+                    if payload is not None:
+                        self._cache.count(tool, "coalesced_redis")
+                        return json.loads(payload)
+                    break
+                time.sleep(_FLIGHT_POLL_SECONDS)
+        except Exception as e:
+            self._cache._redis_failed(e)
+        return fn()
+
+
+llm_cache = LLMCache()
+single_flight = SingleFlight(llm_cache)
@@ -0,0 +1,418 @@
+import os
+import json
+import time
+import queue
+import logging
+from threading import Lock, Semaphore, Thread
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.openai_key_manager import key_manager
+from app.services.llm_cache import llm_cache, single_flight, make_key, DETERMINISTIC_MAX_TEMPERATURE
+
+log = logging.getLogger(__name__)
+
+OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
+DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
+
+# Connections kept alive per Azure slot (roughly: max concurrent calls per slot per process)
+POOL_MAXSIZE = int(os.getenv("LLM_POOL_MAXSIZE", "32"))
+# Attempts per call; each attempt goes to the next slot handed out by key_manager
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "2"))
+
+# Hedging: if a call outlives the slot's p95 latency, send the same request to a
+# second healthy slot and take whichever answer lands first. Off unless the call
+# (or LLM_HEDGE=1) asks for it.
+HEDGE_DEFAULT = os.getenv("LLM_HEDGE", "0") in ("1", "true", "True")
+HEDGE_P95_MULTIPLIER = float(os.getenv("LLM_HEDGE_P95_MULTIPLIER", "1.0"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "5"))
+# Spend caps: hedges per hedge-eligible call, and concurrent hedges per process
+HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+HEDGE_MAX_INFLIGHT = int(os.getenv("LLM_HEDGE_MAX_INFLIGHT", "4"))
+
+
+class LLMError(Exception):
+    """A chat completion failed. `status` is the HTTP status when there was one."""
+    def __init__(self, message: str, status: int = None, slot: int = None):
+        super().__init__(message)
+        self.status = status
+        self.slot = slot
+
+
+class RateLimitError(LLMError):
+    """Azure returned 429 for this slot. `retry_after` is Azure's hint in seconds, if any."""
+    def __init__(self, message: str, status: int = None, slot: int = None, retry_after: float = None):
+        super().__init__(message, status=status, slot=slot)
+        self.retry_after = retry_after
+
+
+class TransientError(LLMError):
+    """5xx, timeout or connection failure; safe to retry on another slot."""
+
+
+class LLMGateway:
+    """
+    Thread-safe Azure OpenAI chat client shared by every service.
+
+    Credentials are taken from `key_manager` per call and sent as request headers,
+    so nothing on the global `openai` module is mutated and one process can run
+    many calls at once. Each Azure slot gets its own keep-alive `requests.Session`.
+    """
+
+    def __init__(self, manager=key_manager, api_version: str = OPENAI_API_VERSION):
+        self._manager = manager
+        self.api_version = api_version
+        self._sessions = {}
+        self._pid = os.getpid()
+        self._lock = Lock()
+        self._hedge_slots = Semaphore(HEDGE_MAX_INFLIGHT)
+        self._hedge_stats = {
+            "eligible": 0,        # calls that could hedge
+            "hedged": 0,          # hedges actually sent
+            "wins_primary": 0,
+            "wins_hedge": 0,
+            "capped": 0,          # hedge wanted but over the ratio/in-flight cap
+            "no_slot": 0,         # hedge wanted but no other healthy slot
+        }
+
+    # ---------- HTTP sessions ----------
+    def _session(self, idx: int) -> requests.Session:
+        with self._lock:
+            # Never share pooled sockets across a fork (gunicorn / celery prefork)
+            if self._pid != os.getpid():
+                self._sessions = {}
+                self._pid = os.getpid()
+            s = self._sessions.get(idx)
+            if s is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                self._sessions[idx] = s
+            return s
+
+    def _url(self, api_base: str, deployment: str) -> str:
+        return (
+            f"{api_base.rstrip('/')}/openai/deployments/{deployment}/chat/completions"
+            f"?api-version={self.api_version}"
+        )
+
+    # ---------- Calls ----------
+    def _post(self, idx: int, api_key: str, api_base: str, deployment: str, body: dict, timeout: float) -> dict:
+        try:
+            r = self._session(idx).post(
+                self._url(api_base, deployment),
+                headers={"api-key": api_key, "Content-Type": "application/json"},
+                json=body,
+                timeout=timeout,
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise TransientError(f"slot #{idx}: {e}", slot=idx) from e
+
+        if r.status_code != 200:
+            self._raise_for_status(idx, r)
+        return r.json()
+
+    @staticmethod
+    def _raise_for_status(idx: int, r):
+        if r.status_code == 429:
+            try:
+                retry_after = float(r.headers.get("Retry-After") or 0) or None
+            except ValueError:
+                retry_after = None
+            raise RateLimitError(f"slot #{idx}: {r.text[:300]}", status=429, slot=idx, retry_after=retry_after)
+        if r.status_code >= 500:
+            raise TransientError(f"slot #{idx} [{r.status_code}]: {r.text[:300]}", status=r.status_code, slot=idx)
+        if r.status_code != 200:
+            raise LLMError(f"slot #{idx} [{r.status_code}]: {r.text[:300]}", status=r.status_code, slot=idx)
+
+    @staticmethod
+    def estimate_tokens(messages, max_tokens: int = None) -> int:
+        """Rough prompt + completion token count for rate limiting (~4 chars per token)."""
+        chars = sum(len(m.get("content") or "") for m in messages)
+        return chars // 4 + 4 * len(messages) + (max_tokens or 0)
+
+    def create(self, messages, deployment: str = None, temperature: float = None,
+               max_tokens: int = None, timeout: float = 30, tool: str = None,
+               cache: bool = None, hedge: bool = None, **extra) -> dict:
+        """
+        Raw chat completion; returns the Azure response JSON
+        ({"choices": [{"message": {"content": ...}}], "usage": {...}}).
+
+        Responses are served from / stored in `llm_cache` when `cache` is True, or
+        when it is None and the call is near-deterministic (temperature <= 0.2).
+        `tool` selects the cache TTL and labels the hit/miss counters. Concurrent
+        identical cacheable calls are coalesced into one upstream request
+        (`single_flight`); sampled calls are independent and always sent.
+        `hedge=True` (for interactive callers) enables tail-latency hedging.
+        """
+        deployment = deployment or DEFAULT_DEPLOYMENT
+        if cache is None:
+            cache = temperature is not None and temperature <= DETERMINISTIC_MAX_TEMPERATURE
+        cache = cache and llm_cache.enabled
+        hedge = HEDGE_DEFAULT if hedge is None else hedge
+        call = self._call_hedged if hedge else self._call
+        if not cache:
+            return call(messages, deployment, temperature, max_tokens, timeout, extra)
+
+        key = make_key(deployment, messages, temperature, max_tokens, extra)
+        hit = llm_cache.get(key, tool)
+        if hit is not None:
+            return hit
+        # identical calls already in flight (this process or another worker) are shared
+        resp = single_flight.do(
+            key,
+            lambda: call(messages, deployment, temperature, max_tokens, timeout, extra),
+            wait=timeout * MAX_ATTEMPTS,
+            tool=tool,
+        )
+        llm_cache.set(key, resp, tool)
+        return resp
+
+    @staticmethod
+    def _body(messages, temperature, max_tokens, extra: dict) -> dict:
+        body = {"messages": messages, **extra}
+        if temperature is not None:
+            body["temperature"] = temperature
+        if max_tokens is not None:
+            body["max_tokens"] = max_tokens
+        return body
+
+    def _attempt(self, slot, deployment: str, body: dict, timeout: float, est_tokens: int) -> dict:
+        """One call on a slot from acquire(): throttle, post, release with the outcome."""
+        api_key, api_base, idx, probe = slot
+        try:
+            waited = self._manager.throttle(idx, est_tokens)
+            if waited:
+                log.debug(f"[LLMGateway] slot #{idx} throttled {waited:.2f}s for {est_tokens} tokens")
+            log.debug(f"[LLMGateway] {deployment} on slot #{idx} ({api_base})")
+            t0 = time.monotonic()
+            resp = self._post(idx, api_key, api_base, deployment, body, timeout)
+        except (RateLimitError, TransientError) as e:
+            self._manager.release(idx, ok=False, retry_after=getattr(e, "retry_after", None), probe=probe)
+            raise
+        except Exception:
+            # bad request etc. -- not the slot's fault
+            self._manager.release(idx, ok=True, probe=probe)
+            raise
+        self._manager.release(idx, ok=True, latency=time.monotonic() - t0, probe=probe)
+        return resp
+
+    def _call(self, messages, deployment: str, temperature, max_tokens, timeout, extra: dict) -> dict:
+        body = self._body(messages, temperature, max_tokens, extra)
+        est_tokens = self.estimate_tokens(messages, max_tokens)
+
+        last_exc = None
+        tried = set()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            # least-loaded healthy slot, avoiding the ones that just failed us
+            slot = self._manager.acquire(exclude=tried)
+            tried.add(slot[2])
+            try:
+                return self._attempt(slot, deployment, body, timeout, est_tokens)
+            except (RateLimitError, TransientError) as e:
+                last_exc = e
+                log.warning(f"[LLMGateway] {e}; rotating slot.")
+        raise last_exc
+
+    # ---------- Hedging ----------
+    def _hedge_delay(self, idx: int, timeout: float) -> float:
+        p95 = self._manager.latency_p95(idx) or self._manager.latency_p95()
+        delay = p95 * HEDGE_P95_MULTIPLIER if p95 else HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, min(delay, timeout * 0.9))
+
+    def _bump(self, name: str):
+        with self._lock:
+            self._hedge_stats[name] += 1
+
+    def _hedge_allowed(self) -> bool:
+        with self._lock:
+            st = self._hedge_stats
+            # the +1 lets an idle process hedge its first slow call
+            within_ratio = st["hedged"] < HEDGE_MAX_RATIO * st["eligible"] + 1
+        if not within_ratio or not self._hedge_slots.acquire(blocking=False):
+            self._bump("capped")
+            return False
+        return True
+
+    def _call_hedged(self, messages, deployment: str, temperature, max_tokens, timeout, extra: dict) -> dict:
+        """
+        Like _call, but if the first attempt is still running after the slot's
+        p95 latency, the same request goes to a second healthy slot and the first
+        answer wins. The loser is abandoned: its thread finishes (or times out)
+        in the background so its slot accounting stays right, and its answer is
+        dropped. A fast retryable failure is retried on another slot as usual.
+        """
+        body = self._body(messages, temperature, max_tokens, extra)
+        est_tokens = self.estimate_tokens(messages, max_tokens)
+        results = queue.Queue()
+
+        def run(slot, hedged):
+            try:
+                results.put((hedged, self._attempt(slot, deployment, body, timeout, est_tokens), None))
+            except Exception as e:
+                results.put((hedged, None, e))
+            finally:
+                if hedged:
+                    self._hedge_slots.release()
+
+        def launch(slot, hedged):
+            tried.add(slot[2])
+            Thread(target=run, args=(slot, hedged), daemon=True).start()
+
+        self._bump("eligible")
+        tried = set()
+        launch(self._manager.acquire(), False)
+        pending, second_sent = 1, False
+        delay = self._hedge_delay(next(iter(tried)), timeout)
+        last_exc = None
+
+        while pending:
+            try:
+                # until the second attempt is out, wake up at the hedge delay
+                hedged, resp, err = results.get(timeout=None if second_sent else delay)
+            except queue.Empty:
+                second_sent = True
+                if not self._hedge_allowed():
+                    continue
+                slot = self._manager.acquire(exclude=tried, healthy_only=True)
+                if slot is None:
+                    self._hedge_slots.release()
+                    self._bump("no_slot")
+                    continue
+                log.info(f"[LLMGateway] hedging {deployment} on slot #{slot[2]} after {delay:.2f}s")
+                self._bump("hedged")
+                launch(slot, True)
+                pending += 1
+                continue
+
+            pending -= 1
+            if err is None:
+                self._bump("wins_hedge" if hedged else "wins_primary")
+                return resp
+            if not isinstance(err, (RateLimitError, TransientError)):
+                raise err
+            last_exc = err
+            log.warning(f"[LLMGateway] {err}; rotating slot.")
+            if not second_sent and len(tried) < MAX_ATTEMPTS:
+                # failed fast: plain retry on another slot (not a hedge)
+                second_sent = True
+                launch(self._manager.acquire(exclude=tried), False)
+                pending += 1
+        raise last_exc
+
+    def hedge_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._hedge_stats,
+                "max_ratio": HEDGE_MAX_RATIO,
+                "max_inflight": HEDGE_MAX_INFLIGHT,
+            }
+
+    def stream(self, messages, deployment: str = None, temperature: float = None,
+               max_tokens: int = None, timeout: float = 30, tool: str = None,
+               cache: bool = None, **extra):
+        """
+        Chat completion with `stream: true`; yields assistant text deltas as they
+        arrive. Slot rotation happens only before the first byte; once tokens
+        flow, an error is raised to the consumer. Cached replies (same rules as
+        `create`) are yielded in one piece, and finished streams are cached.
+        """
+        deployment = deployment or DEFAULT_DEPLOYMENT
+        if cache is None:
+            cache = temperature is not None and temperature <= DETERMINISTIC_MAX_TEMPERATURE
+        cache = cache and llm_cache.enabled
+        key = make_key(deployment, messages, temperature, max_tokens, extra) if cache else None
+        if cache:
+            hit = llm_cache.get(key, tool)
+            if hit is not None:
+                yield hit["choices"][0]["message"].get("content") or ""
+                return
+
+        body = self._body(messages, temperature, max_tokens, {"stream": True, **extra})
+        est_tokens = self.estimate_tokens(messages, max_tokens)
+
+        last_exc = None
+        tried = set()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            api_key, api_base, idx, probe = self._manager.acquire(exclude=tried)
+            tried.add(idx)
+            t0 = time.monotonic()
+            try:
+                self._manager.throttle(idx, est_tokens)
+                r = self._open_stream(idx, api_key, api_base, deployment, body, timeout)
+            except (RateLimitError, TransientError) as e:
+                self._manager.release(idx, ok=False, retry_after=getattr(e, "retry_after", None), probe=probe)
+                last_exc = e
+                log.warning(f"[LLMGateway] {e}; rotating slot.")
+                continue
+            except Exception:
+                self._manager.release(idx, ok=True, probe=probe)
+                raise
+
+            parts = []
+            ok = True
+            try:
+                for delta in self._iter_deltas(r):
+                    if not parts:
+                        self._manager.record_ttft(idx, time.monotonic() - t0)
+                    parts.append(delta)
+                    yield delta
+            except requests.RequestException:
+                ok = False  # the connection broke mid-stream
+                raise
+            finally:
+                r.close()
+                # the slot carries the call until the stream ends (or the consumer stops
+                # reading); a stream's length depends on its output, so no latency sample
+                self._manager.release(idx, ok=ok, probe=probe)
+            if cache:
+                llm_cache.set(key, {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]}, tool)
+            return
+        raise last_exc
+
+    def _open_stream(self, idx: int, api_key: str, api_base: str, deployment: str, body: dict, timeout: float):
+        try:
+            r = self._session(idx).post(
+                self._url(api_base, deployment),
+                headers={"api-key": api_key, "Content-Type": "application/json"},
+                json=body,
+                timeout=timeout,
+                stream=True,
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise TransientError(f"slot #{idx}: {e}", slot=idx) from e
+        if r.status_code != 200:
+            try:
+                self._raise_for_status(idx, r)
+            finally:
+                r.close()
+        return r
+
+    @staticmethod
+    def _iter_deltas(r):
+        """Content deltas from an Azure SSE chat stream."""
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            for choice in chunk.get("choices") or []:
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+    def chat(self, messages, **kwargs) -> str:
+        """Chat completion returning the stripped assistant message text."""
+        resp = self.create(messages, **kwargs)
+        return (resp["choices"][0]["message"].get("content") or "").strip()
+
+
+gateway = LLMGateway()
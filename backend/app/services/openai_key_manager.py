@@ -1,5 +1,7 @@
 import os
-from itertools import cycle
+import time
+from collections import deque
+from itertools import count
 from threading import Lock
 
 # Optional Redis coordination (safe across multiple machines)
@@ -9,6 +11,104 @@ if _USE_REDIS:
     import redis
     _r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
 
+
+def _split_limits(varname, n):
+    """
+    Per-slot quota from a CSV env var. One value applies to every slot;
+    otherwise there must be one value per slot. 0/empty means unlimited.
+    """
+    vals = [v.strip() for v in os.getenv(varname, "").split(",") if v.strip()]
+    if not vals:
+        return [0] * n
+    if len(vals) == 1:
+        return [int(vals[0])] * n
+    if len(vals) != n:
+        raise ValueError(f"{varname} must have 1 value or one per Azure slot ({n}).")
+    return [int(v) for v in vals]
+
+
+class _TokenBucket:
+    """
+    Continuously refilling bucket holding one minute of quota.
+    `reserve(n)` always takes the tokens (the balance may go negative) and returns
+    how long the caller must wait before using them, so callers queue fairly and
+    never sleep longer than the quota requires.
+    """
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.ts = time.monotonic()
+        self._lock = Lock()
+
+    def reserve(self, n: float) -> float:
+        n = min(float(n), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            self.tokens -= n
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+# Same algorithm as _TokenBucket, atomically in Redis so all workers share one bucket.
+# KEYS[i] -> bucket hash, ARGV -> (per_minute, n) pairs. Returns the longest wait in ms.
+_RESERVE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local cap = tonumber(ARGV[2 * i - 1])
+  local n = math.min(tonumber(ARGV[2 * i]), cap)
+  local rate = cap / 60
+  local st = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(st[1]) or cap
+  local ts = tonumber(st[2]) or now
+  tokens = math.min(cap, tokens + (now - ts) * rate) - n
+  redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+  redis.call('EXPIRE', key, 120)
+  if tokens < 0 then
+    wait = math.max(wait, math.ceil(-tokens / rate * 1000))
+  end
+end
+return wait
+"""
+
+
+# Circuit breaker: open a slot after N consecutive failures (429/5xx/timeouts) for a cooldown
+# that doubles on repeated trips. After the cooldown one trial call is let through (half-open):
+# the first caller to pick the slot claims a probe lease, everyone else treats the slot as open
+# until that call is released with probe=True (or the lease lapses, if its caller died).
+BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN_SECONDS", "30"))
+BREAKER_MAX_COOLDOWN = float(os.getenv("OPENAI_BREAKER_MAX_COOLDOWN_SECONDS", "300"))
+BREAKER_PROBE_LEASE = float(os.getenv("OPENAI_BREAKER_PROBE_LEASE_SECONDS", "120"))
+_EWMA_ALPHA = 0.2
+# Redis mode: each in-flight call is a lease (member of a per-slot sorted set, scored by start
+# time). Leases older than this are pruned on read, so calls lost with a killed worker stop
+# counting as load instead of pinning the slot forever.
+INFLIGHT_LEASE_SECONDS = 300
+
+
+class _SlotHealth:
+    """Per-process view of one slot: load, latency and recent errors."""
+    def __init__(self):
+        self.in_flight = 0
+        self.latency_ewma = 1.0          # seconds; optimistic prior so new slots get traffic
+        self.error_rate = 0.0            # EWMA of failures in [0, 1]
+        self.consecutive_failures = 0
+        self.open_until = 0.0            # monotonic deadline while the breaker is open
+        self.probe_until = 0.0           # half-open: trial call claimed (lease deadline)
+        self.requests = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=200)
+        self.ttfts = deque(maxlen=200)   # streamed calls: time to first token
+
+    def score(self, in_flight: int) -> float:
+        # Expected wait if we queue here: load x latency, penalised by recent errors
+        return (in_flight + 1) * self.latency_ewma * (1.0 + 4.0 * self.error_rate)
+
+
 class OpenAIKeyManager:
     def __init__(self):
         keys = [k.strip() for k in os.getenv("AZURE_OPENAI_API_KEYS", "").split(",") if k.strip()]
@@ -21,22 +121,290 @@ class OpenAIKeyManager:
         self._bases = bases
         self._n = len(keys)
 
-        # Local in-process cycle (fine when a single box or you don’t require cross-worker sync)
-        self._cycle = cycle(range(self._n))
+        # Rotating tie-breaker so equally loaded slots still share traffic
+        self._rr = count()
         self._lock = Lock()
+        self._health = [_SlotHealth() for _ in range(self._n)]
+        self._leases = [deque() for _ in range(self._n)]  # this process's Redis in-flight leases
+        self._lease_ids = count()
+
+        # Per-slot quotas (requests/min, tokens/min) as provisioned on each Azure deployment
+        self._rpm = _split_limits("AZURE_OPENAI_RPM_LIMITS", self._n)
+        self._tpm = _split_limits("AZURE_OPENAI_TPM_LIMITS", self._n)
+        self._rpm_buckets = [_TokenBucket(v) if v else None for v in self._rpm]
+        self._tpm_buckets = [_TokenBucket(v) if v else None for v in self._tpm]
+        self._reserve_script = _r.register_script(_RESERVE_LUA) if (_USE_REDIS and _r) else None
+
+    def get_next(self, exclude=()):
+        """
+        Returns (api_key, api_base, index) of the least-loaded healthy slot.
+        Slots whose breaker is open are skipped; if every slot is open, the one
+        reopening soonest is returned. Use acquire()/release() to also track load.
+        Redis mode: in-flight counts and breaker state are shared by all workers.
+        """
+        idx, _ = self._pick(exclude)
+        return self._keys[idx], self._bases[idx], idx
+
+    def acquire(self, exclude=(), healthy_only: bool = False):
+        """
+        get_next() + mark the call in flight: (api_key, api_base, index, probe).
+        Always pair with release(index, ..., probe=probe); probe is True for the
+        trial call of a half-open slot, whose release decides the breaker.
+        With healthy_only=True, returns None instead of falling back to an
+        excluded or breaker-open slot (used for optional work such as hedges).
+        """
+        idx, probe = self._pick(exclude, healthy_only=healthy_only)
+        if idx is None:
+            return None
+        with self._lock:
+            self._health[idx].in_flight += 1
+            lease = f"{os.getpid()}:{next(self._lease_ids)}"
+            self._leases[idx].append(lease)
+        if _USE_REDIS and _r:
+            pipe = _r.pipeline()
+            pipe.zadd(f"openai_slot_leases:{idx}", {lease: time.time()})
+            pipe.expire(f"openai_slot_leases:{idx}", INFLIGHT_LEASE_SECONDS)
+            pipe.execute()
+        return self._keys[idx], self._bases[idx], idx, probe
 
-    def get_next(self):
+    def release(self, idx: int, ok: bool, latency: float = None, retry_after: float = None,
+                probe: bool = False):
         """
-        Returns (api_key, api_base, index)
-        Local mode: thread-safe round-robin.
-        Redis mode: cluster-safe round-robin using atomic INCR.
+        Record the outcome of a call on slot `idx`.
+        `ok=False` is for throttling/availability failures (429, 5xx, timeouts) only;
+        bad requests say nothing about slot health and should be released as ok.
+        `probe` is what acquire() returned; only the trial call gives the probe lease back.
         """
+        now = time.monotonic()
+        with self._lock:
+            h = self._health[idx]
+            h.in_flight = max(0, h.in_flight - 1)
+            lease = self._leases[idx].popleft() if self._leases[idx] else None
+            if probe:
+                h.probe_until = 0.0  # the trial call has its answer
+            h.requests += 1
+            h.error_rate += _EWMA_ALPHA * ((0.0 if ok else 1.0) - h.error_rate)
+            if latency is not None and ok:
+                h.latency_ewma += _EWMA_ALPHA * (latency - h.latency_ewma)
+                h.latencies.append(latency)
+            if ok:
+                h.consecutive_failures = 0
+                h.open_until = 0.0
+                cooldown = None
+            else:
+                h.failures += 1
+                h.consecutive_failures += 1
+                cooldown = self._cooldown(h.consecutive_failures, retry_after)
+                if cooldown:
+                    h.open_until = now + cooldown
+
         if _USE_REDIS and _r:
-            idx = int(_r.incr("openai_key_index")) % self._n
-            return self._keys[idx], self._bases[idx], idx
+            pipe = _r.pipeline()
+            if lease:
+                pipe.zrem(f"openai_slot_leases:{idx}", lease)
+            if probe:
+                pipe.delete(f"openai_slot_probe:{idx}")
+            if ok:
+                pipe.delete(f"openai_slot_failures:{idx}", f"openai_slot_open:{idx}")
+                pipe.execute()
+            else:
+                pipe.incr(f"openai_slot_failures:{idx}")
+                pipe.expire(f"openai_slot_failures:{idx}", 600)
+                fails = int(pipe.execute()[-2])  # the INCR
+                cooldown = self._cooldown(fails, retry_after)
+                if cooldown:
+                    _r.set(f"openai_slot_open:{idx}", 1, px=int(cooldown * 1000))
+
+    @staticmethod
+    def _cooldown(consecutive_failures: int, retry_after: float = None):
+        if consecutive_failures < BREAKER_THRESHOLD:
+            return None
+        trips = consecutive_failures - BREAKER_THRESHOLD
+        cooldown = min(BREAKER_MAX_COOLDOWN, BREAKER_COOLDOWN * (2 ** min(trips, 8)))
+        return max(cooldown, retry_after or 0.0)
+
+    def _shared_state(self):
+        """Redis mode: ([in_flight], [open_ttl_seconds], [consecutive_failures], [probe_ttl_seconds]) across all workers."""
+        n = self._n
+        pipe = _r.pipeline()
+        stale = time.time() - INFLIGHT_LEASE_SECONDS
+        for i in range(n):
+            pipe.zremrangebyscore(f"openai_slot_leases:{i}", "-inf", stale)
+        for i in range(n):
+            pipe.zcard(f"openai_slot_leases:{i}")
+        for i in range(n):
+            pipe.pttl(f"openai_slot_open:{i}")
+        for i in range(n):
+            pipe.get(f"openai_slot_failures:{i}")
+        for i in range(n):
+            pipe.pttl(f"openai_slot_probe:{i}")
+        res = pipe.execute()[n:]  # drop the prune results
+        in_flight = [int(v) for v in res[:n]]
+        open_ttl = [max(0, int(v)) / 1000.0 for v in res[n:2 * n]]
+        failures = [int(v or 0) for v in res[2 * n:3 * n]]
+        probe_ttl = [max(0, int(v)) / 1000.0 for v in res[3 * n:]]
+        return in_flight, open_ttl, failures, probe_ttl
+
+    def _pick(self, exclude=(), healthy_only: bool = False):
+        """(slot, probe): probe is True when the slot is half-open and this call claimed its trial."""
+        exclude = set(exclude)
+        while True:
+            idx, half_open = self._choose(exclude, healthy_only)
+            if idx is None or not half_open:
+                return idx, False
+            if self._claim_probe(idx):
+                return idx, True
+            exclude.add(idx)  # another caller got the trial call first
+
+    def _half_open(self, h, fails: int) -> bool:
+        return max(h.consecutive_failures, fails) >= BREAKER_THRESHOLD
+
+    def _claim_probe(self, idx: int) -> bool:
+        """Take the single trial call of a half-open slot (local lease, plus a Redis one when shared)."""
+        now = time.monotonic()
+        with self._lock:
+            h = self._health[idx]
+            if h.probe_until > now:
+                return False
+            h.probe_until = now + BREAKER_PROBE_LEASE
+        if _USE_REDIS and _r and not _r.set(f"openai_slot_probe:{idx}", 1, nx=True, px=int(BREAKER_PROBE_LEASE * 1000)):
+            with self._lock:
+                h.probe_until = 0.0
+            return False
+        return True
+
+    def _choose(self, exclude, healthy_only: bool):
+        """(slot, is_half_open) of the best candidate; (None, False) when healthy_only finds none."""
+        now = time.monotonic()
+        shared = self._shared_state() if (_USE_REDIS and _r) else None
+        with self._lock:
+            offset = next(self._rr)
+            best, best_score = None, None
+            soonest, soonest_at = None, None
+            for j in range(self._n):
+                i = (offset + j) % self._n
+                if i in exclude:
+                    continue
+                h = self._health[i]
+                in_flight = shared[0][i] if shared else h.in_flight
+                fails = shared[2][i] if shared else 0
+                reopen_in = max(shared[1][i], h.open_until - now) if shared else h.open_until - now
+                if self._half_open(h, fails):
+                    # a claimed trial call keeps the slot closed to everyone else
+                    reopen_in = max(reopen_in, h.probe_until - now, shared[3][i] if shared else 0.0)
+                if reopen_in > 0:
+                    if soonest_at is None or reopen_in < soonest_at:
+                        soonest, soonest_at = i, reopen_in
+                    continue
+                sc = h.score(in_flight)
+                if best_score is None or sc < best_score:
+                    best, best_score = i, sc
+            half_open = {i: self._half_open(self._health[i], shared[2][i] if shared else 0) for i in (best, soonest) if i is not None}
+        if best is not None:
+            return best, half_open[best]
+        if healthy_only:
+            return None, False
+        if soonest is not None:
+            # everything open: wait on the slot reopening soonest, without claiming its trial call
+            return soonest, False
+        # everything excluded: fall back to plain rotation
+        return offset % self._n, False
 
+    def record_ttft(self, idx: int, seconds: float):
+        """Time to first token of a streamed call on slot `idx` (its release carries no latency)."""
         with self._lock:
-            idx = next(self._cycle)
-            return self._keys[idx], self._bases[idx], idx
+            self._health[idx].ttfts.append(seconds)
+
+    # ---------- Introspection ----------
+    def latency_p95(self, idx: int = None) -> float:
+        """p95 latency (seconds) of recent successful calls on one slot, or all slots."""
+        return self._p95("latencies", idx)
+
+    def ttft_p95(self, idx: int = None) -> float:
+        """p95 time to first token (seconds) of recent streamed calls on one slot, or all slots."""
+        return self._p95("ttfts", idx)
+
+    def _p95(self, series: str, idx: int = None) -> float:
+        with self._lock:
+            if idx is None:
+                samples = [x for h in self._health for x in getattr(h, series)]
+            else:
+                samples = list(getattr(self._health[idx], series))
+        if not samples:
+            return None
+        samples.sort()
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+    def snapshot(self):
+        """Per-slot health for the /api/llm/slots endpoint (no secrets)."""
+        now = time.monotonic()
+        shared = self._shared_state() if (_USE_REDIS and _r) else None
+        out = []
+        for i in range(self._n):
+            p95 = self.latency_p95(i)
+            ttft = self.ttft_p95(i)
+            with self._lock:
+                h = self._health[i]
+                reopen_in = h.open_until - now
+                if shared:
+                    reopen_in = max(reopen_in, shared[1][i])
+                if reopen_in > 0:
+                    state = "open"
+                elif self._half_open(h, shared[2][i] if shared else 0):
+                    state = "half_open"
+                else:
+                    state = "closed"
+                out.append({
+                    "slot": i,
+                    "api_base": self._bases[i],
+                    "state": state,
+                    "reopens_in_s": round(max(0.0, reopen_in), 1),
+                    "in_flight": shared[0][i] if shared else h.in_flight,
+                    "latency_ewma_ms": int(h.latency_ewma * 1000),
+                    "latency_p95_ms": int(p95 * 1000) if p95 is not None else None,
+                    "ttft_p95_ms": int(ttft * 1000) if ttft is not None else None,
+                    "error_rate": round(h.error_rate, 3),
+                    "consecutive_failures": h.consecutive_failures,
+                    "requests": h.requests,
+                    "failures": h.failures,
+                    "rpm_limit": self._rpm[i] or None,
+                    "tpm_limit": self._tpm[i] or None,
+                })
+        return out
+
+    # ---------- Rate limiting ----------
+    def reserve(self, idx: int, tokens: int) -> float:
+        """
+        Take one request and `tokens` tokens from slot `idx`'s buckets.
+        Returns seconds to wait before sending (0 when within quota).
+        Redis mode: buckets are shared by every worker; local mode: per process.
+        """
+        rpm, tpm = self._rpm[idx], self._tpm[idx]
+        if not rpm and not tpm:
+            return 0.0
+
+        if self._reserve_script is not None:
+            keys, args = [], []
+            if rpm:
+                keys.append(f"openai_bucket:{idx}:rpm")
+                args += [rpm, 1]
+            if tpm:
+                keys.append(f"openai_bucket:{idx}:tpm")
+                args += [tpm, int(tokens)]
+            return int(self._reserve_script(keys=keys, args=args)) / 1000.0
+
+        wait = 0.0
+        if self._rpm_buckets[idx]:
+            wait = max(wait, self._rpm_buckets[idx].reserve(1))
+        if self._tpm_buckets[idx]:
+            wait = max(wait, self._tpm_buckets[idx].reserve(tokens))
+        return wait
+
+    def throttle(self, idx: int, tokens: int) -> float:
+        """Block only as long as slot `idx`'s quota requires. Returns the time slept."""
+        wait = self.reserve(idx, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
 
-key_manager = OpenAIKeyManager()
\ No newline at end of file
+key_manager = OpenAIKeyManager()
@@ -0,0 +1,105 @@
+import os
+import json
+import logging
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from app.utils.token_budget import count_tokens
+
+log = logging.getLogger(__name__)
+
+# Prompt tokens packed into one request, and a hard cap on pages per request
+PACK_PROMPT_TOKENS = int(os.getenv("LLM_PACK_PROMPT_TOKENS", "8000"))
+PACK_MAX_PAGES = int(os.getenv("LLM_PACK_MAX_PAGES", "16"))
+# Completion budget for one packed request
+PACK_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_PACK_MAX_OUTPUT_TOKENS", "3500"))
+
+
+def pack_pages(pages: List[Tuple[Hashable, str]], out_tokens_per_page: int,
+               prompt_tokens: int = PACK_PROMPT_TOKENS, max_pages: int = PACK_MAX_PAGES,
+               max_output_tokens: int = PACK_MAX_OUTPUT_TOKENS) -> List[List[Tuple[Hashable, str]]]:
+    """Greedily group (key, text) pages, in order, into batches that fit the prompt and output budgets."""
+    max_pages = max(1, min(max_pages, max_output_tokens // max(1, out_tokens_per_page)))
+    batches, cur, cur_tokens = [], [], 0
+    for key, text in pages:
+        t = count_tokens(text) + 8  # + page header
+        if cur and (cur_tokens + t > prompt_tokens or len(cur) >= max_pages):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append((key, text))
+        cur_tokens += t
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def render_pages(batch: List[Tuple[Hashable, str]]) -> str:
+    """Pages as delimited, id-tagged sections for a packed prompt."""
+    return "\n\n".join(f"### PAGE id={key}\n{text}" for key, text in batch)
+
+
+def extract_json(raw: str, kind: type = dict):
+    """
+    The JSON object (kind=dict) or array (kind=list) in a model reply, tolerating
+    code fences / chatter around it; None if there is none.
+    """
+    opening, closing = ("{", "}") if kind is dict else ("[", "]")
+    raw = raw or ""
+    start, end = raw.find(opening), raw.rfind(closing)
+    if start == -1 or end <= start:
+        return None
+    try:
+        value = json.loads(raw[start:end + 1])
+    except Exception:
+        return None
+    return value if isinstance(value, kind) else None
+
+
+def parse_keyed_array(raw: str) -> Dict[str, Any]:
+    """Map str(id) -> item for a JSON array of {"id": ..., ...} objects; {} if unparseable."""
+    out = {}
+    for item in extract_json(raw, list) or []:
+        if isinstance(item, dict) and item.get("id") is not None:
+            out[str(item["id"])] = item
+    return out
+
+
+def run_packed(pages: List[Tuple[Hashable, str]],
+               call_batch: Callable[[List[Tuple[Hashable, str]], int], str],
+               parse_item: Callable[[Dict[str, Any]], Any],
+               single: Callable[[str], Any],
+               out_tokens_per_page: int,
+               on_batch: Optional[Callable[[Dict[Hashable, Any]], None]] = None) -> Dict[Hashable, Any]:
+    """
+    Run a per-page tool over many pages with as few requests as the budgets allow.
+
+    `call_batch(batch, max_tokens)` sends one packed prompt and returns the raw
+    reply, which must be a JSON array keyed by page id. `parse_item` turns one
+    array item into the page result (raising on bad items). Pages missing from
+    the reply or failing to parse are retried alone through `single(text)`;
+    a failed request is raised to the caller. `on_batch` receives each
+    batch's {key: result} as soon as it is done (for persistence / progress).
+    """
+    results: Dict[Hashable, Any] = {}
+    for batch in pack_pages(pages, out_tokens_per_page):
+        if len(batch) == 1:
+            key, text = batch[0]
+            results[key] = single(text)
+        else:
+            # request errors (rate limits etc.) propagate; only bad items are retried
+            items = parse_keyed_array(call_batch(batch, out_tokens_per_page * len(batch) + 50))
+
+            retried = 0
+            for key, text in batch:
+                item = items.get(str(key))
+                try:
+                    if item is None:
+                        raise ValueError("missing from packed reply")
+                    results[key] = parse_item(item)
+                except Exception:
+                    retried += 1
+                    results[key] = single(text)
+            if retried:
+                log.info(f"[PagePacking] {retried}/{len(batch)} pages retried individually")
+
+        if on_batch:
+            on_batch({key: results[key] for key, _ in batch})
+    return results
@@ -0,0 +1,192 @@
+"""
+Content-addressed store of per-page tool results (PageResult). A result is keyed
+by the page text, the tool, its parameters and the model, never by user or file,
+so an upload containing pages that were analysed before (the same textbook, a
+new edition sharing most of its pages) gets those results without an LLM call.
+
+Authorization stays where it was: callers only look up text they reached
+through the user's own FilePage/UploadedFile rows, and a stored result reveals
+nothing that text didn't.
+
+Tool names carry a version ("segmenter/v1"); bump it when a prompt or the output
+shape changes, so older results stop matching. refresh=True (a task's `force`)
+skips the lookup and replaces the stored result with the new one.
+
+Only deterministic output belongs here for good. Sampled tools (temperature
+above 0.2) either stay out (creative prompts) or, like the summarizer, have
+their results expire after TOOL_TTLS.
+"""
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import db
+from app.models import PageResult
+
+log = logging.getLogger(__name__)
+
+STORE_ENABLED = os.getenv("PAGE_RESULT_STORE", "true").lower() == "true"
+_QUERY_BATCH = 500  # keys per IN (...) lookup
+
+# Seconds a sampled tool's result is reused (by tool name without version); tools not
+# listed never expire. Override with PAGE_RESULT_TTL_<TOOL>, e.g. PAGE_RESULT_TTL_SUMMARIZER.
+TOOL_TTLS = {
+    "summarizer": 7 * 24 * 3600,
+}
+
+
+class _Unstored:
+    """Marks a result handed back to the caller but never stored (see unstored)."""
+
+
+class _UnstoredDict(_Unstored, dict):
+    pass
+
+
+class _UnstoredList(_Unstored, list):
+    pass
+
+
+class _UnstoredStr(_Unstored, str):
+    pass
+
+
+def unstored(result):
+    """
+    For compute() fallbacks, such as the guess a tool makes when the model's
+    reply fails to parse: the caller gets the result as usual, but it is not
+    stored, so the next upload of the page asks the model again.
+    """
+    for cls in (_UnstoredDict, _UnstoredList, _UnstoredStr):
+        if isinstance(result, cls.__bases__[1]):
+            return cls(result)
+    raise TypeError(f"unstored() takes a dict, list or str, not {type(result).__name__}")
+
+
+def ttl_for(tool: str) -> Optional[int]:
+    name = (tool or "").split("/")[0]
+    env = os.getenv(f"PAGE_RESULT_TTL_{name.upper()}")
+    return int(env) if env else TOOL_TTLS.get(name)
+
+
+def _expired(tool: str, created_at, now: datetime) -> bool:
+    ttl = ttl_for(tool)
+    return ttl is not None and (created_at is None or created_at < now - timedelta(seconds=ttl))
+
+
+def result_key(text: str, tool: str, params: Optional[Dict[str, Any]] = None, model: str = None) -> str:
+    text_hash = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    ident = json.dumps([tool, model, params or {}, text_hash], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+
+def _session():
+    # its own session, so a failed write never rolls back the caller's pending changes
+    return Session(db.engine)
+
+
+def get_results(keys: Iterable[str]) -> Dict[str, Any]:
+    """{key: result} for the keys that have a stored, unexpired result."""
+    keys = list(dict.fromkeys(keys))
+    if not STORE_ENABLED or not keys:
+        return {}
+    found, now = {}, datetime.utcnow()
+    try:
+        with _session() as s:
+            for i in range(0, len(keys), _QUERY_BATCH):
+                rows = (s.query(PageResult.key, PageResult.result, PageResult.tool, PageResult.created_at)
+                        .filter(PageResult.key.in_(keys[i:i + _QUERY_BATCH])))
+                found.update((key, result) for key, result, tool, created_at in rows
+                             if not _expired(tool, created_at, now))
+    except Exception as e:
+        log.warning(f"[page-results] lookup failed: {e}")
+    return found
+
+
+def put_results(tool: str, model: str, results: Dict[str, Any], overwrite: bool = False):
+    """
+    Stores {key: result}. Empty results are skipped (a page with nothing to
+    extract looks the same as a reply that failed to parse), as are results
+    marked unstored(). Keys stored
+    meanwhile by another worker are left as they are, unless overwrite is set
+    or their result has expired.
+    """
+    results = {k: v for k, v in results.items() if v not in (None, "", [], {}) and not isinstance(v, _Unstored)}
+    if not STORE_ENABLED or not results:
+        return
+    try:
+        with _session() as s:
+            now = datetime.utcnow()
+            rows = s.query(PageResult.key, PageResult.tool, PageResult.created_at).filter(PageResult.key.in_(list(results)))
+            # stored key -> replace it? (refresh, or a sampled tool's expired result)
+            stored = {k: overwrite or _expired(t, created_at, now) for k, t, created_at in rows}
+            for k, replace in stored.items():
+                if replace:
+                    s.merge(PageResult(key=k, tool=tool, model=model, result=results[k], created_at=now))
+            fresh = [PageResult(key=k, tool=tool, model=model, result=v) for k, v in results.items() if k not in stored]
+            s.add_all(fresh)
+            try:
+                s.commit()
+            except IntegrityError:
+                s.rollback()  # raced with another worker; keep whatever it didn't store
+                retry = {k: v for k, v in results.items() if stored.get(k, True)}
+                for k, v in retry.items():
+                    row = PageResult(key=k, tool=tool, model=model, result=v, created_at=datetime.utcnow())
+                    if k in stored:
+                        s.merge(row)
+                    else:
+                        s.add(row)
+                    try:
+                        s.commit()
+                    except IntegrityError:
+                        s.rollback()
+    except Exception as e:
+        log.warning(f"[page-results] store failed: {e}")
+
+
+def cached(tool: str, text: str, compute: Callable[[], Any],
+           params: Optional[Dict[str, Any]] = None, model: str = None, refresh: bool = False) -> Any:
+    """compute() for one page, unless a result for this text/tool/params/model is stored."""
+    key = result_key(text, tool, params, model)
+    stored = {} if refresh else get_results([key])
+    if key in stored:
+        return stored[key]
+    result = compute()
+    put_results(tool, model, {key: result}, overwrite=refresh)
+    return result
+
+
+def cached_pages(tool: str, pages: List[Tuple[Hashable, str]],
+                 compute: Callable[[List[Tuple[Hashable, str]], Callable], Dict[Hashable, Any]],
+                 params: Optional[Dict[str, Any]] = None, model: str = None,
+                 on_batch: Optional[Callable[[Dict[Hashable, Any]], None]] = None,
+                 refresh: bool = False) -> Dict[Hashable, Any]:
+    """
+    Many-page variant of cached for the packed tools. Stored pages are returned
+    (and reported to on_batch) at once; the rest go to compute(todo, on_batch),
+    whose batches are stored as they arrive, so an interrupted run keeps them.
+    """
+    keys = {pid: result_key(text, tool, params, model) for pid, text in pages}
+    stored = {} if refresh else get_results(keys.values())
+    results = {pid: stored[key] for pid, key in keys.items() if key in stored}
+    if results:
+        log.info(f"[page-results] {tool}: {len(results)}/{len(keys)} pages already analysed")
+        if on_batch:
+            on_batch(dict(results))
+    todo = [(pid, text) for pid, text in pages if pid not in results]
+    if not todo:
+        return results
+
+    def save(batch):
+        put_results(tool, model, {keys[pid]: result for pid, result in batch.items()}, overwrite=refresh)
+        if on_batch:
+            on_batch(batch)
+
+    results.update(compute(todo, save))
+    return results
@@ -1,11 +1,9 @@
 import os, json, logging, re
-import openai
 from typing import List, Dict, Any
-from app.services.openai_key_manager import key_manager
+from app.services.llm_gateway import gateway, RateLimitError
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
 
 log = logging.getLogger(__name__)
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 # basic sanitizer for tags
@@ -14,38 +12,29 @@ _TAG_RX = re.compile(r"[^a-z0-9\- ]+")
 class CreativePromptsService:
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[CreativePromptsService] Using Azure slot #{idx} ({api_base})")
 
     def _ask(self, prompt: str, max_tokens: int = 500) -> str:
         try:
-            resp = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=[
+            return gateway.chat(
+                [
                     {"role": "system", "content": "You are a concise creative-writing prompt generator. Reply ONLY with compact JSON."},
                     {"role": "user", "content": prompt},
                 ],
+                deployment=self.openai_engine,
+                tool="creative_prompts",
                 temperature=0.7,
                 max_tokens=max_tokens,
                 timeout=30,
             )
-            return resp["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            log.warning(f"Rate limit in creative_prompts: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            log.warning(f"Rate limit in creative_prompts: {e}")
             raise
 
     def generate_prompts_from_text(self, text: str, k_per_page: int = 10) -> List[Dict[str, Any]]:
         """
         From page text, produce up to k_per_page creative prompts.
         Returns list of objects: { prompt, genre|null, tone|null, tags:[...] }
+        Sampled (temperature 0.7), so never taken from or kept in page_results.
         """
         if not (text or "").strip():
             return []
@@ -58,7 +47,7 @@ class CreativePromptsService:
             "- genre: a compact label (e.g., 'fantasy', 'mystery', 'sci-fi') or null if N/A.\n"
             "- tone: a compact label (e.g., 'whimsical', 'somber') or null.\n"
             "- tags: 1–6 lowercase tags (strings) relevant to the prompt.\n\n"
-            f"TEXT:\n{text[:12000]}"
+            f"TEXT:\n{fit_prompt_text(text, self.openai_engine, max_tokens=600, cap=PAGE_INPUT_TOKENS, label='creative_prompts')}"
         ).format(k=k_per_page)
 
         raw = self._ask(prompt, max_tokens=600)
@@ -1,11 +1,10 @@
 import os, json, logging, re, datetime as dt
-import openai
 from typing import List, Dict, Any, Tuple
-from app.services.openai_key_manager import key_manager
+from app.services.llm_gateway import gateway, RateLimitError
+from app.services import page_results
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
 
 log = logging.getLogger(__name__)
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 _DATE_RX = re.compile(r"^\d{4}(-\d{2}){0,2}$")  # YYYY or YYYY-MM or YYYY-MM-DD
@@ -13,36 +12,33 @@ _DATE_RX = re.compile(r"^\d{4}(-\d{2}){0,2}$")  # YYYY or YYYY-MM or YYYY-MM-DD
 class ChronologyService:
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[ChronologyService] Using Azure slot #{idx} ({api_base})")
 
     def _call_llm(self, prompt: str, max_tokens: int = 400) -> str:
         try:
-            resp = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=[
+            return gateway.chat(
+                [
                     {"role": "system", "content": "You are a careful timeline extraction assistant."},
                     {"role": "user", "content": prompt},
                 ],
+                deployment=self.openai_engine,
+                tool="chronology",
                 temperature=0.2,
                 max_tokens=max_tokens,
                 timeout=30,
             )
-            return resp["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            # rotate and bubble; task-level retry will handle
-            log.warning(f"Rate limit in chronology: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            # bubble; task-level retry will handle
+            log.warning(f"Rate limit in chronology: {e}")
             raise
 
-    def extract_events_from_text(self, text: str, top_k: int = 10) -> List[Dict[str, Any]]:
+    def extract_events_from_text(self, text: str, top_k: int = 10, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Events on a single page, reused from page_results when this page was seen before (unless refresh)."""
+        if not (text or "").strip():
+            return []
+        return page_results.cached("chronology/v1", text, lambda: self._extract_events_from_text(text, top_k),
+                                   params={"k": top_k}, model=self.openai_engine, refresh=refresh)
+
+    def _extract_events_from_text(self, text: str, top_k: int = 10) -> List[Dict[str, Any]]:
         """
         Returns a list of events for a single page:
         [{ "date":"YYYY[-MM[-DD]]" or null, "title":"...", "desc":"..." }]
@@ -57,7 +53,7 @@ class ChronologyService:
             "- title: 3–8 words.\n"
             "- desc: one concise sentence.\n\n"
             "TEXT:\n{t}"
-        ).format(k=top_k, t=text[:12000])
+        ).format(k=top_k, t=fit_prompt_text(text, self.openai_engine, max_tokens=500, cap=PAGE_INPUT_TOKENS, label="chronology"))
 
         raw = self._call_llm(prompt, max_tokens=500)
         # Robust JSON parse fallback
@@ -68,8 +64,8 @@ class ChronologyService:
         except Exception:
             pass
 
-        # Heuristic fallback: split lines, attempt to parse "YYYY..." lines.
-        events = []
+        # Heuristic fallback: split lines, attempt to parse "YYYY..." lines (not kept in page_results).
+        events = page_results.unstored([])
         for line in raw.splitlines():
             line = line.strip("-•* \t")
             if not line:
@@ -13,19 +13,20 @@ from typing import Any, Dict, List, Optional, Tuple
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
-# File parsing
-from PyPDF2 import PdfReader
-from docx import Document
-
-# OpenAI (Azure) via SDK + rotating key manager
-import openai
-from app.services.openai_key_manager import key_manager
+# Azure OpenAI via the shared gateway (per-call credentials, pooled sessions)
+from app.services.llm_gateway import gateway, RateLimitError
+from app.utils.token_budget import fit_prompt_text
+from app.utils.sse import JsonArrayItems
+from app.services.extraction_cache import document_pages
 
 log = logging.getLogger(__name__)
 
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
+# Cap on problem text sent to the model (tokens); the context window still bounds it
+MAX_PROBLEM_TOKENS = int(os.getenv("MATH_VISUALIZER_INPUT_TOKENS", "32000"))
+
+# Streamed array items -> SSE event names
+_STREAM_EVENTS = {"steps": "step", "diagrams": "diagram", "practice": "practice"}
 
 
 @dataclass
@@ -50,7 +51,7 @@ class MathVisualizerService:
       - construct a deterministic prompt for Azure OpenAI
       - parse + normalize model output to a strict JSON shape
 
-    Uses shared `key_manager` to rotate Azure OpenAI credentials across slots.
+    Uses the shared LLM gateway, which rotates Azure OpenAI credentials across slots per call.
     """
 
     MAX_FILE_MB = 25
@@ -58,10 +59,36 @@ class MathVisualizerService:
 
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
 
     # ---------------- Public API ----------------
     def solve(self, mvi: MathVisualizerInput) -> Dict[str, Any]:
+        prompt, meta = self.prepare(mvi)
+        raw = self._call_llm(prompt, max_tokens=1500)
+        raw_json = self._parse_json_or_raise(raw)
+        return self._normalize(raw_json, meta)
+
+    def solve_stream(self, prompt: str, meta: Dict[str, Any]):
+        """
+        Streamed solve for a prompt from prepare(): yields ("step" | "diagram" |
+        "practice", item) as each array item completes, then ("result", full
+        normalized output) once the JSON is whole.
+        """
+        scanner = JsonArrayItems(("steps", "diagrams", "practice"))
+        parts = []
+        for delta in self._stream_llm(prompt, max_tokens=1500):
+            parts.append(delta)
+            for key, item in scanner.feed(delta):
+                if not isinstance(item, dict):
+                    continue
+                # normalize each item through the same path as the final result
+                norm = self._normalize({key: [item]}, meta)[key]
+                if norm:
+                    yield _STREAM_EVENTS[key], norm[0]
+        raw_json = self._parse_json_or_raise("".join(parts))
+        yield "result", self._normalize(raw_json, meta)
+
+    def prepare(self, mvi: MathVisualizerInput) -> Tuple[str, Dict[str, Any]]:
+        """Validate input and build the prompt; raises ValueError for bad input."""
         self._validate(mvi)
         problem_text, meta = self._collect_text(mvi)
 
@@ -76,38 +103,40 @@ class MathVisualizerService:
             ),
             meta=meta,
         )
-        raw = self._call_llm(prompt, max_tokens=1500)
-        raw_json = self._parse_json_or_raise(raw)
-        return self._normalize(raw_json, meta)
-
-    # ---------------- Credentials ----------------
-    def _use_new_credentials(self) -> None:
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[MathVisualizerService] Using Azure slot #{idx} ({api_base})")
+        return prompt, meta
 
     # ---------------- LLM Call ----------------
     def _call_llm(self, prompt: str, max_tokens: int = 1200) -> str:
         try:
-            resp = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=[
+            return gateway.chat(
+                [
                     {"role": "system", "content": "You are a helpful math tutor and visualization expert."},
                     {"role": "user", "content": prompt},
                 ],
+                deployment=self.openai_engine,
+                tool="math_visualizer",
                 temperature=0.2,
                 max_tokens=max_tokens,
                 timeout=60,
+                hedge=True,
             )
-            return resp["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            log.warning(f"Rate limit in MathVisualizerService: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            log.warning(f"Rate limit in MathVisualizerService: {e}")
             raise
 
+    def _stream_llm(self, prompt: str, max_tokens: int = 1200):
+        return gateway.stream(
+            [
+                {"role": "system", "content": "You are a helpful math tutor and visualization expert."},
+                {"role": "user", "content": prompt},
+            ],
+            deployment=self.openai_engine,
+            tool="math_visualizer",
+            temperature=0.2,
+            max_tokens=max_tokens,
+            timeout=60,
+        )
+
     def _parse_json_or_raise(self, content: str) -> Dict[str, Any]:
         try:
             return json.loads(content)
@@ -164,13 +193,8 @@ class MathVisualizerService:
             fs.save(file_path)
 
         try:
-            if ext == ".pdf":
-                extracted = self._extract_pdf(file_path)
-            elif ext == ".docx":
-                extracted = self._extract_docx(file_path)
-            else:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    extracted = f.read()
+            # shared extractor, cached by content hash
+            extracted = "\n".join(p for p in document_pages(file_path) if p.strip())
 
             extracted = (extracted or "").strip()
             if not extracted:
@@ -183,31 +207,22 @@ class MathVisualizerService:
             except Exception:
                 pass
 
-    def _extract_pdf(self, path: str) -> str:
-        reader = PdfReader(path)
-        chunks = []
-        for page in reader.pages:
-            txt = page.extract_text() or ""
-            if txt.strip():
-                chunks.append(txt)
-        return "\n".join(chunks)
-
-    def _extract_docx(self, path: str) -> str:
-        doc = Document(path)
-        return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
-
     def _build_prompt(self, problem_text: str, options: Dict[str, Any], meta: Dict[str, Any]) -> str:
         visualize_types = options.get("visualize_types", [])
         practice_count = int(options.get("practice_count", 3))
         level = options.get("level", "school")
         difficulty = options.get("difficulty", "intermediate")
+        problem_text = fit_prompt_text(
+            problem_text, self.openai_engine, max_tokens=1500, cap=MAX_PROBLEM_TOKENS,
+            overhead=1500, label="math_visualizer",
+        )
 
         return f"""
         You are a math expert and visualization designer. Solve the problem and produce VISUAL-FIRST artifacts.
 
         INPUT PROBLEM (verbatim):
         ---
-        {problem_text[:120000]}
+        {problem_text}
         ---
 
         CONSTRAINTS & PREFERENCES:
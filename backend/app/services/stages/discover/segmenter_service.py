@@ -1,12 +1,11 @@
 import os, json, logging, re
 from typing import List, Dict, Any, Tuple
-import openai
-from app.services.openai_key_manager import key_manager
+from app.services.llm_gateway import gateway, RateLimitError
+from app.services import page_results
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
 
 log = logging.getLogger(__name__)
 
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 # Each segment object shape we’ll use everywhere:
@@ -15,32 +14,29 @@ DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 class SegmenterService:
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[SegmenterService] Using Azure slot #{idx} ({api_base})")
 
     def _chat(self, messages, temperature=0.2, max_tokens=700, timeout=40) -> str:
         try:
-            r = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=messages,
+            return gateway.chat(
+                messages,
+                deployment=self.openai_engine,
+                tool="segmenter",
                 temperature=temperature,
                 max_tokens=max_tokens,
                 timeout=timeout,
             )
-            return r["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            log.warning(f"Rate limit in segmentation: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            log.warning(f"Rate limit in segmentation: {e}")
             raise
 
-    def segment_page(self, text: str, max_segments: int = 10) -> List[Dict[str, Any]]:
+    def segment_page(self, text: str, max_segments: int = 10, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Segments of a single page, reused from page_results when this page was seen before (unless refresh)."""
+        if not (text or "").strip():
+            return []
+        return page_results.cached("segmenter/v1", text, lambda: self._segment_page(text, max_segments),
+                                   params={"k": max_segments}, model=self.openai_engine, refresh=refresh)
+
+    def _segment_page(self, text: str, max_segments: int = 10) -> List[Dict[str, Any]]:
         """
         Extract structured segments from a single page of text.
         """
@@ -54,7 +50,7 @@ class SegmenterService:
             "- summary: one concise sentence\n"
             "- tags: 1–5 short keywords\n\n"
             "TEXT:\n{t}"
-        ).format(k=max_segments, t=text[:12000])
+        ).format(k=max_segments, t=fit_prompt_text(text, self.openai_engine, max_tokens=700, cap=PAGE_INPUT_TOKENS, label="segmenter"))
 
         raw = self._chat(
             [
@@ -74,8 +70,8 @@ class SegmenterService:
         except Exception:
             pass
 
-        # Fallback: try to split lines like "- Heading: Summary"
-        segments = []
+        # Fallback: try to split lines like "- Heading: Summary" (not kept in page_results)
+        segments = page_results.unstored([])
         for line in raw.splitlines():
             ln = line.strip("-* \t")
             if not ln:
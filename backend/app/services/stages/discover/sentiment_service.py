@@ -1,12 +1,12 @@
 import os, json, logging, statistics
-import openai
-from typing import Dict, Any, List, Tuple
-from app.services.openai_key_manager import key_manager
+from typing import Dict, Any, List, Tuple, Callable, Optional
+from app.services.llm_gateway import gateway, RateLimitError
+from app.services import page_results
+from app.services.page_packing import run_packed, render_pages
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
 
 log = logging.getLogger(__name__)
 
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 SENTIMENT_LABELS = ["very_negative", "negative", "neutral", "positive", "very_positive"]
@@ -20,29 +20,19 @@ class SentimentService:
     """
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[SentimentService] Using Azure slot #{idx} ({api_base})")
 
     def _chat(self, messages, temperature=0.0, max_tokens=300, timeout=25) -> str:
         try:
-            r = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=messages,
+            return gateway.chat(
+                messages,
+                deployment=self.openai_engine,
+                tool="sentiment",
                 temperature=temperature,
                 max_tokens=max_tokens,
                 timeout=timeout,
             )
-            return r["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            log.warning(f"Rate limit in sentiment: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            log.warning(f"Rate limit in sentiment: {e}")
             raise
 
     def analyze_page(self, text: str) -> Dict[str, Any]:
@@ -58,7 +48,7 @@ class SentimentService:
             "- label ∈ {very_negative, negative, neutral, positive, very_positive}\n"
             "- score ∈ [-1.0, 1.0] (negative→-1, positive→+1)\n"
             "- rationale: 1–2 concise sentences.\n\n"
-            f"TEXT:\n{text[:12000]}"
+            f"TEXT:\n{fit_prompt_text(text, self.openai_engine, max_tokens=250, cap=PAGE_INPUT_TOKENS, label='sentiment')}"
         )
         raw = self._chat(
             [
@@ -70,17 +60,64 @@ class SentimentService:
         )
 
         try:
-            data = json.loads(raw)
-            label = str(data.get("label", "neutral")).strip()
-            if label not in SENTIMENT_LABELS:
-                label = "neutral"
-            score = float(data.get("score", 0.0))
-            score = max(-1.0, min(1.0, score))
-            rationale = (data.get("rationale") or "").strip()
-            return {"label": label, "score": score, "rationale": rationale[:500]}
+            return self._normalize(json.loads(raw))
         except Exception:
-            # Fallback: naive rule if model returned non-JSON
-            return {"label": "neutral", "score": 0.0, "rationale": raw[:500]}
+            # Fallback: naive rule if model returned non-JSON (not kept in page_results)
+            return page_results.unstored({"label": "neutral", "score": 0.0, "rationale": raw[:500]})
+
+    @staticmethod
+    def _normalize(data: Dict[str, Any]) -> Dict[str, Any]:
+        label = str(data.get("label", "neutral")).strip()
+        if label not in SENTIMENT_LABELS:
+            label = "neutral"
+        score = float(data.get("score", 0.0))
+        score = max(-1.0, min(1.0, score))
+        rationale = (data.get("rationale") or "").strip()
+        return {"label": label, "score": score, "rationale": rationale[:500]}
+
+    def analyze_pages(self, pages: List[Tuple[int, str]],
+                      on_batch: Optional[Callable[[Dict[int, Dict[str, Any]]], None]] = None,
+                      refresh: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Packed variant of analyze_page for many pages: as many pages as the token
+        budget allows go into one request and come back as a keyed JSON array.
+        Pages analysed before (for any upload) come from page_results, unless refresh.
+        Input: [(page_number, text)...]  Output: {page_number: sentiment_dict}
+        """
+        return page_results.cached_pages("sentiment/v1", pages, self._analyze_pages,
+                                         model=self.openai_engine, on_batch=on_batch, refresh=refresh)
+
+    def _analyze_pages(self, pages: List[Tuple[int, str]],
+                       on_batch: Optional[Callable[[Dict[int, Dict[str, Any]]], None]] = None) -> Dict[int, Dict[str, Any]]:
+        results = {pn: self.analyze_page("") for pn, txt in pages if not (txt or "").strip()}
+        if results and on_batch:
+            on_batch(dict(results))  # blank pages count toward progress too
+        todo = [(pn, fit_prompt_text(txt, self.openai_engine, cap=PAGE_INPUT_TOKENS, label=f"sentiment p{pn}"))
+                for pn, txt in pages if (txt or "").strip()]
+
+        def call_batch(batch, max_tokens):
+            prompt = (
+                "Analyze the sentiment of EACH page below independently. "
+                "Respond ONLY as a JSON array with one object per page: "
+                '{"id": <page id>, "label": ..., "score": ..., "rationale": ...}.\n'
+                "- label ∈ {very_negative, negative, neutral, positive, very_positive}\n"
+                "- score ∈ [-1.0, 1.0] (negative→-1, positive→+1)\n"
+                "- rationale: 1–2 concise sentences.\n\n"
+                f"{render_pages(batch)}"
+            )
+            return self._chat(
+                [
+                    {"role": "system", "content": "You are a strict sentiment analysis assistant. Output valid JSON only."},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.0,
+                max_tokens=max_tokens,
+                timeout=60,
+            )
+
+        results.update(run_packed(todo, call_batch, self._normalize, self.analyze_page,
+                                  out_tokens_per_page=120, on_batch=on_batch))
+        return results
 
     def aggregate_document(self, per_page: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
         """
@@ -1,19 +1,17 @@
 import os, json, logging, re
 from typing import Dict, Any, List
-import openai
 
-from app.services.openai_key_manager import key_manager
+from app.services.llm_gateway import gateway, RateLimitError
+from app.utils.token_budget import fit_prompt_text, DOC_INPUT_TOKENS
 
-# Optional: reuse your robust extractor
+# Optional: reuse your robust extractor (cached by content hash, shared with the other tools)
 try:
-    from app.utils.file_utils import extract_text_from_document
+    from app.services.extraction_cache import document_pages, document_text
 except Exception:
-    extract_text_from_document = None
+    document_pages = None
 
 log = logging.getLogger(__name__)
 
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 class TimelineExplorerService:
@@ -25,29 +23,20 @@ class TimelineExplorerService:
     """
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[Timeline] Using Azure slot #{idx} ({api_base})")
 
     def _chat(self, messages, temperature=0.3, max_tokens=1400, timeout=60) -> str:
         try:
-            r = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=messages,
+            return gateway.chat(
+                messages,
+                deployment=self.openai_engine,
+                tool="timeline_explorer",
                 temperature=temperature,
                 max_tokens=max_tokens,
                 timeout=timeout,
+                hedge=True,  # interactive endpoint: trade a little spend for tail latency
             )
-            return r["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            log.warning(f"[Timeline] Rate limit: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            log.warning(f"[Timeline] Rate limit: {e}")
             raise
 
     # -------- public entry points --------
@@ -67,10 +56,9 @@ class TimelineExplorerService:
     def from_document(self, file_path: str) -> Dict[str, Any]:
         if not file_path or not os.path.exists(file_path):
             return {"timeline": []}
-        if extract_text_from_document:
+        if document_pages:
             try:
-                chunks = extract_text_from_document(file_path)
-                doc_text = "\n\n".join(chunks) if isinstance(chunks, list) else str(chunks)
+                doc_text = document_text(document_pages(file_path))
             except Exception as e:
                 log.warning(f"[Timeline] extractor failed, fallback read: {e}")
                 doc_text = self._read_small_text(file_path)
@@ -89,7 +77,7 @@ class TimelineExplorerService:
             "\"description\": \"1–3 sentences\"}\n"
             "]}\n"
             "Guidelines: 10–40 events max, sort chronologically, prefer specific dates if present.\n\n"
-            f"CONTENT:\n{seed_text[:24000]}"
+            f"CONTENT:\n{fit_prompt_text(seed_text, self.openai_engine, max_tokens=1600, cap=DOC_INPUT_TOKENS, label='timeline_explorer')}"
         )
         raw = self._chat(
             [
@@ -1,20 +1,18 @@
 import os, json, logging, re
 from typing import Dict, Any, List, Tuple
-import openai
 
-# rotation
-from app.services.openai_key_manager import key_manager
+from app.services.llm_gateway import gateway, RateLimitError
+from app.utils.token_budget import fit_prompt_text, DOC_INPUT_TOKENS
+from app.utils.sse import JsonArrayItems
 
-# (optional) robust text extraction if you already use this in summarizer
+# (optional) robust text extraction, cached by content hash and shared with the other tools
 try:
-    from app.utils.file_utils import extract_text_from_document
+    from app.services.extraction_cache import document_pages, document_text
 except Exception:
-    extract_text_from_document = None
+    document_pages = None
 
 log = logging.getLogger(__name__)
 
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 class VisualGuideService:
@@ -34,29 +32,20 @@ class VisualGuideService:
     """
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[VSG] Using Azure slot #{idx} ({api_base})")
 
     def _chat(self, messages, temperature=0.3, max_tokens=1200, timeout=60) -> str:
         try:
-            r = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=messages,
+            return gateway.chat(
+                messages,
+                deployment=self.openai_engine,
+                tool="visual_guide",
                 temperature=temperature,
                 max_tokens=max_tokens,
                 timeout=timeout,
+                hedge=True,  # interactive endpoint: trade a little spend for tail latency
             )
-            return r["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            log.warning(f"[VSG] Rate limit: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            log.warning(f"[VSG] Rate limit: {e}")
             raise
 
     # ---------- Public entry points ----------
@@ -75,23 +64,58 @@ class VisualGuideService:
     def from_document(self, file_path: str) -> Dict[str, Any]:
         if not file_path or not os.path.exists(file_path):
             return {"summary": "", "topics": []}
+        return self._build(seed_text=self.document_text(file_path))
+
+    def document_text(self, file_path: str) -> str:
         # Prefer your extractor if present (handles pdf/docx robustly).
-        if extract_text_from_document:
+        if document_pages:
             try:
-                chunks = extract_text_from_document(file_path)
-                doc_text = "\n\n".join(chunks) if isinstance(chunks, list) else str(chunks)
+                doc_text = document_text(document_pages(file_path))
             except Exception as e:
-                log.warning(f"[VSG] extract_text_from_document failed, fallback to raw read: {e}")
+                log.warning(f"[VSG] document extraction failed, fallback to raw read: {e}")
                 doc_text = self._read_small_text(file_path)
         else:
             doc_text = self._read_small_text(file_path)
-        return self._build(seed_text=doc_text)
+        return doc_text
+
+    def stream(self, seed_text: str):
+        """
+        Streamed _build: yields ("topic", topic) as each topic object completes,
+        then ("result", full guide) once the JSON is whole.
+        """
+        scanner = JsonArrayItems(("topics",))
+        parts = []
+        order = 0
+        for delta in gateway.stream(
+            self._messages(seed_text),
+            deployment=self.openai_engine,
+            tool="visual_guide",
+            temperature=0.35,
+            max_tokens=1500,
+            timeout=70,
+        ):
+            parts.append(delta)
+            for _, item in scanner.feed(delta):
+                order += 1
+                topic = self._normalize_topic(item, order)
+                if topic:
+                    yield "topic", topic
+        yield "result", self._parse_result("".join(parts))
 
     # ---------- Core builder ----------
     def _build(self, seed_text: str) -> Dict[str, Any]:
         """
         Ask LLM for a compact visual study guide. Hard constrain JSON.
         """
+        raw = self._chat(
+            self._messages(seed_text),
+            temperature=0.35,
+            max_tokens=1500,
+            timeout=70,
+        )
+        return self._parse_result(raw)
+
+    def _messages(self, seed_text: str) -> List[Dict[str, str]]:
         prompt = (
             "Create a concise visual study guide from the content below.\n"
             "Return ONLY valid JSON with the following shape:\n"
@@ -107,19 +131,13 @@ class VisualGuideService:
             "- order starts at 1 and increases.\n"
             "- keep study_method practical (bullets, checklists ok).\n"
             "- topics should be specific, 3–7 words.\n\n"
-            f"CONTENT:\n{seed_text[:24000]}"
+            f"CONTENT:\n{fit_prompt_text(seed_text, self.openai_engine, max_tokens=1500, cap=DOC_INPUT_TOKENS, label='visual_guide')}"
         )
 
-        raw = self._chat(
-            [
-                {"role": "system", "content": "You are a precise curriculum designer. Output JSON only."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.35,
-            max_tokens=1500,
-            timeout=70,
-        )
-        return self._parse_result(raw)
+        return [
+            {"role": "system", "content": "You are a precise curriculum designer. Output JSON only."},
+            {"role": "user", "content": prompt},
+        ]
 
     # ---------- Parse & normalize ----------
     def _parse_result(self, raw: str) -> Dict[str, Any]:
@@ -135,40 +153,44 @@ class VisualGuideService:
         topics = data.get("topics") or []
         if isinstance(topics, list):
             for i, t in enumerate(topics, start=1):
-                if not isinstance(t, dict):  # allow string
-                    name = str(t)[:80]
-                    if name:
-                        out["topics"].append({"name": name, "study_method": "", "order": i})
-                    continue
-                name = str(t.get("name") or "").strip()[:120]
-                study = str(t.get("study_method") or "").strip()
-                time_m = t.get("time")
-                try:
-                    time_m = int(time_m) if time_m is not None else None
-                except Exception:
-                    time_m = None
-                order = t.get("order")
-                try:
-                    order = int(order) if order is not None else i
-                except Exception:
-                    order = i
-                res = t.get("resources") or []
-                if not isinstance(res, list):
-                    res = [str(res)]
-                res = [str(x).strip()[:60] for x in res if str(x).strip()][:8]
-
-                if name:
-                    out["topics"].append({
-                        "name": name,
-                        "study_method": study,
-                        "time": time_m,
-                        "order": order,
-                        "resources": res if res else None
-                    })
+                topic = self._normalize_topic(t, i)
+                if topic:
+                    out["topics"].append(topic)
         # clamp & sort
         out["topics"] = sorted(out["topics"][:12], key=lambda x: x.get("order", 10**9))
         return out
 
+    def _normalize_topic(self, t: Any, i: int):
+        if not isinstance(t, dict):  # allow string
+            name = str(t)[:80]
+            return {"name": name, "study_method": "", "order": i} if name else None
+        name = str(t.get("name") or "").strip()[:120]
+        study = str(t.get("study_method") or "").strip()
+        time_m = t.get("time")
+        try:
+            time_m = int(time_m) if time_m is not None else None
+        except Exception:
+            time_m = None
+        order = t.get("order")
+        try:
+            order = int(order) if order is not None else i
+        except Exception:
+            order = i
+        res = t.get("resources") or []
+        if not isinstance(res, list):
+            res = [str(res)]
+        res = [str(x).strip()[:60] for x in res if str(x).strip()][:8]
+
+        if not name:
+            return None
+        return {
+            "name": name,
+            "study_method": study,
+            "time": time_m,
+            "order": order,
+            "resources": res if res else None
+        }
+
     # ---------- tiny raw reader fallback ----------
     def _read_small_text(self, file_path: str) -> str:
         try:
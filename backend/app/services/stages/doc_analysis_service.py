@@ -1,12 +1,12 @@
 import os, json, logging, re, statistics
-from typing import Dict, Any, List, Tuple
-import openai
-from app.services.openai_key_manager import key_manager
+from typing import Dict, Any, List, Tuple, Callable, Optional
+from app.services.llm_gateway import gateway
+from app.services import page_results
+from app.services.page_packing import run_packed, render_pages
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS, DOC_INPUT_TOKENS
 
 log = logging.getLogger(__name__)
 
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 # Entity types we’ll encourage (but won’t strictly enforce)
@@ -22,29 +22,16 @@ class DocAnalysisService:
     """
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[DocAnalysis] Using Azure slot #{idx} ({api_base})")
 
     def _chat(self, messages, temperature=0.2, max_tokens=600, timeout=35) -> str:
-        try:
-            r = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                timeout=timeout,
-            )
-            return r["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError:
-            self._use_new_credentials()
-            raise
+        return gateway.chat(
+            messages,
+            deployment=self.openai_engine,
+            tool="doc_analysis",
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+        )
 
     # ---------- Page-level ----------
     def analyze_page(self, text: str, tag_top_k: int = 8, entity_top_k: int = 15) -> Dict[str, Any]:
@@ -58,10 +45,7 @@ class DocAnalysisService:
         if not text or not text.strip():
             return {"tags": [], "entities": [], "length": {"chars": 0, "words": 0, "approx_tokens": 0}}
 
-        # Length rough stats without LLM
-        words = len(re.findall(r"\w+", text))
-        chars = len(text)
-        approx_tokens = int(words * 1.33)  # very rough heuristic
+        length = self._length(text)
 
         prompt = (
             "From the text below, extract:\n"
@@ -69,7 +53,7 @@ class DocAnalysisService:
             "2) up to {k2} named entities with types (choose from PERSON, ORG, GPE, LOC, DATE, EVENT, WORK, PRODUCT, LAW, NORP, MISC)\n"
             "Respond ONLY JSON: {{\"tags\": [...], \"entities\": [{{\"text\":\"...\",\"type\":\"...\"}}, ...]}}\n\n"
             "TEXT:\n{t}"
-        ).format(k1=tag_top_k, k2=entity_top_k, t=text[:12000])
+        ).format(k1=tag_top_k, k2=entity_top_k, t=fit_prompt_text(text, self.openai_engine, max_tokens=550, cap=PAGE_INPUT_TOKENS, label="doc_analysis"))
 
         raw = self._chat(
             [
@@ -80,30 +64,106 @@ class DocAnalysisService:
             max_tokens=550,
         )
 
-        tags, entities = [], []
+        parsed = True
         try:
-            data = json.loads(raw)
-            tags = [str(x).strip()[:32] for x in (data.get("tags") or []) if str(x).strip()]
-            ents = data.get("entities") or []
-            for e in ents:
-                if isinstance(e, dict):
-                    t = (e.get("text") or "").strip()
-                    ty = (e.get("type") or "").strip().upper()
-                    if t:
-                        if ty not in ENTITY_TYPES: ty = "MISC"
-                        entities.append({"text": t[:120], "type": ty})
+            tags, entities = self._parse_extraction(json.loads(raw))
         except Exception:
-            # fallback: naive keywording by most frequent words of length>=6
+            # fallback: naive keywording by most frequent words of length>=6 (not kept in page_results)
+            parsed = False
             freq = {}
             for w in re.findall(r"[A-Za-z][A-Za-z\-]{5,}", text):
                 freq[w.lower()] = freq.get(w.lower(), 0) + 1
             tags = [w for w, _ in sorted(freq.items(), key=lambda kv: -kv[1])[:tag_top_k]]
+            entities = []
 
-        return {
+        result = {
             "tags": tags[:tag_top_k],
             "entities": entities[:entity_top_k],
-            "length": {"chars": chars, "words": words, "approx_tokens": approx_tokens},
+            "length": length,
         }
+        return result if parsed else page_results.unstored(result)
+
+    @staticmethod
+    def _length(text: str) -> Dict[str, int]:
+        # Length rough stats without LLM
+        words = len(re.findall(r"\w+", text))
+        return {"chars": len(text), "words": words, "approx_tokens": int(words * 1.33)}  # very rough heuristic
+
+    @staticmethod
+    def _parse_extraction(data: Dict[str, Any]) -> Tuple[List[str], List[Dict[str, str]]]:
+        tags = [str(x).strip()[:32] for x in (data.get("tags") or []) if str(x).strip()]
+        entities = []
+        for e in data.get("entities") or []:
+            if isinstance(e, dict):
+                t = (e.get("text") or "").strip()
+                ty = (e.get("type") or "").strip().upper()
+                if t:
+                    if ty not in ENTITY_TYPES: ty = "MISC"
+                    entities.append({"text": t[:120], "type": ty})
+        return tags, entities
+
+    def analyze_pages(self, pages: List[Tuple[int, str]], tag_top_k: int = 8, entity_top_k: int = 15,
+                      on_batch: Optional[Callable[[Dict[int, Dict[str, Any]]], None]] = None,
+                      refresh: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Packed variant of analyze_page: several pages per request, returned as a
+        keyed JSON array and unpacked per page. Pages the model skipped or mangled
+        are re-run through analyze_page.
+        Pages analysed before (for any upload) come from page_results, unless refresh.
+        Input: [(page_number, text)...]  Output: {page_number: analysis_dict}
+        """
+        return page_results.cached_pages(
+            "doc_analysis/v1", pages,
+            lambda todo, save: self._analyze_pages(todo, tag_top_k, entity_top_k, save),
+            params={"tags": tag_top_k, "entities": entity_top_k}, model=self.openai_engine, on_batch=on_batch,
+            refresh=refresh,
+        )
+
+    def _analyze_pages(self, pages: List[Tuple[int, str]], tag_top_k: int, entity_top_k: int,
+                       on_batch: Optional[Callable[[Dict[int, Dict[str, Any]]], None]] = None) -> Dict[int, Dict[str, Any]]:
+        results = {pn: self.analyze_page("") for pn, txt in pages if not (txt or "").strip()}
+        if results and on_batch:
+            on_batch(dict(results))  # blank pages count toward progress too
+        texts = {pn: txt for pn, txt in pages if (txt or "").strip()}
+        todo = [(pn, fit_prompt_text(txt, self.openai_engine, cap=PAGE_INPUT_TOKENS, label=f"doc_analysis p{pn}"))
+                for pn, txt in texts.items()]
+
+        def call_batch(batch, max_tokens):
+            prompt = (
+                "For EACH page below, independently extract:\n"
+                f"1) up to {tag_top_k} high-signal tags (short keywords), array of strings\n"
+                f"2) up to {entity_top_k} named entities with types (choose from PERSON, ORG, GPE, LOC, DATE, EVENT, WORK, PRODUCT, LAW, NORP, MISC)\n"
+                "Respond ONLY as a JSON array with one object per page: "
+                '{"id": <page id>, "tags": [...], "entities": [{"text":"...","type":"..."}, ...]}\n\n'
+                f"{render_pages(batch)}"
+            )
+            return self._chat(
+                [
+                    {"role": "system", "content": "You are a precise information extraction assistant. Output valid JSON only."},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.2,
+                max_tokens=max_tokens,
+                timeout=90,
+            )
+
+        def parse_item(item):
+            tags, entities = self._parse_extraction(item)
+            return {"tags": tags[:tag_top_k], "entities": entities[:entity_top_k]}
+
+        def single(text):
+            return self.analyze_page(text, tag_top_k=tag_top_k, entity_top_k=entity_top_k)
+
+        def with_length(batch):
+            # length stats always come from the full page text; set in place so unstored() marks survive
+            for pn, res in batch.items():
+                res["length"] = self._length(texts[pn])
+            return batch
+
+        packed = run_packed(todo, call_batch, parse_item, single, out_tokens_per_page=350,
+                            on_batch=(lambda batch: on_batch(with_length(batch))) if on_batch else None)
+        results.update(with_length(packed))
+        return results
 
     # ---------- Document aggregation ----------
     def aggregate(self, per_page: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
@@ -172,7 +232,7 @@ class DocAnalysisService:
             '- "nodes": array of objects, each with key "id"\n'
             '- "edges": array of objects, each with keys "source", "target", and optional "label"\n'
             "Keep at most 20 nodes and 30 edges. Use short labels.\n\n"
-            f"TEXT:\n{text_all[:24000]}"
+            f"TEXT:\n{fit_prompt_text(text_all, self.openai_engine, max_tokens=700, cap=DOC_INPUT_TOKENS, label='mind_map')}"
         )
 
         raw = self._chat(
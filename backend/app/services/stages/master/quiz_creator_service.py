@@ -1,11 +1,10 @@
 import os, json, logging, re
-import openai
 from typing import List, Dict, Any
-from app.services.openai_key_manager import key_manager
+from app.services.llm_gateway import gateway, RateLimitError
+from app.services import page_results
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
 
 log = logging.getLogger(__name__)
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 # Safe clamp helpers
@@ -19,35 +18,33 @@ def _clampi(v, lo, hi):
 class QuizCreatorService:
     def __init__(self, openai_engine: str = DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        log.info(f"[QuizCreatorService] Using Azure slot #{idx} ({api_base})")
 
     def _ask(self, prompt: str, max_tokens: int = 800) -> str:
         try:
-            resp = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=[
+            return gateway.chat(
+                [
                     {"role": "system", "content": "You generate precise, unambiguous quizzes. Reply ONLY with valid compact JSON."},
                     {"role": "user", "content": prompt},
                 ],
+                deployment=self.openai_engine,
+                tool="quiz_creator",
                 temperature=0.2,      # keep it consistent/deterministic
                 max_tokens=max_tokens,
                 timeout=45,
             )
-            return resp["choices"][0]["message"]["content"].strip()
-        except openai.error.RateLimitError as e:
-            log.warning(f"[QuizCreator] Rate limited: {e}; rotating key.")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            log.warning(f"[QuizCreator] Rate limited: {e}")
             raise
 
-    def generate_questions_from_text(self, text: str, k: int = 5, difficulty: str = "medium") -> List[Dict[str, Any]]:
+    def generate_questions_from_text(self, text: str, k: int = 5, difficulty: str = "medium",
+                                     refresh: bool = False) -> List[Dict[str, Any]]:
+        """Up to k MCQ questions for a page, reused from page_results when this page was seen before (unless refresh)."""
+        if not (text or "").strip():
+            return []
+        return page_results.cached("quiz_creator/v1", text, lambda: self._generate_questions_from_text(text, k, difficulty),
+                                   params={"k": k, "difficulty": difficulty}, model=self.openai_engine, refresh=refresh)
+
+    def _generate_questions_from_text(self, text: str, k: int = 5, difficulty: str = "medium") -> List[Dict[str, Any]]:
         """
         From page text, generate up to k MCQ questions.
         Returns list of {question, options:[str], correctIndex:int, explanation:str}
@@ -69,7 +66,7 @@ class QuizCreatorService:
             "- correctIndex: 0-based index into options\n"
             "- explanation: one-sentence rationale\n\n"
             "TEXT:\n{t}"
-        ).format(k=k, difficulty=difficulty, t=(text[:12000]))
+        ).format(k=k, difficulty=difficulty, t=fit_prompt_text(text, self.openai_engine, max_tokens=800, cap=PAGE_INPUT_TOKENS, label="quiz_creator"))
 
         raw = self._ask(prompt, max_tokens=800)
 
@@ -83,7 +80,7 @@ class QuizCreatorService:
 
         # Fallback: attempt to parse line-based items -> True/False stubs
         lines = [ln.strip("-•* \t") for ln in raw.splitlines() if ln.strip()]
-        result = []
+        result = page_results.unstored([])
         for ln in lines[:k]:
             result.append(self._normalize_q({
                 "question": ln,
@@ -0,0 +1,205 @@
+"""
+Long recordings are cut at pauses into chunks below the Whisper upload limit,
+transcribed concurrently over one pooled HTTP session, and stitched back in
+order with each chunk's segment timestamps shifted to the recording's clock.
+"""
+import io
+import os
+import time
+import shutil
+import logging
+import subprocess
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from app.services.whisper_service import WhisperError, translate_audio_segment
+
+log = logging.getLogger(__name__)
+
+# Longest chunk sent in one request; 10 min of 48 kbit/s mono mp3 is ~3.5 MB,
+# well below Whisper's 25 MB upload limit
+CHUNK_MAX_SECONDS = int(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "600"))
+CHUNK_FORMAT = os.getenv("TRANSCRIBE_CHUNK_FORMAT", "mp3")
+CHUNK_BITRATE = "48k"
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+MAX_ATTEMPTS = 4
+SAMPLE_RATE = 16000
+MIN_SILENCE_MS = 400      # a pause at least this long is a place to cut
+SILENCE_BELOW_DBFS = 16   # quieter than the recording's average by this much counts as silence
+SILENCE_FLOOR_DBFS = -50  # threshold used when the average is undefined (digital silence)
+
+_MIME = {"mp3": "audio/mpeg", "wav": "audio/wav", "ogg": "audio/ogg", "flac": "audio/flac"}
+
+
+@dataclass
+class Transcript:
+    text: str
+    # {"start", "end", "text"}, seconds from the start of the recording
+    segments: List[dict] = field(default_factory=list)
+    # text of each audio chunk, in order
+    chunks: List[str] = field(default_factory=list)
+
+
+@lru_cache(maxsize=1)
+def ffmpeg_exe() -> str:
+    """ffmpeg on PATH, else the static build shipped with imageio-ffmpeg."""
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        raise RuntimeError("ffmpeg not available")
+
+
+def _pydub():
+    try:
+        from pydub import AudioSegment
+        from pydub.silence import detect_silence
+    except Exception:
+        return None
+    if not shutil.which(AudioSegment.converter):
+        try:
+            AudioSegment.converter = ffmpeg_exe()
+        except RuntimeError:
+            pass  # WAV still works without ffmpeg
+    return AudioSegment, detect_silence
+
+
+def load_audio(path: str):
+    """
+    The first audio track of an audio or video file as mono 16 kHz PCM. ffmpeg
+    decodes and resamples straight into a pipe: only the audio stream is
+    decoded (video packets are demuxed and dropped) and nothing is written to
+    disk. Without ffmpeg, pydub's own reader handles WAV.
+    """
+    AudioSegment, _ = _pydub()
+    try:
+        exe = ffmpeg_exe()
+    except RuntimeError:
+        return AudioSegment.from_file(path).set_channels(1).set_frame_rate(SAMPLE_RATE)
+    cmd = [
+        exe, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", path, "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode audio: {proc.stderr.decode(errors='replace')[-500:]}")
+    return AudioSegment(data=proc.stdout, sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
+
+
+def plan_chunks(audio, max_ms: int = CHUNK_MAX_SECONDS * 1000) -> List[Tuple[int, int]]:
+    """
+    (start_ms, end_ms) spans covering the recording, each at most max_ms long.
+    Every cut is placed in the middle of the latest pause found in the second
+    half of the allowed window; with no pause there it is a hard cut at max_ms.
+    """
+    total = len(audio)
+    if total <= max_ms:
+        return [(0, total)]
+    _, detect_silence = _pydub()
+    thresh = audio.dBFS - SILENCE_BELOW_DBFS if audio.dBFS != float("-inf") else SILENCE_FLOOR_DBFS
+    cuts = [(a + b) // 2 for a, b in detect_silence(
+        audio, min_silence_len=MIN_SILENCE_MS, silence_thresh=thresh, seek_step=10
+    )]
+    spans, start = [], 0
+    while total - start > max_ms:
+        lo = bisect_left(cuts, start + max_ms // 2)
+        hi = bisect_right(cuts, start + max_ms)
+        end = cuts[hi - 1] if hi > lo else start + max_ms
+        spans.append((start, end))
+        start = end
+    spans.append((start, total))
+    return spans
+
+
+def _export(audio, start: int, end: int) -> bytes:
+    buf = io.BytesIO()
+    params = {"bitrate": CHUNK_BITRATE} if CHUNK_FORMAT == "mp3" else {}
+    audio[start:end].export(buf, format=CHUNK_FORMAT, **params)
+    return buf.getvalue()
+
+
+def _transcribe_span(audio, index: int, start: int, end: int) -> dict:
+    data = _export(audio, start, end)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return translate_audio_segment(data, f"chunk{index:04d}.{CHUNK_FORMAT}", _MIME.get(CHUNK_FORMAT, "application/octet-stream"))
+        except Exception as e:  # WhisperError, connection reset, timeout
+            retryable = e.retryable if isinstance(e, WhisperError) else True
+            if not retryable or attempt == MAX_ATTEMPTS:
+                raise
+            delay = getattr(e, "retry_after", None) or 2 ** attempt
+            log.warning(f"[transcribe] chunk {index} attempt {attempt} failed: {e}; retrying in {delay}s")
+        time.sleep(delay)
+
+
+def _stitch(spans, results) -> Transcript:
+    segments, chunks = [], []
+    for (start, end), result in zip(spans, results):
+        offset = start / 1000.0
+        chunk_text = (result.get("text") or "").strip()
+        chunks.append(chunk_text)
+        for seg in result.get("segments") or [{"start": 0.0, "end": (end - start) / 1000.0, "text": chunk_text}]:
+            text = (seg.get("text") or "").strip()
+            if text:
+                segments.append({
+                    "start": round(seg["start"] + offset, 2),
+                    "end": round(seg["end"] + offset, 2),
+                    "text": text,
+                })
+    return Transcript(text=" ".join(c for c in chunks if c), segments=segments, chunks=chunks)
+
+
+def transcribe_file(path: str, on_progress: Optional[Callable[[int, int], None]] = None) -> Transcript:
+    """
+    Transcript of an audio or video file. on_progress(done, total) is called after each
+    chunk finishes, always from the calling thread, so it may use the DB session.
+    Without pydub the file is sent whole in a single request.
+    """
+    lib = _pydub()
+    if lib is None:
+        with open(path, "rb") as f:
+            result = translate_audio_segment(f.read(), os.path.basename(path))
+        if on_progress:
+            on_progress(1, 1)
+        return _stitch([(0, 0)], [result])
+
+    audio = load_audio(path)
+    spans = plan_chunks(audio)
+    log.info(f"[transcribe] {len(audio) / 1000:.0f}s of audio in {len(spans)} chunk(s)")
+
+    results = [None] * len(spans)
+    with ThreadPoolExecutor(max_workers=min(TRANSCRIBE_WORKERS, len(spans))) as pool:
+        futures = {pool.submit(_transcribe_span, audio, i, a, b): i for i, (a, b) in enumerate(spans)}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if on_progress:
+                    on_progress(done, len(spans))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return _stitch(spans, results)
+
+
+def progress_reporter(progress_id, status: str = "transcribing") -> Callable[[int, int], None]:
+    """on_progress callback writing transcription progress to a Progress row."""
+    from app.db import db
+    from app.models import Progress
+
+    def report(done: int, total: int):
+        progress = db.session.get(Progress, progress_id)
+        if progress is None:
+            return
+        progress.percentage = int(done * 100 / total) if done < total else 99
+        progress.status = status
+        db.session.commit()
+
+    return report
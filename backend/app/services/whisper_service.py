@@ -1,4 +1,59 @@
+import os
+from functools import lru_cache
+
 import requests
+from requests.adapters import HTTPAdapter
+
+WHISPER_ENDPOINT = os.getenv(
+    "WHISPER_ENDPOINT",
+    "https://scool-mb23vwrz-swedencentral.cognitiveservices.azure.com/openai/deployments/whisper/audio/translations?api-version=2024-06-01",
+)
+WHISPER_API_KEY = os.getenv(
+    "WHISPER_API_KEY",
+    "CHStGQVfxNnxPtSmcuCdUM7uSWsmn3MIFvmeXIxQcuSfTmSqxKdMJQQJ99BEACfhMk5XJ3w3AAAAACOGF72B",
+)
+WHISPER_POOL_SIZE = int(os.getenv("WHISPER_POOL_SIZE", "8"))
+WHISPER_TIMEOUT = int(os.getenv("WHISPER_TIMEOUT", "600"))
+
+
+class WhisperError(Exception):
+    def __init__(self, status_code: int, body: str, retry_after: float = None):
+        super().__init__(f"Translation failed [{status_code}]: {body}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code == 429 or self.status_code >= 500
+
+
+@lru_cache(maxsize=1)
+def whisper_session() -> requests.Session:
+    """One keep-alive session per process, shared by all transcription threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=WHISPER_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["api-key"] = WHISPER_API_KEY
+    return session
+
+
+def _post(file_field, response_format: str) -> requests.Response:
+    response = whisper_session().post(
+        WHISPER_ENDPOINT,
+        files={"file": file_field},
+        data={"response_format": response_format},  # "text", "json", "srt" or "verbose_json"
+        timeout=WHISPER_TIMEOUT,
+    )
+    if response.status_code != 200:
+        retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        raise WhisperError(response.status_code, response.text, retry_after)
+    return response
+
 
 def translate_audio_with_azure_whisper(audio_path: str) -> str:
     """
@@ -10,25 +65,13 @@ def translate_audio_with_azure_whisper(audio_path: str) -> str:
     Returns:
         str: Translated text.
     """
-    endpoint = "https://scool-mb23vwrz-swedencentral.cognitiveservices.azure.com/openai/deployments/whisper/audio/translations?api-version=2024-06-01"
-    api_key = "CHStGQVfxNnxPtSmcuCdUM7uSWsmn3MIFvmeXIxQcuSfTmSqxKdMJQQJ99BEACfhMk5XJ3w3AAAAACOGF72B"
-
-    headers = {
-        "api-key": api_key,
-    }
-
-    data = {
-        "response_format": "text",  # Can also be: "json", "srt", or "verbose_json"
-    }
-
     with open(audio_path, "rb") as audio_file:
-        files = {
-            "file": (audio_path, audio_file, "audio/mpeg")
-        }
+        return _post((audio_path, audio_file, "audio/mpeg"), "text").text
 
-        response = requests.post(endpoint, headers=headers, files=files, data=data)
 
-    if response.status_code == 200:
-        return response.text
-    else:
-        raise Exception(f"Translation failed [{response.status_code}]: {response.text}")
\ No newline at end of file
+def translate_audio_segment(data: bytes, filename: str, mime: str = "audio/mpeg") -> dict:
+    """
+    Translates an in-memory audio clip and returns Whisper's verbose_json
+    result: {"text": ..., "segments": [{"start", "end", "text"}, ...]}.
+    """
+    return _post((filename, data, mime), "verbose_json").json()
@@ -1,8 +1,7 @@
 import os
-import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from app.services.lemonfox_service import transcribe_audio
-import openai
 
 from app.utils.file_utils import (
     detect_file_type,
@@ -11,27 +10,20 @@ from app.utils.file_utils import (
     extract_text_from_video
 )
 
-from app.services.openai_key_manager import key_manager
+# Credentials are resolved per call by the gateway (slot rotation via key_manager)
+from app.services.llm_gateway import gateway, LLMError, RateLimitError
+from app.services.page_packing import extract_json
 
 logger = logging.getLogger(__name__)
 
-# We’ll set api_key/base per-instance (or per-call) via rotation:
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = "2023-03-15-preview"  # keep your current version
+# One structured call per chunk for summary + tags + entities (0 = three separate calls)
+FUSED_ANALYSIS = os.getenv("SUMMARIZER_FUSED", "1") not in ("0", "false", "False")
+# Chunks analysed concurrently per file
+CHUNK_WORKERS = int(os.getenv("SUMMARIZER_CHUNK_WORKERS", "4"))
 
 class Summarizer:
     def __init__(self, openai_engine="gpt-4.1"):
         self.openai_engine = openai_engine
-        # grab credentials for this batch instance
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        logger.info(f"[Summarizer] Using Azure OpenAI credential slot #{idx} ({openai.api_base})")
 
     def _summarize_file(self, file_path):
         try:
@@ -50,12 +42,7 @@ class Summarizer:
 
     def _summarize_document(self, file_path):
         chunks = extract_text_from_document(file_path)  # returns chunks
-        summaries, tags, entities = [], [], []
-
-        for chunk in chunks:
-            summaries.append(self._summarize_text(chunk))
-            tags.append(self._tag_segment(chunk))
-            entities.append(self._extract_entities(chunk))
+        summaries, tags, entities = self._analyze_segments(chunks)
 
         toc = self._generate_toc(chunks)
         return {
@@ -70,53 +57,131 @@ class Summarizer:
         transcribed_text = extract_text_from_audio(file_path)
         segments = self._segment_text(transcribed_text)
         toc = self._generate_toc(segments)
-        tags = self._tag_segments(segments)
-        entities = self._extract_named_entities(segments)
-        summaries = [self._summarize_text(segment) for segment in segments]
+        summaries, tags, entities = self._analyze_segments(segments)
         return {"toc": toc, "segments": segments, "tags": tags, "entities": entities, "summary": summaries}
 
     def _summarize_video(self, file_path):
         transcribed_text = extract_text_from_video(file_path)
         segments = self._segment_text(transcribed_text)
         toc = self._generate_toc(segments)
-        tags = self._tag_segments(segments)
-        entities = self._extract_named_entities(segments)
-        summaries = [self._summarize_text(segment) for segment in segments]
+        summaries, tags, entities = self._analyze_segments(segments)
         return {"toc": toc, "segments": segments, "tags": tags, "entities": entities, "summary": summaries}
 
-    def _summarize_text(self, text):
+    def _analyze_segments(self, segments):
+        """(summaries, tags, entities), one entry per segment, with segments analysed concurrently."""
+        analyze = self._analyze_segment if FUSED_ANALYSIS else self._analyze_segment_separately
+        if not segments:
+            return [], [], []
+        with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_WORKERS, len(segments)))) as pool:
+            results = list(pool.map(analyze, segments))
+        summaries, tags, entities = (list(col) for col in zip(*results))
+        return summaries, tags, entities
+
+    def _analyze_segment_separately(self, segment):
+        return self._summarize_text(segment), self._tag_segment(segment), self._extract_entities(segment)
+
+    def _analyze_segment(self, segment):
+        """
+        Summary, tags and entities for one segment from a single JSON call.
+        Each field is validated on its own; a missing or malformed field falls
+        back to its dedicated call instead of failing the whole segment.
+        """
+        if not segment or not segment.strip():
+            return "", "", []
+
+        prompt = (
+            "For the text below, return ONLY a JSON object with keys:\n"
+            '- "summary": a concise summary of the text\n'
+            '- "tags": an array of short keyword tags\n'
+            '- "entities": an array of named entities (people, organizations, locations), '
+            'each {"text": "...", "type": "..."}\n\n'
+            f"Text:\n{segment}"
+        )
+        try:
+            raw = gateway.chat(
+                [
+                    {"role": "system", "content": "You are a document summarizer that also extracts keywords and named entities. Output valid JSON only."},
+                    {"role": "user", "content": prompt}
+                ],
+                deployment=self.openai_engine,
+                tool="summarizer",
+                cache=True,
+                max_tokens=600,
+                temperature=0.3,
+                timeout=30
+            )
+        except RateLimitError as e:
+            logger.warning(f"Rate limit encountered, retrying via Celery: {e}")
+            raise
+
+        # replies wrapped in ```json fences are still one call, not four
+        data = extract_json(raw, dict) or {}
+
+        summary = data.get("summary")
+        if not isinstance(summary, str) or not summary.strip():
+            summary = self._summarize_text(segment)
+
+        tags = data.get("tags")
+        if isinstance(tags, list) and tags:
+            # same shape as _tag_segment (free text)
+            tags = ", ".join(str(t).strip() for t in tags if str(t).strip())
+        elif not isinstance(tags, str) or not tags.strip():
+            tags = self._tag_segment(segment)
+
+        entities = data.get("entities")
+        if not isinstance(entities, list):
+            entities = self._extract_entities(segment)
+
+        return summary.strip(), tags, entities
+
+    def _summarize_text(self, text, hedge=False):
         if not text or not text.strip():
             return ""
 
-        # If you want to be extra-safe against long-lived instances hitting limits,
-        # you can rotate before each API call (uncomment next line).
-        # self._use_new_credentials()
-
         try:
             prompt = f"Summarize the following text in a concise manner:\n\n{text}"
-            resp = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=[
+            return gateway.chat(
+                [
                     {"role": "system", "content": "You are a document summarizer."},
                     {"role": "user", "content": prompt}
                 ],
+                deployment=self.openai_engine,
+                tool="summarizer",
+                cache=True,
                 max_tokens=300,
                 temperature=0.5,
-                timeout=20
+                timeout=20,
+                hedge=hedge
             )
-            return resp["choices"][0]["message"]["content"].strip()
 
-        except openai.error.RateLimitError as e:
-            # (Optional) rotate credentials and re-raise; the Celery task will retry
-            logger.warning(f"Rate limit encountered, rotating credentials and retrying via Celery: {e}")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            # re-raise; the Celery task will retry (gateway already rotated slots)
+            logger.warning(f"Rate limit encountered, retrying via Celery: {e}")
             raise
 
-        except openai.error.OpenAIError as e:
+        except LLMError as e:
             raise e
         except Exception as e:
             raise RuntimeError(f"Unexpected summarization error: {str(e)}")
 
+    def _summarize_text_stream(self, text):
+        """Same prompt as _summarize_text, yielding the summary as it is generated."""
+        if not text or not text.strip():
+            return
+        prompt = f"Summarize the following text in a concise manner:\n\n{text}"
+        yield from gateway.stream(
+            [
+                {"role": "system", "content": "You are a document summarizer."},
+                {"role": "user", "content": prompt}
+            ],
+            deployment=self.openai_engine,
+            tool="summarizer",
+            cache=True,
+            max_tokens=300,
+            temperature=0.5,
+            timeout=20
+        )
+
     def _segment_text(self, text):
         return text.split('\n\n')
 
@@ -130,15 +195,16 @@ class Summarizer:
         return tags
 
     def _tag_segment(self, segment):
-        resp = openai.ChatCompletion.create(
-            engine=self.openai_engine,
-            messages=[
+        return gateway.chat(
+            [
                 {"role": "system", "content": "You are a keyword extraction assistant."},
                 {"role": "user", "content": f"Assign tags to the following text:\n\n{segment}"}
             ],
+            deployment=self.openai_engine,
+            tool="summarizer",
+            cache=True,
             max_tokens=50
         )
-        return resp["choices"][0]["message"]["content"].strip()
 
     def _extract_named_entities(self, segments):
         return [self._extract_entities(s) for s in segments]
@@ -149,15 +215,14 @@ class Summarizer:
             "Format the output as a list of entities in JSON format:\n\n"
             f"Text:\n{segment}"
         )
-        resp = openai.ChatCompletion.create(
-            engine=self.openai_engine,
-            messages=[
+        raw = gateway.chat(
+            [
                 {"role": "system", "content": "You are a named entity recognition assistant."},
                 {"role": "user", "content": prompt}
             ],
+            deployment=self.openai_engine,
+            tool="summarizer",
+            cache=True,
             max_tokens=200
         )
-        try:
-            return json.loads(resp["choices"][0]["message"]["content"].strip())
-        except json.JSONDecodeError:
-            return []
\ No newline at end of file
+        return extract_json(raw, list) or []
\ No newline at end of file
@@ -1,11 +1,8 @@
 # app/stages/discover/topic_modeller/topic_modeller.py
 import os, json, logging
-import openai
+from app.services.llm_gateway import gateway
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
 
-openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-openai.api_base = os.getenv("AZURE_OPENAI_API_BASE")
-openai.api_type = 'azure'
-openai.api_version = '2023-03-15-preview'
 DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 logger = logging.getLogger(__name__)
@@ -17,18 +14,18 @@ def extract_topics_for_text(text: str, top_k: int = 8):
     prompt = (
         "Extract up to {k} short, high-signal topics (2–4 words each) from the text below. "
         "Return a JSON array of strings only.\n\nTEXT:\n{t}"
-    ).format(k=top_k, t=text[:12000])
+    ).format(k=top_k, t=fit_prompt_text(text, DEPLOYMENT, max_tokens=150, cap=PAGE_INPUT_TOKENS, label="topics"))
 
-    resp = openai.ChatCompletion.create(
-        engine=DEPLOYMENT,
-        messages=[
+    raw = gateway.chat(
+        [
             {"role": "system", "content": "You are a precise topic extraction assistant."},
             {"role": "user", "content": prompt},
         ],
+        deployment=DEPLOYMENT,
+        tool="topics",
         temperature=0.2,
         max_tokens=150,
     )
-    raw = resp["choices"][0]["message"]["content"].strip()
     try:
         arr = json.loads(raw)
         if isinstance(arr, list):
@@ -1,9 +1,8 @@
 import os
 import openai
 import json
-import docx
-import PyPDF2
 import logging
+from app.services.extraction_cache import document_pages
 
 # Set up Azure OpenAI API credentials
 openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
@@ -15,16 +14,9 @@ openai.api_version = '2023-03-15-preview'
 logger = logging.getLogger(__name__)
 
 def extract_text_from_document(file_path):
-    """Extracts text from a document based on its file type."""
-    if file_path.endswith('.docx'):
-        doc = docx.Document(file_path)
-        full_text = [para.text for para in doc.paragraphs]
-        return '\n'.join(full_text)
-    elif file_path.endswith('.pdf'):
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            full_text = [page.extract_text() for page in reader.pages]
-        return '\n'.join(full_text)
+    """Extracts text from a document based on its file type (cached by content hash)."""
+    if file_path.endswith(('.docx', '.pdf')):
+        return '\n'.join(document_pages(file_path))
     else:
         raise ValueError("Unsupported document format")
 
@@ -1,30 +1,19 @@
 import os
-import openai
-import json
-import docx
-import PyPDF2
 import logging
+from app.services.extraction_cache import document_pages
 
-# Set up Azure OpenAI API credentials
-openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-openai.api_base = os.getenv("AZURE_OPENAI_API_BASE")
-openai.api_type = 'azure'
-openai.api_version = '2023-03-15-preview'
+# Azure OpenAI via the shared gateway (per-call credentials, pooled sessions, streaming)
+from app.services.llm_gateway import gateway
+
+DEPLOYMENT = os.getenv("HOMEWORK_HELPER_DEPLOYMENT", "gpt-4o")
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 def extract_text_from_document(file_path):
-    """Extracts text from a document based on its file type."""
-    if file_path.endswith('.docx'):
-        doc = docx.Document(file_path)
-        full_text = [para.text for para in doc.paragraphs]
-        return '\n'.join(full_text)
-    elif file_path.endswith('.pdf'):
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            full_text = [page.extract_text() for page in reader.pages]
-        return '\n'.join(full_text)
+    """Extracts text from a document based on its file type (cached by content hash)."""
+    if file_path.endswith(('.docx', '.pdf')):
+        return '\n'.join(document_pages(file_path))
     else:
         raise ValueError("Unsupported document format")
 
@@ -47,37 +36,41 @@ def generate_prompt(context_type, context, question):
     else:
         raise ValueError("Invalid context type for prompt generation")
 
+def _messages(prompt):
+    return [
+        {"role": "system", "content": "You are a homework helper."},
+        {"role": "user", "content": prompt}
+    ]
+
 def call_openai_chat_completion(prompt, max_tokens=1000):
     """Calls the OpenAI Chat Completion API with the given prompt."""
     try:
-        response = openai.ChatCompletion.create(
-            engine="gpt-4o",  # Replace with your actual deployment name
-            messages=[
-                {"role": "system", "content": "You are a homework helper."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=max_tokens
-        )
-        return response["choices"][0]["message"]["content"].strip()
+        return gateway.chat(_messages(prompt), deployment=DEPLOYMENT, tool="homework_helper",
+                            max_tokens=max_tokens, timeout=60, hedge=True)
     except Exception as e:
         logger.error(f"Error calling OpenAI API: {e}")
         raise
 
-def answer_question_from_category(category, question):
-    """Answers a question based on the given category."""
+def stream_openai_chat_completion(prompt, max_tokens=1000):
+    """Like call_openai_chat_completion, but yields the answer text as it is generated."""
+    return gateway.stream(_messages(prompt), deployment=DEPLOYMENT, tool="homework_helper",
+                          max_tokens=max_tokens, timeout=60)
+
+def answer_question_from_category(category, question, stream=False):
+    """Answers a question based on the given category (a text iterator if stream=True)."""
     logger.info(f"Answering question from category: {category}")
     prompt = generate_prompt('category', category, question)
-    return call_openai_chat_completion(prompt)
+    return stream_openai_chat_completion(prompt) if stream else call_openai_chat_completion(prompt)
 
-def answer_question_from_document(file_path, question):
-    """Answers a question based on the content of a document."""
+def answer_question_from_document(file_path, question, stream=False):
+    """Answers a question based on the content of a document (a text iterator if stream=True)."""
     logger.info(f"Answering question from document: {file_path}")
     text = extract_text_from_document(file_path)
     prompt = generate_prompt('text', text, question)
-    return call_openai_chat_completion(prompt)
+    return stream_openai_chat_completion(prompt) if stream else call_openai_chat_completion(prompt)
 
-def answer_question_from_text(text, question):
-    """Answers a question based on the given text."""
+def answer_question_from_text(text, question, stream=False):
+    """Answers a question based on the given text (a text iterator if stream=True)."""
     logger.info("Answering question from provided text")
     prompt = generate_prompt('text', text, question)
-    return call_openai_chat_completion(prompt)
\ No newline at end of file
+    return stream_openai_chat_completion(prompt) if stream else call_openai_chat_completion(prompt)
\ No newline at end of file
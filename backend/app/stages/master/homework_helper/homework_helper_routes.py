@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify
+from app.utils.sse import sse_response, wants_stream
 from werkzeug.utils import secure_filename
 from .homework_helper import (
     answer_question_from_category,
@@ -36,10 +37,20 @@ def handle_file_upload(file):
     logger.info(f"File saved to temporary path: {file_path}")
     return file_path
 
+def stream_answer(deltas):
+    """SSE events for a streamed answer: `delta` chunks, then `done` with the full answer."""
+    parts = []
+    for delta in deltas:
+        parts.append(delta)
+        yield "delta", {"text": delta}
+    yield "done", {"answer": "".join(parts).strip()}
+
 # Route for answering homework questions
 @homework_helper_bp.route('/answer_question', methods=['POST'])
 def answer_question_route():
     try:
+        stream = wants_stream(request)
+
         # Handle multipart/form-data (for document-based question answering)
         if 'multipart/form-data' in request.content_type:
             file = request.files.get('file')
@@ -57,13 +68,15 @@ def answer_question_route():
             # Handle file upload
             file_path = handle_file_upload(file)
 
-            # Answer question
+            # Answer question (the document is read before the temp file goes away)
             try:
-                answer = answer_question_from_document(file_path, question)
+                answer = answer_question_from_document(file_path, question, stream=stream)
             finally:
                 os.remove(file_path)
                 logger.info(f"Temporary file removed: {file_path}")
 
+            if stream:
+                return sse_response(stream_answer(answer))
             return jsonify({"answer": answer})
 
         # Handle application/json (for category-based or text-based question answering)
@@ -83,7 +96,7 @@ def answer_question_route():
 
                 # Answer question from category
                 category = data.get('category')
-                answer = answer_question_from_category(category, question)
+                answer = answer_question_from_category(category, question, stream=stream)
 
             elif method == 'text':
                 is_valid, error_message = validate_request(
@@ -95,12 +108,14 @@ def answer_question_route():
 
                 # Answer question from text
                 text = data.get('text')
-                answer = answer_question_from_text(text, question)
+                answer = answer_question_from_text(text, question, stream=stream)
 
             else:
                 logger.error("Invalid method for question answering")
                 return jsonify({"error": "Invalid method for question answering"}), 400
 
+            if stream:
+                return sse_response(stream_answer(answer))
             return jsonify({"answer": answer})
 
         else:
@@ -1,4 +1,4 @@
-import logging, time
+import logging
 from celery import shared_task
 from sqlalchemy import asc
 from app.db import db
@@ -38,7 +38,7 @@ def build_chronology_for_file(self, file_id: str, progress_id: str, force: bool
                 if not force and has_col and getattr(page, "page_chronology", None):
                     pass  # already extracted
                 else:
-                    events = svc.extract_events_from_text(page.page_text or "")
+                    events = svc.extract_events_from_text(page.llm_text or "", refresh=force)
                     if has_col:
                         setattr(page, "page_chronology", events)
                     s.commit()
@@ -50,7 +50,6 @@ def build_chronology_for_file(self, file_id: str, progress_id: str, force: bool
             # progress update
             pct = int((done / total) * 100)
             _bump_progress(s, progress_id, pct)
-            time.sleep(0.2)  # gentle pacing
 
         _finish_progress(s, progress_id, status="completed", pct=100)
 
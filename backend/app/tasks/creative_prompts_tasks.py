@@ -1,4 +1,4 @@
-import logging, time
+import logging
 from celery import shared_task
 from sqlalchemy import asc
 from app.db import db
@@ -37,7 +37,7 @@ def build_prompts_for_file(self, file_id: str, progress_id: str, force: bool = F
                 if not force and has_col and getattr(page, "page_prompts", None):
                     pass  # already generated
                 else:
-                    prompts = svc.generate_prompts_from_text(page.page_text or "")
+                    prompts = svc.generate_prompts_from_text(page.llm_text or "")
                     if has_col:
                         setattr(page, "page_prompts", prompts)
                     s.commit()
@@ -47,7 +47,6 @@ def build_prompts_for_file(self, file_id: str, progress_id: str, force: bool = F
                 log.error(f"[CreativePrompts] Failed page {page.id}: {e}")
 
             _bump_progress(s, progress_id, int((done / total) * 100))
-            time.sleep(0.2)
 
         _finish_progress(s, progress_id, status="completed", pct=100)
 
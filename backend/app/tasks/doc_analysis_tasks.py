@@ -1,4 +1,4 @@
-import logging, time
+import logging
 from celery import shared_task
 from sqlalchemy import asc
 from app.db import db
@@ -27,19 +27,16 @@ def build_doc_analysis_for_file(self, file_id: str, progress_id: str, force: boo
             _finish_progress(s, progress_id, "completed", 100)
             return
 
-        # Compute per-page (no persistence now)
+        # Compute per-page, several pages per LLM call; results land in page_results,
+        # so /results reads them back instead of calling the LLM again
         done = 0
-        for page in pages:
-            try:
-                # Just a ping to LLM to distribute load and reflect progress;
-                # final results will be computed in /results again per your request.
-                svc.analyze_page(page.page_text or "")
-                done += 1
-            except Exception as e:
-                log.error(f"[DocAnalysis] Failed page {page.id}: {e}")
 
+        def on_batch(batch):
+            nonlocal done
+            done += len(batch)
             _bump_progress(s, progress_id, int(done*100/total))
-            time.sleep(0.2)
+
+        svc.analyze_pages([(p.page_number, p.llm_text or "") for p in pages], on_batch=on_batch, refresh=force)
 
         _finish_progress(s, progress_id, "completed", 100)
     except Exception:
@@ -1,4 +1,4 @@
-import logging, time, math
+import logging, math
 from celery import shared_task
 from sqlalchemy import asc
 from app.db import db
@@ -40,7 +40,8 @@ def build_quiz_for_file(self, file_id: str, progress_id: str, n: int = 10, diffi
                 if not force and has_col and getattr(page, "page_quiz", None):
                     pass  # already exists
                 else:
-                    questions = svc.generate_questions_from_text(page.page_text or "", k=k_per_page, difficulty=difficulty)
+                    questions = svc.generate_questions_from_text(page.llm_text or "", k=k_per_page, difficulty=difficulty,
+                                                              refresh=force)
                     if has_col:
                         setattr(page, "page_quiz", questions)
                     s.commit()
@@ -50,7 +51,6 @@ def build_quiz_for_file(self, file_id: str, progress_id: str, n: int = 10, diffi
                 log.error(f"[QuizCreator] Failed page {getattr(page, 'id', '?')}: {e}")
 
             _bump_progress(s, progress_id, int((done / total) * 100))
-            time.sleep(0.2)  # gentle pacing to avoid burst rate limits
 
         _finish_progress(s, progress_id, status="completed", pct=100)
 
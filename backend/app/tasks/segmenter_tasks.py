@@ -1,4 +1,4 @@
-import logging, time
+import logging
 from celery import shared_task
 from sqlalchemy import asc
 from app.db import db
@@ -34,7 +34,7 @@ def build_segments_for_file(self, file_id: str, progress_id: str, force: bool =
                 if not force and has_col and getattr(page, "page_segments", None):
                     pass
                 else:
-                    segs = svc.segment_page(page.page_text or "")
+                    segs = svc.segment_page(page.llm_text or "", refresh=force)
                     if has_col:
                         setattr(page, "page_segments", segs)
                     s.commit()
@@ -44,7 +44,6 @@ def build_segments_for_file(self, file_id: str, progress_id: str, force: bool =
                 log.error(f"[Segmentation] Failed page {page.id}: {e}")
 
             _bump_progress(s, progress_id, int(done * 100 / total))
-            time.sleep(0.2)  # gentle pacing
 
         _finish_progress(s, progress_id, "completed", 100)
 
@@ -1,4 +1,4 @@
-import logging, time
+import logging
 from celery import shared_task
 from sqlalchemy import asc
 from app.db import db
@@ -29,23 +29,27 @@ def build_sentiment_for_file(self, file_id: str, progress_id: str, force: bool =
 
         has_col = hasattr(FilePage, "page_sentiment")  # optional future column
 
-        done = 0
-        for page in pages:
+        pending = [p for p in pages if force or not (has_col and getattr(p, "page_sentiment", None))]
+        by_number = {p.page_number: p for p in pending}
+        done = total - len(pending)
+
+        def save_batch(batch):
+            # several pages come back per LLM call; persist and report per batch
+            nonlocal done
             try:
-                if not force and has_col and getattr(page, "page_sentiment", None):
-                    pass
-                else:
-                    result = svc.analyze_page(page.page_text or "")
-                    if has_col:
-                        setattr(page, "page_sentiment", result)
-                    s.commit()
-                done += 1
+                if has_col:
+                    for pn, result in batch.items():
+                        setattr(by_number[pn], "page_sentiment", result)
+                s.commit()
+                done += len(batch)
             except Exception as e:
                 s.rollback()
-                log.error(f"[Sentiment] Failed page {page.id}: {e}")
+                log.error(f"[Sentiment] Failed pages {list(batch)}: {e}")
 
             _bump_progress(s, progress_id, int(done * 100 / total))
-            time.sleep(0.2)
+
+        svc.analyze_pages([(p.page_number, p.llm_text or "") for p in pending], on_batch=save_batch,
+                          refresh=force)
 
         _finish_progress(s, progress_id, "completed", 100)
 
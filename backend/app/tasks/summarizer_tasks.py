@@ -1,14 +1,22 @@
 from app.main import celery_app
 from app.stages.discover.summarizer.summarizer import Summarizer
 from app.db import db
-from app.models import FilePage, Progress
+from app.models import FilePage, Progress, UploadedFile
+from app.utils.file_utils import iter_pages, detect_file_type, transcribe_media
+from app.services.transcription_service import progress_reporter
+from app.services import page_results
+from app.utils.extraction.boilerplate import strip_boilerplate
+from app.services.extraction_cache import PageWriter, get_pages, put_pages, file_sha256
 from celery.utils.log import get_task_logger
 from celery import states, group
 from celery.exceptions import Ignore
 from math import ceil
+from uuid import uuid4
+import os
 
-CHUNK_SIZE = 8            # tune for your page size & rate limits
-STAGGER_SECONDS = 10      # gentle ramp to avoid bursts
+CHUNK_SIZE = 8            # tune for your page size; pacing is done by key_manager's rate limiter
+EXTRACT_BATCH = 5         # pages committed and handed to summarize_page_batch together
+SUMMARY_TOOL = "summarizer/v1"  # page_results tool name; bump when the summary prompt changes
 logger = get_task_logger(__name__)
 
 # Tip: You can also configure autoretry at the decorator level for specific exceptions
@@ -16,7 +24,7 @@ logger = get_task_logger(__name__)
 def summarize_page_batch(self, page_ids):
     """
     Summarize a batch of pages.
-    Rotation: Each task instantiates Summarizer(), which selects the next Azure key/base.
+    Rotation: every LLM call goes through the shared gateway, which picks the next Azure key/base.
     Retries: on RateLimitError or transient errors, Celery retry kicks in with backoff.
     """
     session = db.session()
@@ -37,7 +45,8 @@ def summarize_page_batch(self, page_ids):
                 continue
 
             try:
-                summary = summarizer._summarize_text(page.page_text)
+                summary = page_results.cached(SUMMARY_TOOL, page.llm_text, lambda: summarizer._summarize_text(page.llm_text),
+                                              model=summarizer.openai_engine)
                 page.page_summary = summary
                 session.add(page)
             except Exception as inner_e:
@@ -49,27 +58,7 @@ def summarize_page_batch(self, page_ids):
 
         session.commit()
 
-        # Update progress (idempotent)
-        total_pages = session.query(FilePage).filter_by(file_id=file_id).count()
-        summarized_pages = session.query(FilePage).filter(
-            FilePage.file_id == file_id, FilePage.page_summary.isnot(None)
-        ).count()
-        percent = int((summarized_pages / total_pages) * 100) if total_pages else 0
-
-        progress_record = session.query(Progress).filter_by(file_id=file_id).first()
-        if progress_record:
-            dirty = False
-            if progress_record.percentage != percent:
-                progress_record.percentage = percent
-                dirty = True
-            if percent == 100 and progress_record.status != "completed":
-                progress_record.status = "completed"
-                dirty = True
-            if dirty:
-                session.add(progress_record)
-                session.commit()
-            logger.info(f"Progress for file {file_id} updated to {percent}%")
-
+        percent = _update_progress(session, file_id)
         return {"file_id": file_id, "percent": percent}
 
     except Exception as e:
@@ -84,11 +73,162 @@ def summarize_page_batch(self, page_ids):
         session.close()
 
 
+def _update_progress(session, file_id):
+    """
+    Recompute the summarizer Progress for a file (idempotent). While pages are
+    still being extracted (total_pages unset) it never reports completion.
+    """
+    uploaded = session.query(UploadedFile).get(file_id)
+    total_pages = uploaded.total_pages if uploaded and uploaded.total_pages is not None else None
+    stored_pages = session.query(FilePage).filter_by(file_id=file_id).count()
+    summarized_pages = session.query(FilePage).filter(
+        FilePage.file_id == file_id, FilePage.page_summary.isnot(None)
+    ).count()
+    if total_pages is None:
+        percent = min(99, int((summarized_pages / stored_pages) * 100)) if stored_pages else 0
+    else:
+        percent = int((summarized_pages / total_pages) * 100) if total_pages else 100
+
+    progress_record = session.query(Progress).filter_by(file_id=file_id).first()
+    if progress_record:
+        dirty = False
+        if progress_record.percentage != percent:
+            progress_record.percentage = percent
+            dirty = True
+        if percent == 100 and progress_record.status != "completed":
+            progress_record.status = "completed"
+            dirty = True
+        if dirty:
+            session.add(progress_record)
+            session.commit()
+        logger.info(f"Progress for file {file_id} updated to {percent}%")
+    return percent
+
+
+def _tee(pages, writer):
+    for page in pages:
+        writer.add(page)
+        yield page
+
+
+def _dispatch_summaries(session, pages):
+    """
+    Commit a batch of new pages and queue the ones that still need a summary.
+    Pages whose text was summarized before (in any upload) take the stored
+    summary from page_results and never reach the LLM.
+    """
+    engine = Summarizer().openai_engine
+    keys = {page.id: page_results.result_key(page.llm_text, SUMMARY_TOOL, model=engine) for page in pages}
+    stored = page_results.get_results(keys.values())
+    for page in pages:
+        page.page_summary = stored.get(keys[page.id])
+    session.commit()
+    todo = [str(page.id) for page in pages if page.page_summary is None]
+    if todo:
+        summarize_page_batch.delay(todo)
+    if len(todo) < len(pages):
+        logger.info(f"{len(pages) - len(todo)}/{len(pages)} pages reuse stored summaries")
+
+
+def _transcribed_pages(session, file_id, path):
+    """
+    Audio/video pages: the text of each transcribed chunk. Progress shows
+    status "transcribing" until the last chunk is back, then summarization
+    takes over the percentage.
+    """
+    progress_record = session.query(Progress).filter_by(file_id=file_id).first()
+    report = progress_reporter(progress_record.id) if progress_record else None
+    transcript = transcribe_media(path, on_progress=report)
+    if progress_record:
+        progress_record.status = "in_progress"
+        progress_record.percentage = 0
+        session.commit()
+    return transcript.chunks
+
+
+@celery_app.task(bind=True, acks_late=True)
+def extract_and_summarize_file(self, file_id: str, blob_name: str = None):
+    """
+    Extract a file's pages in the background and store them as FilePage rows,
+    handing each batch to summarize_page_batch as soon as it is committed, so
+    summarization starts before the last page is parsed. Pages are streamed
+    from iter_pages, so memory stays flat regardless of page count. Audio and
+    video are transcribed first, one page per transcribed chunk.
+    """
+    from app.routes.upload import download_blob_to_tmp
+
+    session = db.session()
+    path = None
+    try:
+        uploaded = session.query(UploadedFile).get(file_id)
+        if uploaded is None:
+            raise ValueError(f"Uploaded file {file_id} not found")
+        # acks_late: a redelivered task may find its earlier run finished or half done
+        stored = session.query(FilePage).filter_by(file_id=file_id).count()
+        if uploaded.total_pages is not None and stored:
+            logger.info(f"Pages of file {file_id} already extracted. Skipping.")
+            _update_progress(session, file_id)
+            return {"file_id": file_id, "pages": uploaded.total_pages}
+        if stored:
+            # an interrupted run: drop its pages rather than numbering a second set from 1
+            session.query(FilePage).filter_by(file_id=file_id).delete(synchronize_session=False)
+        uploaded.total_pages = None
+        session.commit()
+
+        # pages already extracted for this content (by any tool) skip the download and parse
+        pages = get_pages(uploaded.hash)
+        writer = None
+        if pages is None:
+            path = download_blob_to_tmp(blob_name, user_id=uploaded.user_id)
+            writer = PageWriter()
+            if detect_file_type(path) == "document":
+                pages = _tee(iter_pages(path), writer)
+            else:
+                pages = _tee(_transcribed_pages(session, file_id, path), writer)
+        batch, count = [], 0
+        for text, clean in strip_boilerplate(pages):
+            if not text.strip():  # Skip empty
+                continue
+            count += 1
+            page = FilePage(id=uuid4(), file_id=file_id, page_number=count, page_text=text, clean_text=clean)
+            session.add(page)
+            batch.append(page)
+            if len(batch) == EXTRACT_BATCH:
+                _dispatch_summaries(session, batch)
+                batch = []
+        if batch:
+            _dispatch_summaries(session, batch)
+        session.commit()
+        if writer is not None:
+            put_pages(uploaded.hash or file_sha256(path), writer)
+
+        uploaded = session.query(UploadedFile).get(file_id)
+        uploaded.total_pages = count
+        session.commit()
+        # batches that finished during extraction couldn't report completion yet
+        _update_progress(session, file_id)
+        return {"file_id": file_id, "pages": count}
+
+    except Exception:
+        session.rollback()
+        progress_record = session.query(Progress).filter_by(file_id=file_id).first()
+        if progress_record:
+            progress_record.status = "failed"
+            session.add(progress_record)
+            session.commit()
+        logger.exception(f"Page extraction failed for file {file_id}")
+        raise
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+        session.close()
+
+
 @celery_app.task(bind=True, acks_late=True)
 def summarize_file_kickoff(self, file_id: str, progress_id: str):
     """
     Fan-out a file's pages into multiple summarize_page_batch tasks.
-    Uses small countdown offsets to avoid rate-limit spikes.
+    No countdown staggering: every LLM call waits on the per-slot RPM/TPM buckets in key_manager.
     """
     session = db.session()
     try:
@@ -111,9 +251,9 @@ def summarize_file_kickoff(self, file_id: str, progress_id: str):
         # 2) Slice into batches
         chunks = [page_ids[i:i+CHUNK_SIZE] for i in range(0, len(page_ids), CHUNK_SIZE)]
 
-        # 3) Schedule batches with light staggering
-        for idx, chunk in enumerate(chunks):
-            summarize_page_batch.apply_async(args=[chunk], countdown=idx * STAGGER_SECONDS)
+        # 3) Schedule all batches at once; the rate limiter paces the actual calls
+        for chunk in chunks:
+            summarize_page_batch.apply_async(args=[chunk])
 
         # Option A (simple): rely on each page-batch to update Progress (you already do this).
         # Option B (optional): schedule a lightweight polling/finisher to flip 'completed'
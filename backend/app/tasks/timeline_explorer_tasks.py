@@ -3,6 +3,7 @@ from celery import shared_task
 from app.db import db
 from app.models import Progress
 from app.services.stages.discover.timeline_explorer_service import TimelineExplorerService
+from app.services.extraction_cache import vault_document_pages, document_text
 
 # Optional vault fetch
 try:
@@ -45,9 +46,10 @@ def build_timeline(self, progress_id: str, method: str, payload: dict):
             prog.percentage = 100
         elif method == "document":
             if payload.get("fromVault") and download_blob_to_tmp:
-                tmp_path = download_blob_to_tmp(payload.get("filename"))
+                # cached pages skip the blob download and parse entirely
+                doc_text = document_text(vault_document_pages(payload.get("filename")))
                 prog.percentage = 20; s.commit()
-                out = svc.from_document(tmp_path)
+                out = svc.from_text(doc_text)
                 prog.percentage = 100
             else:
                 # (if you want to support temp path passing, handle here)
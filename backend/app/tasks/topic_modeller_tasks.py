@@ -1,34 +1,23 @@
 import os
 import json
 import logging
-import time
 from celery import shared_task
 from sqlalchemy import asc
 from app.db import db
 from app.models import FilePage, Progress
-from app.services.openai_key_manager import key_manager
-import openai
+from app.services.llm_gateway import gateway, LLMError, RateLimitError
+from app.services.page_packing import run_packed, render_pages
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
 
 logger = logging.getLogger(__name__)
 
 # Azure OpenAI config
-OPENAI_API_TYPE = "azure"
-OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-03-15-preview")
 DEFAULT_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")
 
 
 class TopicModeller:
     def __init__(self, openai_engine=DEFAULT_DEPLOYMENT):
         self.openai_engine = openai_engine
-        self._use_new_credentials()
-
-    def _use_new_credentials(self):
-        api_key, api_base, idx = key_manager.get_next()
-        openai.api_type = OPENAI_API_TYPE
-        openai.api_version = OPENAI_API_VERSION
-        openai.api_key = api_key
-        openai.api_base = api_base
-        logger.info(f"[TopicModeller] Using Azure OpenAI credential slot #{idx} ({openai.api_base})")
 
     def extract_topics(self, text, top_k=8):
         if not text or not text.strip():
@@ -36,21 +25,21 @@ class TopicModeller:
 
         prompt = (
             f"Extract up to {top_k} short, high-signal topics (2–4 words each) "
-            f"from the text below. Return a JSON array of strings only.\n\nTEXT:\n{text[:12000]}"
+            f"from the text below. Return a JSON array of strings only.\n\nTEXT:\n{fit_prompt_text(text, self.openai_engine, max_tokens=150, cap=PAGE_INPUT_TOKENS, label='topics')}"
         )
 
         try:
-            resp = openai.ChatCompletion.create(
-                engine=self.openai_engine,
-                messages=[
+            raw = gateway.chat(
+                [
                     {"role": "system", "content": "You are a precise topic extraction assistant."},
                     {"role": "user", "content": prompt}
                 ],
+                deployment=self.openai_engine,
+                tool="topics",
                 temperature=0.2,
                 max_tokens=150,
                 timeout=20
             )
-            raw = resp["choices"][0]["message"]["content"].strip()
             try:
                 arr = json.loads(raw)
                 if isinstance(arr, list):
@@ -62,15 +51,53 @@ class TopicModeller:
             parts = [p.strip() for p in raw.replace("\n", ",").split(",")]
             return [p for p in parts if p][:top_k]
 
-        except openai.error.RateLimitError as e:
-            logger.warning(f"Rate limit hit, rotating key and retrying: {e}")
-            self._use_new_credentials()
+        except RateLimitError as e:
+            logger.warning(f"Rate limit hit, retrying via Celery: {e}")
             raise
-        except openai.error.OpenAIError as e:
+        except LLMError as e:
             raise e
         except Exception as e:
             raise RuntimeError(f"Unexpected topic extraction error: {str(e)}")
 
+    def extract_topics_many(self, pages, top_k=8, on_batch=None):
+        """
+        Packed extract_topics: {page_key: [topics]} for [(page_key, text)...],
+        several pages per request; unparseable pages fall back to extract_topics.
+        """
+        results = {key: [] for key, text in pages if not (text or "").strip()}
+        if results and on_batch:
+            on_batch(dict(results))  # blank pages count toward progress too
+        todo = [(key, fit_prompt_text(text, self.openai_engine, cap=PAGE_INPUT_TOKENS, label=f"topics {key}"))
+                for key, text in pages if (text or "").strip()]
+
+        def call_batch(batch, max_tokens):
+            prompt = (
+                f"For EACH page below, extract up to {top_k} short, high-signal topics (2–4 words each). "
+                'Return ONLY a JSON array with one object per page: {"id": <page id>, "topics": [...]}.\n\n'
+                f"{render_pages(batch)}"
+            )
+            return gateway.chat(
+                [
+                    {"role": "system", "content": "You are a precise topic extraction assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                deployment=self.openai_engine,
+                tool="topics",
+                temperature=0.2,
+                max_tokens=max_tokens,
+                timeout=60
+            )
+
+        def parse_item(item):
+            topics = item.get("topics")
+            if not isinstance(topics, list):
+                raise ValueError("topics is not a list")
+            return [str(x).strip()[:80] for x in topics if str(x).strip()][:top_k]
+
+        results.update(run_packed(todo, call_batch, parse_item, lambda t: self.extract_topics(t, top_k),
+                                  out_tokens_per_page=60, on_batch=on_batch))
+        return results
+
 
 @shared_task(bind=True, max_retries=2, default_retry_delay=10)
 def build_topics_for_file(self, file_id: str, progress_id: str, force: bool = False):
@@ -93,19 +120,21 @@ def build_topics_for_file(self, file_id: str, progress_id: str, force: bool = Fa
                 s.commit()
             return
 
-        done = 0
-        for idx, page in enumerate(pages, start=1):
+        pending = [p for p in pages if force or not p.page_topics]
+        by_id = {str(p.id): p for p in pending}
+        done = total - len(pending)
+
+        def save_batch(batch_topics):
+            # persist each packed batch as it lands so finished pages survive a retry
+            nonlocal done
             try:
-                if not force and page.page_topics:
-                    pass
-                else:
-                    topics = modeller.extract_topics(page.page_text or "")
-                    page.page_topics = topics
+                for key, topics in batch_topics.items():
+                    by_id[key].page_topics = topics
                 s.commit()
-                done += 1
+                done += len(batch_topics)
             except Exception as inner:
                 s.rollback()
-                logger.error(f"Topic extraction failed for page {page.id}: {inner}")
+                logger.error(f"Topic extraction failed for pages {list(batch_topics)}: {inner}")
 
             # Update progress
             percent = int((done / total) * 100)
@@ -114,7 +143,10 @@ def build_topics_for_file(self, file_id: str, progress_id: str, force: bool = Fa
                 prog.percentage = max(prog.percentage or 0, percent)
                 s.commit()
 
-            time.sleep(0.2)  # pacing
+        modeller.extract_topics_many(
+            [(str(p.id), p.llm_text or "") for p in pending],
+            on_batch=save_batch,
+        )
 
         # Mark complete
         prog = s.query(Progress).get(progress_id)
@@ -0,0 +1,89 @@
+import logging
+from datetime import datetime
+from celery import shared_task
+from app.db import db
+from app.models import UploadedFile, UploadSession
+from app.services.blob_storage import get_blob_service_client
+from app.routes.upload import CONTAINER_NAME, UPLOAD_SESSION_TTL
+
+log = logging.getLogger(__name__)
+
+BATCH = 500
+
+
+@shared_task(bind=True, acks_late=True)
+def reconcile_vault(self, user_id: str = None):
+    """
+    Brings uploaded_files in line with the blob store, which /api/upload/files
+    no longer consults: rows whose blob is gone are marked status="missing"
+    (hidden from the listing), rows whose blob reappeared get their previous
+    status back, and blobs without a row are reported. One storage listing
+    per run instead of one per page view; run it for one user or
+    (user_id=None) for everyone.
+
+    Uploads keep arriving while the listing runs, so only rows created before
+    it started can be judged missing; newer ones wait for the next run.
+    """
+    s = db.session()
+    try:
+        run_start = datetime.utcnow()
+        container = get_blob_service_client().get_container_client(CONTAINER_NAME)
+        prefix = f"{user_id}/uploads/" if user_id else None
+        blob_paths = {
+            b.name for b in container.list_blobs(name_starts_with=prefix)
+            if "/uploads/" in b.name
+        }
+
+        q = s.query(UploadedFile)
+        if user_id:
+            q = q.filter(UploadedFile.user_id == user_id)
+        missing = restored = 0
+        seen = set()
+        for row in q.yield_per(BATCH):
+            seen.add(row.file_path)
+            exists = row.file_path in blob_paths
+            if not exists and row.status != "missing" and row.created_at < run_start:
+                row.status_before_missing = row.status
+                row.status = "missing"
+                missing += 1
+            elif exists and row.status == "missing":
+                row.status, row.status_before_missing = row.status_before_missing, None
+                restored += 1
+        s.commit()
+
+        orphans = sorted(blob_paths - seen)
+        for path in orphans[:20]:
+            log.warning(f"[Vault] blob without a DB row: {path}")
+        result = {"blobs": len(blob_paths), "rows": len(seen), "marked_missing": missing,
+                  "restored": restored, "orphan_blobs": len(orphans)}
+        log.info(f"[Vault] reconcile {user_id or 'all users'}: {result}")
+        return result
+    except Exception:
+        s.rollback()
+        log.exception("[Vault] reconcile failed")
+        raise
+    finally:
+        s.close()
+
+
+@shared_task(bind=True, acks_late=True)
+def purge_upload_sessions(self):
+    """
+    Deletes resumable uploads older than UPLOAD_SESSION_TTL: abandoned ones
+    (Azure has dropped their staged blocks by then) and committed ones, which
+    only kept answering repeated commits. Runs nightly from the beat schedule
+    in app/celery_worker.py.
+    """
+    s = db.session()
+    try:
+        cutoff = datetime.utcnow() - UPLOAD_SESSION_TTL
+        deleted = s.query(UploadSession).filter(UploadSession.created_at < cutoff).delete(synchronize_session=False)
+        s.commit()
+        log.info(f"[Vault] purged {deleted} upload sessions")
+        return {"deleted": deleted}
+    except Exception:
+        s.rollback()
+        log.exception("[Vault] purging upload sessions failed")
+        raise
+    finally:
+        s.close()
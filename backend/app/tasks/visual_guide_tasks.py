@@ -4,6 +4,7 @@ from sqlalchemy import asc
 from app.db import db
 from app.models import FilePage, Progress
 from app.services.stages.discover.visual_guide_service import VisualGuideService
+from app.services.extraction_cache import vault_document_pages, document_text
 
 # Optional vault loader
 try:
@@ -43,8 +44,8 @@ def build_visual_study_guide(self, progress_id: str, method: str, payload: dict)
             out = svc.from_text(payload.get("text",""))
         elif method == "document":
             if payload.get("fromVault") and download_blob_to_tmp:
-                tmp_path = download_blob_to_tmp(payload.get("filename"))
-                out = svc.from_document(tmp_path)
+                # cached pages skip the blob download and parse entirely
+                out = svc.from_text(document_text(vault_document_pages(payload.get("filename"))))
             else:
                 # if you want to pass a transient path in payload["tmp_path"] you can handle it here
                 out = {"summary": "", "topics": []}
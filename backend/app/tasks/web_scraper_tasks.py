@@ -9,9 +9,9 @@ from app.db import db
 from app.models import WebScrapeJob, KnowledgeItem
 from datetime import datetime
 from celery.utils.log import get_task_logger
-from azure.storage.blob import BlobServiceClient, ContentSettings
-import openai
-from app.services.openai_key_manager import key_manager
+from app.services.llm_gateway import gateway
+from app.utils.token_budget import fit_prompt_text, PAGE_INPUT_TOKENS
+from app.services.blob_storage import get_blob_service_client
 
 logger = get_task_logger(__name__)
 
@@ -27,6 +27,7 @@ def _sanitize_filename(name: str) -> str:
 
 
 def _upload_blob_bytes(container_client, blob_path: str, data: bytes, content_type: str = "text/plain") -> str:
+    from azure.storage.blob import ContentSettings
     blob_client = container_client.get_blob_client(blob_path)
     blob_client.upload_blob(data, overwrite=True, content_settings=ContentSettings(content_type=content_type))
     return blob_client.url
@@ -44,25 +45,19 @@ def _extract_text_from_html(html: str) -> str:
 
 
 def _summarize_and_structure(text: str, url: str, title_hint: str = None):
-    api_key, api_base, idx = key_manager.get_next()
-    openai.api_type = "azure"
-    openai.api_version = "2023-03-15-preview"
-    openai.api_key = api_key
-    openai.api_base = api_base
-
     system = "You are an assistant that summarizes webpages and produces structured JSON with fields: title, summary, key_points (list), entities (list), published_date (if found), author (if found), and recommended_actions (list)."
-    user = f"Summarize and structure the following webpage content from {url}. If text is too long, focus on the most informative parts. Content:\n\n{text[:12000]}"
+    user = f"Summarize and structure the following webpage content from {url}. If text is too long, focus on the most informative parts. Content:\n\n{fit_prompt_text(text, max_tokens=900, cap=PAGE_INPUT_TOKENS, label='web_scraper')}"
 
-    resp = openai.ChatCompletion.create(
-        engine=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1"),
-        messages=[
+    content = gateway.chat(
+        [
             {"role": "system", "content": system},
             {"role": "user", "content": user}
         ],
+        deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1"),
+        tool="web_scraper",
         max_tokens=900,
         temperature=0.2
     )
-    content = resp["choices"][0]["message"]["content"].strip()
 
     # Best-effort JSON extraction
     import json
@@ -111,9 +106,7 @@ def scrape_and_summarize(self, job_id: str):
         session.add(job); session.commit()
 
         # Store blobs
-        if not AZURE_STORAGE_CONNECTION_STRING:
-            raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not set")
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+        blob_service_client = get_blob_service_client(AZURE_STORAGE_CONNECTION_STRING)
         container_client = blob_service_client.get_container_client(os.getenv("AZURE_BLOB_CONTAINER", "scoolish"))
         user_prefix = f"{job.user_id}/scrapes/{datetime.utcnow().strftime('%Y/%m/%d')}/"
         parsed = urlparse(job.url)
@@ -0,0 +1,129 @@
+"""
+Document extraction shared by every tool. Format backends register themselves
+here; callers get a stream of Page objects whatever the file type:
+
+    for page in iter_document(path):
+        page.number, page.text, page.start, page.end, page.headings
+
+The backend for a format is picked with <FORMAT>_EXTRACT_BACKEND (for example
+PDF_EXTRACT_BACKEND=pymupdf). An unknown or uninstalled backend falls back to
+the format's default.
+"""
+import os
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Page offsets index into the pages joined with this separator (see document_text)
+PAGE_SEPARATOR = "\n\n"
+
+
+@dataclass
+class Page:
+    number: int         # 1-based
+    text: str
+    start: int          # char offsets of `text` within document_text(pages)
+    end: int
+    headings: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RawPage:
+    """What backends yield; headings=None lets the engine detect them from the text."""
+    text: str
+    headings: Optional[List[str]] = None
+
+
+class Backend:
+    name = ""
+    formats = ()
+
+    def available(self) -> bool:
+        return True
+
+    def iter_pages(self, path) -> Iterator[RawPage]:
+        raise NotImplementedError
+
+
+_REGISTRY = {}   # format -> {backend name: backend}
+_DEFAULTS = {}   # format -> default backend name
+
+
+def register_backend(cls=None, *, default=False):
+    """Class decorator: `@register_backend` or `@register_backend(default=True)`."""
+    def register(backend_cls):
+        backend = backend_cls()
+        for fmt in backend.formats:
+            _REGISTRY.setdefault(fmt, {})[backend.name] = backend
+            if default or fmt not in _DEFAULTS:
+                _DEFAULTS[fmt] = backend.name
+        return backend_cls
+    return register(cls) if cls is not None else register
+
+
+def file_format(path) -> str:
+    return os.path.splitext(path)[1].lower().lstrip(".")
+
+
+def supported(path) -> bool:
+    return file_format(path) in _REGISTRY
+
+
+def get_backend(fmt, name=None) -> Backend:
+    backends = _REGISTRY.get(fmt)
+    if not backends:
+        raise ValueError("Unsupported document format")
+    name = name or os.getenv(f"{fmt.upper()}_EXTRACT_BACKEND") or _DEFAULTS[fmt]
+    backend = backends.get(name)
+    if backend is None or not backend.available():
+        fallback = backends[_DEFAULTS[fmt]]
+        log.warning(f"[extraction] {fmt} backend {name!r} unavailable, using {fallback.name!r}")
+        backend = fallback
+    return backend
+
+
+def iter_document(path, backend=None) -> Iterator[Page]:
+    """Pages of a document in order, one at a time."""
+    fmt = file_format(path)
+    be = get_backend(fmt, backend)
+    offset = 0
+    for number, raw in enumerate(be.iter_pages(path), start=1):
+        headings = raw.headings if raw.headings is not None else detect_headings(raw.text)
+        yield Page(number, raw.text, offset, offset + len(raw.text), headings)
+        offset += len(raw.text) + len(PAGE_SEPARATOR)
+
+
+def extract_pages(path, backend=None) -> List[Page]:
+    return list(iter_document(path, backend))
+
+
+def document_text(pages) -> str:
+    return PAGE_SEPARATOR.join(p.text for p in pages)
+
+
+_NUMBERED_HEADING = re.compile(r"^((chapter|section|part|unit|lesson|appendix)\s+\w+|\d+(\.\d+)*\.?\s+\S)", re.I)
+
+
+def detect_headings(text, limit=5) -> List[str]:
+    """Short standalone lines that look like titles: numbered, ALL CAPS or Title Case."""
+    out = []
+    for line in text.splitlines():
+        s = line.strip()
+        if not 3 <= len(s) <= 80 or s[-1] in ".,;:" or sum(c.isalpha() for c in s) < 3:
+            continue
+        words = s.split()
+        if len(words) > 12:
+            continue
+        significant = [w for w in words if len(w) > 3 and w[0].isalpha()]
+        if _NUMBERED_HEADING.match(s) or s.isupper() or (significant and all(w[0].isupper() for w in significant)):
+            out.append(s)
+            if len(out) >= limit:
+                break
+    return out
+
+
+# Built-in backends register themselves on import
+from . import pdf, office, text  # noqa: E402,F401
@@ -0,0 +1,88 @@
+"""
+Running headers, footers, page numbers and repeated legal notices, found by how
+often a line recurs across pages and where on the page it sits. Stripping them
+(and collapsing whitespace) before pages reach any LLM prompt saves input tokens
+on every tool; the raw text is kept alongside.
+"""
+import os
+import re
+from collections import Counter
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+# Pages used to learn what repeats before the rest of a stream is cleaned
+SAMPLE_PAGES = int(os.getenv("BOILERPLATE_SAMPLE_PAGES", "50"))
+MIN_PAGES = 3           # fewer pages than this and nothing counts as repeated
+EDGE_LINES = 3          # lines at the top and bottom of a page checked as header/footer
+EDGE_RATIO = 0.4        # a header/footer recurs on at least this share of pages
+BODY_RATIO = 0.6        # a line anywhere on the page must recur on this share...
+BODY_MIN_CHARS = 30     # ...and be this long, so short common lines survive
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+_PAGE_NUMBER = re.compile(
+    r"^(page\s*)?[-–—(\[]?\s*(\d+|[ivxl]{1,6})\s*[-–—)\]]?(\s*(of|/)\s*\d+)?$", re.I
+)
+
+
+def _norm(line: str) -> str:
+    # digits vary page to page ("Chapter 3 | 47"), so they don't count
+    return _SPACES.sub(" ", _DIGITS.sub("#", line.strip().lower()))
+
+
+class Boilerplate:
+    def __init__(self, edge=(), body=()):
+        self.edge = set(edge)
+        self.body = set(body)
+
+    @classmethod
+    def learn(cls, pages: List[str]) -> "Boilerplate":
+        n = len(pages)
+        if n < MIN_PAGES:
+            return cls()
+        edge_counts, body_counts = Counter(), Counter()
+        for text in pages:
+            lines = [l for l in (x.strip() for x in text.splitlines()) if l]
+            edge_counts.update({_norm(l) for l in lines[:EDGE_LINES] + lines[-EDGE_LINES:]})
+            body_counts.update({_norm(l) for l in lines if len(l) >= BODY_MIN_CHARS})
+        edge_min = max(MIN_PAGES, EDGE_RATIO * n)
+        body_min = max(MIN_PAGES, BODY_RATIO * n)
+        return cls(
+            (k for k, c in edge_counts.items() if c >= edge_min),
+            (k for k, c in body_counts.items() if c >= body_min),
+        )
+
+    def clean(self, text: str) -> str:
+        lines = text.splitlines()
+        filled = [i for i, l in enumerate(lines) if l.strip()]
+        edges = set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+        kept = []
+        for i, line in enumerate(lines):
+            s = line.strip()
+            key = _norm(s)
+            if i in edges and (key in self.edge or _PAGE_NUMBER.match(s)):
+                continue
+            if key in self.body:
+                continue
+            kept.append(_SPACES.sub(" ", s))
+        return _BLANK_RUNS.sub("\n\n", "\n".join(kept)).strip()
+
+
+def clean_pages(pages: List[str]) -> List[str]:
+    bp = Boilerplate.learn(pages)
+    return [bp.clean(p) for p in pages]
+
+
+def strip_boilerplate(pages: Iterable[str], sample: int = SAMPLE_PAGES) -> Iterator[Tuple[str, str]]:
+    """
+    (raw, cleaned) for each page of a stream. What repeats is learned from the
+    first `sample` pages, so memory stays bounded for long documents.
+    """
+    it = iter(pages)
+    head = list(islice(it, sample))
+    bp = Boilerplate.learn(head)
+    for text in head:
+        yield text, bp.clean(text)
+    for text in it:
+        yield text, bp.clean(text)
@@ -0,0 +1,21 @@
+from . import Backend, register_backend
+from .segment import Block, pack_blocks
+
+
+@register_backend(default=True)
+class PythonDocxBackend(Backend):
+    """DOCX has no pages; paragraphs are packed into pages of about PAGE_TARGET_TOKENS."""
+    name = "python-docx"
+    formats = ("docx",)
+
+    def iter_pages(self, path):
+        import docx
+        return pack_blocks(self._blocks(docx.Document(path)), joiner="\n")
+
+    @staticmethod
+    def _blocks(document):
+        for p in document.paragraphs:
+            if not p.text.strip():
+                continue
+            style = (p.style.name or "") if p.style is not None else ""
+            yield Block(p.text, style.startswith(("Heading", "Title")))
@@ -0,0 +1,48 @@
+from . import Backend, RawPage, register_backend
+
+
+@register_backend(default=True)
+class PyPDF2Backend(Backend):
+    name = "pypdf2"
+    formats = ("pdf",)
+
+    def available(self):
+        try:
+            import PyPDF2  # noqa: F401
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _reader(file):
+        import PyPDF2
+        return PyPDF2.PdfReader(file)
+
+    def iter_pages(self, path):
+        with open(path, "rb") as f:
+            for page in self._reader(f).pages:
+                yield RawPage(page.extract_text() or "")
+
+
+@register_backend
+class PyMuPDFBackend(Backend):
+    """MuPDF-based text extraction; much faster than PyPDF2 where the wheel is installed."""
+    name = "pymupdf"
+    formats = ("pdf",)
+
+    def available(self):
+        try:
+            import fitz  # noqa: F401
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _open(path):
+        import fitz
+        return fitz.open(path)
+
+    def iter_pages(self, path):
+        with self._open(path) as doc:
+            for page in doc:
+                yield RawPage(page.get_text() or "")
@@ -0,0 +1,107 @@
+"""
+Pages for formats that have none (DOCX, TXT). Paragraphs are packed in order
+up to a target token size, so every page costs about the same to send to an
+LLM. A heading starts a new page once the current one is reasonably full and
+is never left alone at the bottom of a page; a paragraph longer than a page is
+split at sentence ends (at spaces if a single sentence is too long).
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Tuple
+
+from app.utils.token_budget import count_tokens
+
+from . import RawPage, detect_headings
+
+PAGE_TARGET_TOKENS = int(os.getenv("PAGE_TARGET_TOKENS", "500"))
+# A heading breaks the page only if the page already holds this share of the target
+HEADING_BREAK_FILL = 0.5
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]?\s+")
+_MARKDOWN_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+
+
+@dataclass
+class Block:
+    text: str
+    heading: bool = False
+
+
+def is_heading_line(line: str, markdown_only: bool = False) -> bool:
+    """Markdown '#' headings, or (unless markdown_only) a short line that reads as a title."""
+    if _MARKDOWN_HEADING.match(line):
+        return True
+    return not markdown_only and len(line) <= 80 and bool(detect_headings(line, limit=1))
+
+
+def _split_long(text: str, target: int, first: int) -> List[Tuple[str, int]]:
+    """
+    (piece, tokens) of at most ~target tokens (the first at most ~first, to
+    fill the current page), cut at sentence ends, else at spaces.
+    """
+    sentences, start = [], 0
+    for m in _SENTENCE_END.finditer(text):
+        sentences.append(text[start:m.end()])
+        start = m.end()
+    sentences.append(text[start:])
+
+    out, cur, cur_n, cap = [], "", 0, first
+    for sentence in sentences:
+        n = count_tokens(sentence)
+        if cur and cur_n + n > cap:
+            out.append((cur.strip(), cur_n))
+            cur, cur_n, cap = "", 0, target
+        if n > cap:
+            # a single sentence longer than a page: cut at spaces, sized by its chars per token
+            chars_per_token = len(sentence) / n
+            while len(sentence) > cap * chars_per_token:
+                width = max(1, int(cap * chars_per_token))
+                cut = sentence.rfind(" ", 0, width) + 1 or width
+                out.append((sentence[:cut].strip(), count_tokens(sentence[:cut])))
+                sentence, cap = sentence[cut:], target
+            n = count_tokens(sentence)
+        cur += sentence
+        cur_n += n
+    if cur.strip():
+        out.append((cur.strip(), cur_n))
+    return [(t, k) for t, k in out if t]
+
+
+def pack_blocks(blocks: Iterable[Block], joiner: str = "\n\n",
+                target: int = PAGE_TARGET_TOKENS) -> Iterator[RawPage]:
+    page: List[Tuple[Block, int]] = []
+    size = 0
+
+    def flush():
+        return RawPage(
+            joiner.join(b.text for b, _ in page),
+            [b.text.lstrip("# ").strip() for b, _ in page if b.heading],
+        )
+
+    for block in blocks:
+        if not block.text.strip():
+            continue
+        if block.heading and page and size >= target * HEADING_BREAK_FILL:
+            yield flush()
+            page, size = [], 0
+        n = count_tokens(block.text)
+        if n <= target:
+            pieces = [(block, n)]
+        else:
+            room = target - size
+            first = room if room >= target * (1 - HEADING_BREAK_FILL) else target
+            pieces = [(Block(t), k) for t, k in _split_long(block.text, target, first)]
+        for piece, k in pieces:
+            if page and size + k > target:
+                # a heading at the bottom of a full page moves over with its section
+                carry = []
+                while page and page[-1][0].heading:
+                    carry.insert(0, page.pop())
+                if page:
+                    yield flush()
+                page, size = carry, sum(c for _, c in carry)
+            page.append((piece, k))
+            size += k
+    if page:
+        yield flush()
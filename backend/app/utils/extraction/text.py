@@ -0,0 +1,36 @@
+from . import Backend, register_backend
+from .segment import Block, is_heading_line, pack_blocks
+
+
+@register_backend(default=True)
+class PlainTextBackend(Backend):
+    """
+    Plain text has no pages; blank-line separated paragraphs are packed into
+    pages of about PAGE_TARGET_TOKENS. Markdown '#' lines and short title-like
+    lines count as headings.
+    """
+    name = "text"
+    formats = ("txt",)
+
+    def iter_pages(self, path):
+        return pack_blocks(self._blocks(path))
+
+    @staticmethod
+    def _blocks(path):
+        para = []
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if not line.strip():
+                    if para:
+                        yield Block("\n".join(para))
+                        para = []
+                elif is_heading_line(line, markdown_only=bool(para)):
+                    if para:
+                        yield Block("\n".join(para))
+                        para = []
+                    yield Block(line.strip(), heading=True)
+                else:
+                    para.append(line)
+        if para:
+            yield Block("\n".join(para))
@@ -1,24 +1,25 @@
 import os
-import docx
-try:
-	import PyPDF2
-except Exception:
-	PyPDF2 = None
-try:
-	from pydub import AudioSegment
-except Exception:
-	AudioSegment = None
-try:
-	import moviepy.editor as mp
-except Exception:
-	mp = None
-from app.services.lemonfox_service import transcribe_audio
-from app.services.whisper_service import translate_audio_with_azure_whisper
-from transformers import GPT2TokenizerFast
+import re
+from functools import lru_cache
+from app.services.transcription_service import transcribe_file
+from app.utils.extraction import iter_document, extract_pages, document_text
 # transcriber = AzureWhisperTranscriber()
 
-tokenizer = GPT2TokenizerFast.from_pretrained("gpt2")
+# Heavy dependencies (transformers + the GPT-2 vocab) are loaded on first
+# use rather than at import, so API and worker processes start without them.
+# Document parsing lives in app.utils.extraction.
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+	from transformers import GPT2TokenizerFast
+	return GPT2TokenizerFast.from_pretrained("gpt2")
+
+
 TOKEN_LIMIT = 1500  # You can tweak this
+TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", "0"))  # tokens repeated between consecutive chunks
+# Text is tokenized in blocks of about this many characters (cut at paragraph breaks) to bound memory
+_TOKENIZE_BLOCK_CHARS = 1_000_000
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]?(?=\s)")
 
 def detect_file_type(file_path):
 	"""Detects the file type based on its extension."""
@@ -34,89 +35,121 @@ def detect_file_type(file_path):
 def extract_text_from_document(file_path):
 	"""Returns a list of chunks: pages for PDFs, token-wise for DOCX/TXT."""
 	if file_path.endswith('.pdf'):
-		if PyPDF2 is None:
-			raise RuntimeError("PyPDF2 not available")
-		with open(file_path, 'rb') as file:
-			reader = PyPDF2.PdfReader(file)
-			return [page.extract_text() or "" for page in reader.pages]
-
-	elif file_path.endswith('.docx'):
-		doc = docx.Document(file_path)
-		text = '\n'.join([para.text for para in doc.paragraphs])
-		return _chunk_by_token(text)
-
-	elif file_path.endswith('.txt'):
-		with open(file_path, 'r', encoding='utf-8') as f:
-			text = f.read()
-		return _chunk_by_token(text)
+		return list(iter_pages(file_path))
+
+	elif file_path.endswith(('.docx', '.txt')):
+		return _chunk_by_token(document_text(extract_pages(file_path)))
 
 	else:
 		raise ValueError("Unsupported document format")
 
 
-def _chunk_by_token(text, token_limit=TOKEN_LIMIT):
-	"""Splits text into token-sized chunks."""
-	words = text.split()
-	chunks, current_chunk = [], []
-
-	for word in words:
-		current_chunk.append(word)
-		if len(tokenizer.encode(' '.join(current_chunk))) > token_limit:
-			chunks.append(' '.join(current_chunk[:-1]))
-			current_chunk = [word]
-	
-	if current_chunk:
-		chunks.append(' '.join(current_chunk))
-	
+def _chunk_by_token(text, token_limit=TOKEN_LIMIT, overlap=TOKEN_OVERLAP):
+	"""
+	Splits text into chunks of at most `token_limit` tokens, cutting at a paragraph
+	break, else a sentence end, else whitespace near the end of each window.
+	Each block of text is tokenized once and windows are sliced from the fast
+	tokenizer's offset mapping, so the cost is linear in the input size.
+	`overlap` tokens from the end of a chunk are repeated at the start of the next.
+	"""
+	overlap = max(0, min(overlap, token_limit // 2))
+	tokenizer = get_tokenizer()
+	chunks = []
+	for block in _paragraph_blocks(text, _TOKENIZE_BLOCK_CHARS):
+		offsets = tokenizer(block, return_offsets_mapping=True, add_special_tokens=False)["offset_mapping"]
+		start, n = 0, len(offsets)
+		while start < n:
+			end = min(start + token_limit, n)
+			if end < n:
+				end = _boundary_token(block, offsets, start, end)
+			chunk = block[offsets[start][0]:offsets[end - 1][1]].strip()
+			if chunk:
+				chunks.append(chunk)
+			if end >= n:
+				break
+			start = max(start + 1, end - overlap)
 	return chunks
 
 
-def extract_text_from_audio(file_path):
+def _paragraph_blocks(text, size):
+	"""Yields consecutive slices of ~`size` chars, each ending at a paragraph (or line) break."""
+	pos, n = 0, len(text)
+	while pos < n:
+		end = pos + size
+		if end < n:
+			cut = text.rfind("\n\n", pos + size // 2, end)
+			if cut == -1:
+				cut = text.rfind("\n", pos + size // 2, end)
+			end = cut + 1 if cut != -1 else end
+		yield text[pos:end]
+		pos = end
+
+
+def _boundary_token(text, offsets, start, end):
+	"""
+	Token index to end a window [start, end) at: the last paragraph break, sentence
+	end or whitespace in the back half of the window, searched in that order.
+	The cut is placed before the whitespace: GPT-2 tokens carry their leading
+	space, so the token holding it starts the next chunk.
+	"""
+	lo = offsets[start + (end - start) // 2][0]
+	hi = offsets[end - 1][1]
+	cut = text.rfind("\n\n", lo, hi)
+	if cut == -1:
+		last = None
+		for m in _SENTENCE_END.finditer(text, lo, hi):
+			last = m
+		if last is not None:
+			cut = last.end()
+		else:
+			cut = max(text.rfind(" ", lo, hi), text.rfind("\n", lo, hi))
+	if cut == -1:
+		return end
+	# first token starting at or after the cut
+	i = _bisect_token(offsets, cut, start + 1, end)
+	return i if i > start else end
+
+
+def _bisect_token(offsets, char_pos, lo, hi):
+	while lo < hi:
+		mid = (lo + hi) // 2
+		if offsets[mid][0] < char_pos:
+			lo = mid + 1
+		else:
+			hi = mid
+	return lo
+
+
+def transcribe_media(file_path, on_progress=None):
+	"""
+	Transcript (text, timed segments, per-chunk text) of an audio or video file;
+	long recordings are split at pauses and transcribed in parallel. For video
+	only the audio track is decoded, piped from ffmpeg, with no temp file.
+	"""
+	return transcribe_file(file_path, on_progress)
+
+def extract_text_from_audio(file_path, on_progress=None):
 	"""Extracts and transcribes audio to text."""
-	if translate_audio_with_azure_whisper is None:
-		raise RuntimeError("Azure Whisper service not available")
 	try:
-		return translate_audio_with_azure_whisper(file_path)
+		return transcribe_media(file_path, on_progress).text
 	finally:
 		if os.path.exists(file_path):
 			os.remove(file_path)
 
-def extract_text_from_video(file_path):
+def extract_text_from_video(file_path, on_progress=None):
 	"""Extracts audio from video and transcribes it to text."""
-	if mp is None:
-		raise RuntimeError("moviepy not available")
-	temp_audio_path = "temp_audio.wav"
-	video = mp.VideoFileClip(file_path)
-	video.audio.write_audiofile(temp_audio_path)
-	try:
-		return translate_audio_with_azure_whisper(temp_audio_path)
-	finally:
-		if os.path.exists(temp_audio_path):
-			os.remove(temp_audio_path)
+	return transcribe_media(file_path, on_progress).text
 
 
 def extract_text_by_pages(file_path):
-	"""Extracts page-wise text (PDF), or chunked token-based segments (DOCX/TXT)."""
-	if file_path.endswith('.pdf'):
-		if PyPDF2 is None:
-			raise RuntimeError("PyPDF2 not available")
-		with open(file_path, 'rb') as file:
-			reader = PyPDF2.PdfReader(file)
-			return [page.extract_text() or "" for page in reader.pages]
-
-	elif file_path.endswith('.docx'):
-		doc = docx.Document(file_path)
-		# Chunk every N paragraphs as a 'page'
-		paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-		chunk_size = 5
-		return ['\n'.join(paragraphs[i:i+chunk_size]) for i in range(0, len(paragraphs), chunk_size)]
-
-	elif file_path.endswith('.txt'):
-		with open(file_path, 'r', encoding='utf-8') as f:
-			text = f.read()
-		tokens = text.split()
-		chunk_size = 300
-		return [' '.join(tokens[i:i+chunk_size]) for i in range(0, len(tokens), chunk_size)]
+	"""Extracts page-wise text (PDF), or paragraphs packed into ~PAGE_TARGET_TOKENS pages (DOCX/TXT)."""
+	return list(iter_pages(file_path))
 
-	else:
-		raise ValueError("Unsupported document format")
\ No newline at end of file
+
+def iter_pages(file_path):
+	"""
+	Yields the same pages as extract_text_by_pages one at a time, so callers can
+	store or enqueue each page without holding the whole document in memory.
+	"""
+	for page in iter_document(file_path):
+		yield page.text
@@ -0,0 +1,105 @@
+import json
+import logging
+from flask import Response, stream_with_context
+
+log = logging.getLogger(__name__)
+
+
+def wants_stream(req) -> bool:
+    """`?stream=true`, a truthy "stream" JSON/form field, or `Accept: text/event-stream`."""
+    flag = req.args.get("stream")
+    if flag is None and req.is_json:
+        flag = (req.get_json(silent=True) or {}).get("stream")
+    if flag is None and req.form:
+        flag = req.form.get("stream")
+    if flag is None:
+        return "text/event-stream" in (req.headers.get("Accept") or "")
+    return str(flag).lower() in ("1", "true", "yes")
+
+
+def sse_event(data, event: str = None) -> str:
+    out = f"event: {event}\n" if event else ""
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    for line in payload.splitlines() or [""]:
+        out += f"data: {line}\n"
+    return out + "\n"
+
+
+def sse_response(events) -> Response:
+    """
+    Relay an iterable of (event, data) pairs as server-sent events. Errors
+    raised mid-stream are sent as a final `error` event, since the 200 status
+    line has already gone out.
+    """
+    def generate():
+        # first bytes go out immediately so proxies/clients see the stream open
+        yield ": stream open\n\n"
+        try:
+            for event, data in events:
+                yield sse_event(data, event)
+        except Exception as e:
+            log.exception("SSE stream failed")
+            yield sse_event({"error": str(e) or "Stream failed"}, "error")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class JsonArrayItems:
+    """
+    Incremental scanner for a streamed JSON object: feed() it text deltas and it
+    returns each complete object inside the top-level arrays named in `keys`
+    (e.g. "steps", "topics") as soon as its closing brace arrives.
+    """
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.buf = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_top_string = None
+        self._array_key = None
+        self._item_start = None
+
+    def feed(self, delta: str):
+        """List of (key, item) completed by this delta."""
+        self.buf += delta
+        out = []
+        buf = self.buf
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._stack == ["{"]:
+                        self._last_top_string = buf[self._string_start + 1:i]
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if ch == "[" and self._stack == ["{"]:
+                    self._array_key = self._last_top_string
+                elif ch == "{" and self._stack == ["{", "["] and self._array_key in self.keys:
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._stack == ["{", "["] and self._item_start is not None:
+                    try:
+                        out.append((self._array_key, json.loads(buf[self._item_start:i + 1])))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+        self._pos = len(buf)
+        return out
@@ -0,0 +1,164 @@
+import os
+import re
+import logging
+from functools import lru_cache
+from typing import NamedTuple
+
+log = logging.getLogger(__name__)
+
+# Context window per deployment/model family (prompt + completion tokens)
+CONTEXT_WINDOWS = {
+    "gpt-4.1": 1047576,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-35-turbo-16k": 16384,
+    "gpt-35-turbo": 16384,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "128000"))
+# Tokens reserved for the system message, instructions and chat framing
+PROMPT_OVERHEAD_TOKENS = int(os.getenv("LLM_PROMPT_OVERHEAD_TOKENS", "300"))
+# Cost caps on input text: per-page tools and whole-document tools
+PAGE_INPUT_TOKENS = int(os.getenv("LLM_PAGE_INPUT_TOKENS", "3000"))
+DOC_INPUT_TOKENS = int(os.getenv("LLM_DOC_INPUT_TOKENS", "16000"))
+
+# fit_text encodes this many characters per budget token first, doubling until the budget is exceeded
+_FIT_CHARS_PER_TOKEN = 6
+
+# Sentence end (or paragraph break) followed by whitespace
+_SENTENCE_END = re.compile(r"(?:[.!?]['\")\]]?|\n)\s+")
+
+
+class _Encoder(NamedTuple):
+    name: str
+    encode: object
+    decode: object
+
+
+def _family(deployment: str = None) -> str:
+    """Longest known model prefix in the deployment name, '' if none."""
+    name = (deployment or os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4.1")).lower()
+    matches = [k for k in CONTEXT_WINDOWS if name.startswith(k)]
+    return max(matches, key=len) if matches else ""
+
+
+def get_encoder(deployment: str = None):
+    """
+    Tokenizer for a deployment, loaded once per process: tiktoken when installed,
+    else the GPT-2 tokenizer from transformers (a slight overestimate for GPT-4
+    models), else None (callers fall back to ~4 chars per token).
+    """
+    return _load_encoder("o200k_base" if _family(deployment) in ("gpt-4.1", "gpt-4o") else "cl100k_base")
+
+
+@lru_cache(maxsize=None)
+def _load_encoder(encoding: str):
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding(encoding)
+        return _Encoder(enc.name, enc.encode, enc.decode)
+    except Exception:
+        pass
+    try:
+        from transformers import GPT2TokenizerFast
+        tok = GPT2TokenizerFast.from_pretrained("gpt2")
+        tok.model_max_length = 10 ** 9  # we only count; silence the 1024-token warning
+        if not tok.encode("hello world"):
+            raise RuntimeError("gpt2 tokenizer has an empty vocabulary (offline?)")
+        return _Encoder("gpt2", lambda t: tok.encode(t, add_special_tokens=False), tok.decode)
+    except Exception as e:
+        log.warning(f"[TokenBudget] no tokenizer available, estimating by characters: {e}")
+        return None
+
+
+def count_tokens(text: str, deployment: str = None) -> int:
+    if not text:
+        return 0
+    enc = get_encoder(deployment)
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text))
+
+
+def context_window(deployment: str = None) -> int:
+    return CONTEXT_WINDOWS.get(_family(deployment), DEFAULT_CONTEXT_WINDOW)
+
+
+def input_budget(deployment: str = None, max_tokens: int = 0,
+                 overhead: int = PROMPT_OVERHEAD_TOKENS, cap: int = None) -> int:
+    """Tokens left for input text: context_window - max_tokens - overhead, optionally capped."""
+    budget = context_window(deployment) - (max_tokens or 0) - overhead
+    if cap is not None:
+        budget = min(budget, cap)
+    return max(0, budget)
+
+
+class Fitted(NamedTuple):
+    text: str
+    tokens: int
+    original_tokens: int
+
+    @property
+    def truncated(self) -> bool:
+        return self.tokens < self.original_tokens
+
+    @property
+    def truncated_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+def _cut_at_sentence(text: str) -> str:
+    """Trim a hard token cut back to the last sentence (or word) boundary, if one is near the end."""
+    last = None
+    for m in _SENTENCE_END.finditer(text):
+        last = m
+    if last and last.start() >= len(text) * 0.8:
+        return text[:last.end()].rstrip()
+    ws = text.rfind(" ")
+    return text[:ws] if ws >= len(text) * 0.9 else text
+
+
+def fit_text(text: str, budget: int, deployment: str = None) -> Fitted:
+    """
+    Longest prefix of `text` within `budget` tokens, cut at a sentence boundary.
+    Only a window of the text a little past the budget is encoded, so a long
+    document costs what its kept part does; when it is cut, original_tokens
+    is extrapolated from that window.
+    """
+    text = text or ""
+    enc = get_encoder(deployment)
+    if enc is None:
+        original = len(text) // 4 + 1
+        if original <= budget:
+            return Fitted(text, original, original)
+        cut = _cut_at_sentence(text[:budget * 4])
+        return Fitted(cut, len(cut) // 4 + 1, original)
+
+    window = max(1, budget) * _FIT_CHARS_PER_TOKEN
+    while True:
+        head = text[:window]
+        ids = enc.encode(head)
+        if len(ids) > budget:
+            break
+        if len(head) == len(text):
+            return Fitted(text, len(ids), len(ids))
+        window *= 2
+    original = len(ids) if len(head) == len(text) else len(ids) * len(text) // len(head)
+    cut = _cut_at_sentence(enc.decode(ids[:budget]))
+    return Fitted(cut, len(enc.encode(cut)), original)
+
+
+def fit_prompt_text(text: str, deployment: str = None, max_tokens: int = 0,
+                    cap: int = None, overhead: int = PROMPT_OVERHEAD_TOKENS, label: str = "") -> str:
+    """
+    `text` trimmed to what fits next to the prompt and the completion
+    (see input_budget); logs how much was dropped when it had to cut.
+    """
+    fitted = fit_text(text, input_budget(deployment, max_tokens, overhead, cap), deployment)
+    if fitted.truncated:
+        log.info(
+            f"[TokenBudget] {label or 'prompt'}: kept {fitted.tokens}/{fitted.original_tokens} tokens "
+            f"(truncated {fitted.truncated_tokens})"
+        )
+    return fitted.text
@@ -0,0 +1,84 @@
+"""
+Upload/download throughput of the vault blob paths: a new client per call with
+SDK defaults (how upload.py and the web scraper used to work) against the
+pooled process-wide client from app.services.blob_storage with parallel block
+transfer. Runs against scripts/fake_blob_server.py unless a connection string
+(Azurite, or a real account) is given.
+
+    cd backend && python scripts/benchmark_blob_transfer.py [--files 8] [--mb 64] [--concurrency 4]
+    cd backend && python scripts/benchmark_blob_transfer.py --connection-string "$AZURITE"
+    # the stand-in can model a remote account: per-request latency and per-connection bandwidth
+    cd backend && python scripts/benchmark_blob_transfer.py --latency-ms 30 --connection-mbps 60
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+CONTAINER = "benchmark"
+
+
+def baseline(conn, name, data, path):
+    from azure.storage.blob import BlobServiceClient
+    up = BlobServiceClient.from_connection_string(conn).get_blob_client(CONTAINER, name)
+    up.upload_blob(io.BytesIO(data), overwrite=True)
+    down = BlobServiceClient.from_connection_string(conn).get_blob_client(CONTAINER, name)
+    with open(path, "wb") as f:
+        f.write(down.download_blob().readall())
+
+
+def pooled(conn, name, data, path, concurrency):
+    from app.services.blob_storage import get_blob_service_client, upload_stream, download_to_file
+    client = get_blob_service_client(conn).get_blob_client(CONTAINER, name)
+    upload_stream(client, io.BytesIO(data), max_concurrency=concurrency)
+    download_to_file(get_blob_service_client(conn).get_blob_client(CONTAINER, name), path, max_concurrency=concurrency)
+
+
+def run(label, fn, files, data):
+    path = os.path.join(tempfile.gettempdir(), f"blob-bench-{os.getpid()}")
+    t0 = time.perf_counter()
+    for i in range(files):
+        fn(f"bench/{label}-{i}.bin", data, path)
+    elapsed = time.perf_counter() - t0
+    os.remove(path)
+    mb = 2 * files * len(data) / 1e6  # up + down
+    print(f"{label:<10} {files} x {len(data) / 1e6:.0f} MB up+down  {elapsed:7.2f}s  {mb / elapsed:8.1f} MB/s")
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=8)
+    ap.add_argument("--mb", type=float, default=64)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--connection-string", default=None)
+    ap.add_argument("--latency-ms", type=float, default=30, help="per-request delay added by the stand-in server")
+    ap.add_argument("--connection-mbps", type=float, default=60, help="MB/s one request can move on the stand-in server (0: unlimited)")
+    args = ap.parse_args()
+
+    conn = args.connection_string
+    if conn is None:
+        import fake_blob_server
+        fake_blob_server.Handler.latency = args.latency_ms / 1000
+        fake_blob_server.Handler.bandwidth = args.connection_mbps * 1e6
+        server = fake_blob_server.serve()
+        conn = fake_blob_server.connection_string(server.server_port)
+    from azure.storage.blob import BlobServiceClient
+    try:
+        BlobServiceClient.from_connection_string(conn).create_container(CONTAINER)
+    except Exception:
+        pass  # already exists
+
+    data = os.urandom(int(args.mb * 1024 * 1024))
+    base = run("baseline", lambda n, d, p: baseline(conn, n, d, p), args.files, data)
+    new = run("pooled", lambda n, d, p: pooled(conn, n, d, p, args.concurrency), args.files, data)
+    print(f"speedup x{base / new:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Times app.utils.file_utils._chunk_by_token on synthetic documents from 10 KB to
+50 MB and prints throughput per size; a flat MB/s column means linear scaling.
+
+    cd backend && python scripts/benchmark_chunker.py [--max-mb 50] [--overlap 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils import file_utils  # noqa: E402
+
+WORDS = ("the of and to in is was for on that with as by at from it an be this which "
+         "photosynthesis equation chapter theorem history river empire molecule energy "
+         "student analysis government element velocity population").split()
+
+
+def make_text(size_bytes, seed=7):
+    rnd = random.Random(seed)
+    parts, total = [], 0
+    while total < size_bytes:
+        sentences = []
+        for _ in range(rnd.randint(2, 8)):
+            words = [rnd.choice(WORDS) for _ in range(rnd.randint(6, 24))]
+            sentences.append(" ".join(words).capitalize() + rnd.choice(".!?"))
+        para = " ".join(sentences)
+        parts.append(para)
+        total += len(para) + 2
+    return "\n\n".join(parts)[:size_bytes]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-mb", type=float, default=50)
+    ap.add_argument("--overlap", type=int, default=file_utils.TOKEN_OVERLAP)
+    ap.add_argument("--limit", type=int, default=file_utils.TOKEN_LIMIT)
+    args = ap.parse_args()
+
+    sizes = [10_000, 100_000, 1_000_000, 5_000_000, 10_000_000, 25_000_000, 50_000_000]
+    sizes = [s for s in sizes if s <= args.max_mb * 1_000_000]
+
+    print(f"{'size':>10} {'chunks':>8} {'seconds':>9} {'MB/s':>8}")
+    for size in sizes:
+        text = make_text(size)
+        t0 = time.perf_counter()
+        chunks = file_utils._chunk_by_token(text, args.limit, args.overlap)
+        dt = time.perf_counter() - t0
+        print(f"{size / 1e6:>8.2f}MB {len(chunks):>8} {dt:>9.2f} {size / 1e6 / dt:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
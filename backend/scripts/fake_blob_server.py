@@ -0,0 +1,259 @@
+"""
+In-memory, Azurite-style stand-in for the Azure Blob REST API: just enough of
+it (containers, Put Blob, Put Block, Put Block List, ranged Get Blob, Get Blob
+Properties, Delete Blob, List Blobs) for the azure-storage-blob SDK. Auth is
+not checked. Point the app at it with:
+
+    cd backend && python scripts/fake_blob_server.py --port 10000
+    AZURE_STORAGE_CONNECTION_STRING="$(python scripts/fake_blob_server.py --print-connection-string --port 10000)"
+
+    # end-to-end check of the single-pass upload (hashing, dedup, no leftovers)
+    cd backend && python scripts/fake_blob_server.py --selftest
+"""
+import argparse
+import base64
+import email.utils
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+ACCOUNT = "devstoreaccount1"
+# Azurite's well-known development key
+ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+
+
+def connection_string(port):
+    return (f"DefaultEndpointsProtocol=http;AccountName={ACCOUNT};AccountKey={ACCOUNT_KEY};"
+            f"BlobEndpoint=http://127.0.0.1:{port}/{ACCOUNT};")
+
+
+class Store:
+    lock = threading.Lock()
+    containers = {}   # name -> {blob name: (bytes, content_type, etag, last_modified)}
+    blocks = {}       # (container, blob) -> {block id: bytes}, uncommitted
+    stats = {"put_block": 0, "put_block_list": 0, "put_blob": 0, "get_blob": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0    # seconds added to every request, to mimic a remote account
+    bandwidth = 0.0  # bytes/s a single request can move (0: unlimited), like a real per-connection cap
+
+    def log_message(self, *args):
+        pass
+
+    def _target(self):
+        url = urlparse(self.path)
+        parts = url.path.lstrip("/").split("/", 2)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        container = parts[1] if len(parts) > 1 else ""
+        blob = unquote(parts[2]) if len(parts) > 2 else ""
+        return container, blob, query
+
+    def _reply(self, code, body=b"", headers=None):
+        self.send_response(code)
+        self.send_header("x-ms-request-id", "00000000-0000-0000-0000-000000000000")
+        self.send_header("x-ms-version", "2021-08-06")
+        self.send_header("Date", email.utils.formatdate(usegmt=True))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, code, error_code):
+        body = f'<?xml version="1.0" encoding="utf-8"?><Error><Code>{error_code}</Code><Message>{error_code}</Message></Error>'.encode()
+        self._reply(code, body, {"x-ms-error-code": error_code, "Content-Type": "application/xml"})
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _commit(self, container, blob, data):
+        etag = '"0x%s"' % hashlib.md5(data).hexdigest()[:16].upper()
+        modified = email.utils.formatdate(usegmt=True)
+        Store.containers[container][blob] = (data, self.headers.get("x-ms-blob-content-type", "application/octet-stream"), etag, modified)
+        Store.blocks.pop((container, blob), None)
+        return {"ETag": etag, "Last-Modified": modified, "x-ms-request-server-encrypted": "false"}
+
+    def do_PUT(self):
+        container, blob, query = self._target()
+        body = self._body()
+        self._delay(len(body))
+        with Store.lock:
+            if not blob and query.get("restype") == "container":
+                if container in Store.containers:
+                    return self._error(409, "ContainerAlreadyExists")
+                Store.containers[container] = {}
+                return self._reply(201, headers={"ETag": '"0x1"', "Last-Modified": email.utils.formatdate(usegmt=True)})
+            if container not in Store.containers:
+                return self._error(404, "ContainerNotFound")
+            comp = query.get("comp")
+            Store.stats["bytes_in"] += len(body)
+            if comp == "block":
+                Store.stats["put_block"] += 1
+                Store.blocks.setdefault((container, blob), {})[query["blockid"]] = body
+                return self._reply(201, headers={"x-ms-request-server-encrypted": "false"})
+            if comp == "blocklist":
+                Store.stats["put_block_list"] += 1
+                staged = Store.blocks.get((container, blob), {})
+                ids = re.findall(r"<(?:Latest|Uncommitted|Committed)>([^<]*)<", body.decode())
+                if any(i not in staged for i in ids):
+                    return self._error(400, "InvalidBlockList")
+                return self._reply(201, headers=self._commit(container, blob, b"".join(staged[i] for i in ids)))
+            Store.stats["put_blob"] += 1
+            return self._reply(201, headers=self._commit(container, blob, body))
+
+    def _range(self, size):
+        spec = self.headers.get("x-ms-range") or self.headers.get("Range")
+        if not spec:
+            return None
+        start, _, end = spec.split("=", 1)[1].partition("-")
+        start = int(start)
+        end = min(int(end) if end else size - 1, size - 1)
+        return start, end
+
+    def _delay(self, nbytes):
+        time.sleep(self.latency + (nbytes / self.bandwidth if self.bandwidth else 0))
+
+    def do_GET(self):
+        container, blob, query = self._target()
+        with Store.lock:
+            if container not in Store.containers:
+                return self._error(404, "ContainerNotFound")
+            if not blob and query.get("comp") == "list":
+                prefix = query.get("prefix", "")
+                items = "".join(
+                    f"<Blob><Name>{escape(name)}</Name><Properties><Content-Length>{len(v[0])}</Content-Length>"
+                    f"<Content-Type>{escape(v[1])}</Content-Type><Etag>{v[2]}</Etag><Last-Modified>{v[3]}</Last-Modified>"
+                    f"<BlobType>BlockBlob</BlobType></Properties></Blob>"
+                    for name, v in sorted(Store.containers[container].items()) if name.startswith(prefix)
+                )
+                body = (f'<?xml version="1.0" encoding="utf-8"?><EnumerationResults ContainerName="{container}">'
+                        f"<Prefix>{escape(prefix)}</Prefix><Blobs>{items}</Blobs><NextMarker /></EnumerationResults>").encode()
+                return self._reply(200, body, {"Content-Type": "application/xml"})
+            entry = Store.containers[container].get(blob)
+            if entry is None:
+                return self._error(404, "BlobNotFound")
+            data, content_type, etag, modified = entry
+            Store.stats["get_blob"] += 1
+        headers = {"Content-Type": content_type, "ETag": etag, "Last-Modified": modified,
+                   "x-ms-blob-type": "BlockBlob", "Accept-Ranges": "bytes"}
+        rng = self._range(len(data))
+        if rng is None:
+            Store.stats["bytes_out"] += len(data)
+            self._delay(len(data))
+            return self._reply(200, data, headers)
+        start, end = rng
+        if start >= len(data) and len(data):
+            return self._error(416, "InvalidRange")
+        chunk = data[start:end + 1]
+        self._delay(len(chunk))
+        Store.stats["bytes_out"] += len(chunk)
+        headers["Content-Range"] = f"bytes {start}-{start + len(chunk) - 1 if chunk else 0}/{len(data)}"
+        return self._reply(206, chunk, headers)
+
+    def do_HEAD(self):
+        container, blob, _ = self._target()
+        with Store.lock:
+            entry = Store.containers.get(container, {}).get(blob)
+        if entry is None:
+            return self._error(404, "BlobNotFound")
+        data, content_type, etag, modified = entry
+        self.send_response(200)
+        for k, v in {"Content-Type": content_type, "ETag": etag, "Last-Modified": modified,
+                     "x-ms-blob-type": "BlockBlob", "Content-Length": str(len(data))}.items():
+            self.send_header(k, v)
+        self.end_headers()
+
+    def do_DELETE(self):
+        container, blob, _ = self._target()
+        with Store.lock:
+            if Store.containers.get(container, {}).pop(blob, None) is None:
+                return self._error(404, "BlobNotFound")
+        self._reply(202)
+
+
+def serve(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _Reader:
+    """A large upload stream that counts how often it is read."""
+    def __init__(self, data):
+        self.data, self.pos, self.bytes_read = data, 0, 0
+
+    def read(self, n=-1):
+        n = len(self.data) - self.pos if n < 0 else n
+        out = self.data[self.pos:self.pos + n]
+        self.pos += len(out)
+        self.bytes_read += len(out)
+        return out
+
+
+def selftest():
+    from azure.storage.blob import BlobServiceClient, ContentSettings
+    from app.services.blob_storage import upload_stream
+
+    server = serve()
+    bs = BlobServiceClient.from_connection_string(connection_string(server.server_port))
+    bs.create_container("scoolish")
+    data = os.urandom(50 * 1024 * 1024 + 123)
+    digest = hashlib.sha256(data).hexdigest()
+
+    reader = _Reader(data)
+    t0 = time.perf_counter()
+    res = upload_stream(bs.get_blob_client("scoolish", "u/uploads/big.bin"), reader,
+                        ContentSettings(content_type="video/mp4"), keep=lambda h: True)
+    elapsed = time.perf_counter() - t0
+    assert res.committed and res.sha256 == digest and res.size == len(data)
+    assert reader.bytes_read == len(data), "stream must be read exactly once"
+    got = bs.get_blob_client("scoolish", "u/uploads/big.bin").download_blob().readall()
+    assert got == data
+
+    # duplicate content: hashed and staged, but never committed
+    dup = upload_stream(bs.get_blob_client("scoolish", "u/uploads/dup.bin"), _Reader(data), keep=lambda h: h != digest)
+    assert not dup.committed and dup.sha256 == digest
+    assert "u/uploads/dup.bin" not in Store.containers["scoolish"]
+
+    small = upload_stream(bs.get_blob_client("scoolish", "u/uploads/small.txt"), _Reader(b"hello"), keep=lambda h: True)
+    assert small.committed and Store.containers["scoolish"]["u/uploads/small.txt"][0] == b"hello"
+    server.shutdown()
+    print(f"50 MB uploaded in {elapsed:.2f}s, read once, {Store.stats['put_block']} blocks staged; "
+          f"duplicate left no blob")
+    print("selftest ok")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=10000)
+    ap.add_argument("--container", default="scoolish")
+    ap.add_argument("--print-connection-string", action="store_true")
+    ap.add_argument("--selftest", action="store_true")
+    args = ap.parse_args()
+    if args.print_connection_string:
+        return print(connection_string(args.port))
+    if args.selftest:
+        return selftest()
+    Store.containers[args.container] = {}
+    serve(args.port)
+    print(f"fake blob service on http://127.0.0.1:{args.port}/{ACCOUNT} (container {args.container!r})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Local stand-in for the Azure Whisper translations endpoint, for exercising
+app.services.transcription_service without network access or API keys.
+
+Every request returns verbose_json with one segment covering the uploaded clip
+(duration read from WAV headers), whose text names the uploaded chunk file.
+Latency and rate limiting can be injected.
+
+    cd backend && python scripts/fake_whisper_server.py --port 8765 [--latency 0.5] [--fail-every 3]
+    WHISPER_ENDPOINT=http://127.0.0.1:8765/ TRANSCRIBE_CHUNK_FORMAT=wav ...
+
+    # end-to-end check: synthetic speech-like audio -> chunked transcription
+    cd backend && python scripts/fake_whisper_server.py --selftest
+"""
+import argparse
+import email
+import io
+import json
+import os
+import sys
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class State:
+    latency = 0.0
+    fail_every = 0
+    requests = 0
+    in_flight = 0
+    peak_in_flight = 0
+    lock = threading.Lock()
+
+
+def _parse_upload(headers, body):
+    msg = email.message_from_bytes(
+        b"Content-Type: " + headers["Content-Type"].encode() + b"\r\n\r\n" + body
+    )
+    fields = {}
+    for part in msg.get_payload():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = (part.get_filename(), part.get_payload(decode=True))
+    return fields
+
+
+def _duration(data):
+    try:
+        with wave.open(io.BytesIO(data)) as w:
+            return w.getnframes() / float(w.getframerate())
+    except Exception:
+        return 0.0
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with State.lock:
+            State.requests += 1
+            n = State.requests
+            State.in_flight += 1
+            State.peak_in_flight = max(State.peak_in_flight, State.in_flight)
+        try:
+            if State.fail_every and n % State.fail_every == 0:
+                return self._send(429, {"error": "rate limited"}, {"Retry-After": "0.1"})
+            time.sleep(State.latency)
+            fields = _parse_upload(self.headers, body)
+            filename, data = fields["file"]
+            duration = _duration(data)
+            text = f"[{filename}]"
+            self._send(200, {
+                "text": text,
+                "duration": duration,
+                "segments": [{"id": 0, "start": 0.0, "end": round(duration, 2), "text": " " + text}],
+            })
+        finally:
+            with State.lock:
+                State.in_flight -= 1
+
+
+def serve(port):
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def selftest(args):
+    from pydub.generators import Sine
+    from pydub import AudioSegment
+
+    server = serve(0)
+    os.environ["WHISPER_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}/"
+    os.environ["TRANSCRIBE_CHUNK_FORMAT"] = "wav"
+    os.environ["TRANSCRIBE_CHUNK_SECONDS"] = "60"
+    from app.services import transcription_service as ts
+
+    # 5 min of 7 s "sentences" separated by 1 s pauses
+    tone = Sine(440).to_audio_segment(duration=7000).apply_gain(-6)
+    pause = AudioSegment.silent(duration=1000)
+    audio = AudioSegment.empty()
+    while len(audio) < 300_000:
+        audio += tone + pause
+    path = os.path.join("/tmp", f"selftest-{os.getpid()}.wav")
+    audio.set_channels(1).set_frame_rate(ts.SAMPLE_RATE).export(path, format="wav")
+
+    seen = []
+    try:
+        t0 = time.perf_counter()
+        result = ts.transcribe_file(path, on_progress=lambda d, t: seen.append((d, t)))
+        elapsed = time.perf_counter() - t0
+    finally:
+        os.remove(path)
+        server.shutdown()
+
+    spans = ts.plan_chunks(audio.set_channels(1).set_frame_rate(ts.SAMPLE_RATE))
+    assert len(result.chunks) == len(spans) > 1, result.chunks
+    assert all(b - a <= 60_000 for a, b in spans)
+    assert [c for c in result.chunks] == [f"[chunk{i:04d}.wav]" for i in range(len(spans))]
+    starts = [s["start"] for s in result.segments]
+    assert starts == sorted(starts) and starts[0] == 0.0
+    assert abs(result.segments[-1]["end"] - len(audio) / 1000) < 0.05
+    # every cut lands inside a pause, not mid-"sentence"
+    assert all((a % 8000) >= 7000 for a, _ in spans[1:]), spans
+    assert seen[-1] == (len(spans), len(spans))
+    print(f"{len(spans)} chunks, {State.requests} requests ({State.requests - len(spans)} retried 429s), "
+          f"peak concurrency {State.peak_in_flight}, {elapsed:.2f}s")
+    print("selftest ok")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    ap.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with 429")
+    ap.add_argument("--selftest", action="store_true")
+    args = ap.parse_args()
+    State.latency = args.latency
+    State.fail_every = args.fail_every
+
+    if args.selftest:
+        State.latency = args.latency or 0.3
+        State.fail_every = args.fail_every or 3
+        return selftest(args)
+
+    server = serve(args.port)
+    print(f"fake whisper on http://127.0.0.1:{args.port}/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Import-time report for the API and Celery entry points.
+
+Runs `python -X importtime -c "import <module>"` for each module listed in
+scripts/startup_budget.json, prints the slowest top-level imports, and exits
+non-zero if a module blows its time budget or pulls in something it must load
+lazily (transformers, moviepy, the Azure SDK, ...).
+
+    cd backend && python scripts/startup_report.py [--top 15] [--runs 3]
+
+Needs the same environment the app starts with (.env is loaded by app.main).
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+BUDGET_FILE = os.path.join(HERE, "startup_budget.json")
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def import_times(module):
+    """{module: (self_us, cumulative_us, depth)} for one cold import of `module`."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"import {module} failed:\n{tail}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            depth = (len(m.group(3)) - 1) // 2
+            times[m.group(4)] = (int(m.group(1)), int(m.group(2)), depth)
+    return times
+
+
+def report(module, spec, top, runs):
+    # best of N: the minimum is the least noisy estimate of the real cost
+    samples = [import_times(module) for _ in range(runs)]
+    times = min(samples, key=lambda t: t[module][1])
+    total_ms = times[module][1] / 1000
+
+    print(f"\n== {module}: {total_ms:.0f} ms (budget {spec['max_ms']} ms)")
+    roots = [(name, cum) for name, (_, cum, _) in times.items() if "." not in name and name != module]
+    for name, cum in sorted(roots, key=lambda r: -r[1])[:top]:
+        print(f"  {cum / 1000:>8.1f} ms  {name}")
+
+    problems = []
+    if total_ms > spec["max_ms"]:
+        problems.append(f"{module} took {total_ms:.0f} ms, over its {spec['max_ms']} ms budget")
+    for name in spec.get("forbidden", []):
+        if name in times:
+            problems.append(f"{module} imports {name} at startup ({times[name][1] / 1000:.0f} ms); load it lazily")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--budget", default=BUDGET_FILE)
+    args = ap.parse_args()
+
+    with open(args.budget) as f:
+        budget = json.load(f)
+
+    problems = []
+    for module, spec in budget.items():
+        problems += report(module, spec, args.top, args.runs)
+
+    if problems:
+        print("\nFAILED")
+        for p in problems:
+            print(f"  - {p}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# app/ imports as a top-level package from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules such as openai_key_manager read their config at import time
+os.environ.setdefault("AZURE_OPENAI_API_KEYS", "key-a,key-b")
+os.environ.setdefault("AZURE_OPENAI_API_BASES", "http://127.0.0.1:9/a,http://127.0.0.1:9/b")
+os.environ.setdefault("OPENAI_ROTATION_MODE", "local")
+
+# No network in tests: tokenizers that would be downloaded fall back to estimates at once
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
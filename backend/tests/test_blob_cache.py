@@ -0,0 +1,108 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+from app.services import blob_cache
+
+
+class FakeBlobs:
+    """Stands in for blob_storage.download_to_file; blob_client is the blob's bytes."""
+    def __init__(self, delay=0.0):
+        self.downloads = 0
+        self.delay = delay
+
+    def __call__(self, data, path):
+        self.downloads += 1
+        time.sleep(self.delay)
+        with open(path, "wb") as f:
+            f.write(data)
+        return len(data)
+
+
+@pytest.fixture
+def blobs(monkeypatch, tmp_path):
+    fake = FakeBlobs()
+    monkeypatch.setattr(blob_cache, "download_to_file", fake)
+    monkeypatch.setattr(blob_cache, "BLOB_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(blob_cache, "BLOB_CACHE_MAX_BYTES", 1024)
+    return fake
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _cached():
+    return sorted(n for n in os.listdir(blob_cache.BLOB_CACHE_DIR) if len(n) == 64)
+
+
+def test_a_blob_is_downloaded_once_then_copied_from_the_cache(blobs, tmp_path):
+    data = b"lecture" * 10
+    for name in ("a", "b"):
+        assert blob_cache.fetch(data, _sha(data), str(tmp_path / name)) == str(tmp_path / name)
+        assert _read(tmp_path / name) == data
+    assert blobs.downloads == 1
+    assert _cached() == [_sha(data)]
+
+
+def test_callers_get_their_own_copy(blobs, tmp_path):
+    data = b"original"
+    dest = tmp_path / "mine"
+    blob_cache.fetch(data, _sha(data), str(dest))
+    entry = os.path.join(blob_cache.BLOB_CACHE_DIR, _sha(data))
+    dest.write_bytes(b"scribbled")
+    os.remove(dest)
+    assert _read(entry) == data
+    assert os.stat(entry).st_mode & 0o777 == 0o444
+
+
+def test_content_that_does_not_match_its_hash_is_not_cached(blobs, tmp_path):
+    with pytest.raises(ValueError):
+        blob_cache.fetch(b"tampered", _sha(b"expected"), str(tmp_path / "x"))
+    assert _cached() == []
+    assert not [n for n in os.listdir(blob_cache.BLOB_CACHE_DIR) if n.endswith(".part")]
+
+
+def test_unhashed_files_and_a_disabled_cache_bypass_it(blobs, tmp_path, monkeypatch):
+    blob_cache.fetch(b"legacy", None, str(tmp_path / "x"))
+    monkeypatch.setattr(blob_cache, "BLOB_CACHE_MAX_BYTES", 0)
+    blob_cache.fetch(b"data", _sha(b"data"), str(tmp_path / "y"))
+    assert blobs.downloads == 2
+    assert not os.path.exists(blob_cache.BLOB_CACHE_DIR)
+
+
+def test_concurrent_fetches_share_one_download(blobs, tmp_path):
+    blobs.delay = 0.1
+    data = b"popular"
+    threads = [threading.Thread(target=blob_cache.fetch, args=(data, _sha(data), str(tmp_path / f"d{i}")))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert blobs.downloads == 1
+    assert all(_read(tmp_path / f"d{i}") == data for i in range(4))
+
+
+def test_least_recently_used_entries_are_evicted(blobs, tmp_path):
+    old, used, new = b"o" * 400, b"u" * 400, b"n" * 400
+    for i, data in enumerate((old, used)):
+        blob_cache.fetch(data, _sha(data), str(tmp_path / "x"))
+        os.utime(os.path.join(blob_cache.BLOB_CACHE_DIR, _sha(data)), (1000 + i, 1000 + i))
+    blob_cache.fetch(used, _sha(used), str(tmp_path / "x"))  # a hit makes it recent
+    blob_cache.fetch(new, _sha(new), str(tmp_path / "x"))
+    assert _cached() == sorted([_sha(used), _sha(new)])
+
+    locks = [n for n in os.listdir(blob_cache.BLOB_CACHE_DIR) if n.endswith(".lock") and len(n) == 69]
+    assert sorted(n[:64] for n in locks) == sorted([_sha(used), _sha(new)])  # the evicted entry's lock is gone
+
+    blob_cache.evict(0)
+    assert _cached() == []
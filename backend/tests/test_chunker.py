@@ -0,0 +1,73 @@
+import re
+
+import pytest
+
+from app.utils import file_utils
+from app.utils.file_utils import _chunk_by_token, _paragraph_blocks
+
+
+class WordTokenizer:
+    """A fake fast tokenizer that splits like GPT-2: words carry one leading space, newlines stand alone."""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text, return_offsets_mapping=False, add_special_tokens=True):
+        self.calls.append(len(text))
+        return {"offset_mapping": [m.span() for m in re.finditer(r" ?\S+|\s+(?!\S)|\s+", text)]}
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    tok = WordTokenizer()
+    monkeypatch.setattr(file_utils, "get_tokenizer", lambda: tok)
+    return tok
+
+
+def _words(n, start=0):
+    return " ".join(f"w{i}" for i in range(start, start + n))
+
+
+def test_short_text_is_one_chunk(tokenizer):
+    assert _chunk_by_token("  just a few words \n", token_limit=10) == ["just a few words"]
+    assert _chunk_by_token("", token_limit=10) == []
+
+
+def test_chunks_fit_the_limit_and_keep_every_word(tokenizer):
+    text = _words(95)
+    chunks = _chunk_by_token(text, token_limit=10, overlap=0)
+    assert all(len(c.split()) <= 10 for c in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_cuts_prefer_paragraphs_then_sentences(tokenizer):
+    text = _words(7) + "\n\n" + _words(10, 7)
+    assert _chunk_by_token(text, token_limit=10)[0] == _words(7)
+
+    text = _words(6) + ". " + _words(10, 6)
+    assert _chunk_by_token(text, token_limit=10)[0] == _words(6) + "."
+
+    text = _words(2) + ". " + _words(10, 2)  # too early: cut at whitespace instead
+    assert _chunk_by_token(text, token_limit=10)[0] == _words(2) + ". " + _words(7, 2)
+
+
+def test_overlap_repeats_the_end_of_the_previous_chunk(tokenizer):
+    chunks = _chunk_by_token(_words(30), token_limit=10, overlap=3)
+    assert chunks[0].split()[-3:] == chunks[1].split()[:3]
+    assert chunks[-1].split()[-1] == "w29"
+
+
+def test_text_is_tokenized_once_per_block(tokenizer, monkeypatch):
+    monkeypatch.setattr(file_utils, "_TOKENIZE_BLOCK_CHARS", 200)
+    paragraphs = [_words(8, 8 * i) for i in range(20)]
+    text = "\n\n".join(paragraphs)
+    chunks = _chunk_by_token(text, token_limit=50)
+    assert sum(tokenizer.calls) == len(text)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_blocks_end_at_paragraph_breaks():
+    text = "\n\n".join(["x" * 30] * 10)
+    blocks = list(_paragraph_blocks(text, 100))
+    assert "".join(blocks) == text
+    assert all(b.endswith("\n") for b in blocks[:-1])
+    assert all(len(b) <= 100 for b in blocks)
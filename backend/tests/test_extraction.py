@@ -0,0 +1,119 @@
+import PyPDF2
+import pytest
+
+from app.utils import extraction
+from app.utils.extraction import Backend, RawPage, document_text, extract_pages, iter_document
+from app.utils.file_utils import iter_pages
+
+
+class ScriptedBackend(Backend):
+    """Yields the given raw pages, noting how many have been pulled."""
+    name = "scripted"
+    formats = ("fake",)
+
+    def __init__(self, pages=()):
+        self.pages = list(pages)
+        self.pulled = 0
+
+    def iter_pages(self, path):
+        for raw in self.pages:
+            self.pulled += 1
+            yield raw
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    backend = ScriptedBackend()
+    monkeypatch.setitem(extraction._REGISTRY, "fake", {backend.name: backend})
+    monkeypatch.setitem(extraction._DEFAULTS, "fake", backend.name)
+    return backend
+
+
+def test_page_offsets_index_the_joined_text(scripted):
+    scripted.pages = [RawPage("First page."), RawPage(""), RawPage("Third\npage.")]
+    pages = extract_pages("notes.fake")
+    assert [p.number for p in pages] == [1, 2, 3]
+    text = document_text(pages)
+    assert [text[p.start:p.end] for p in pages] == ["First page.", "", "Third\npage."]
+
+
+def test_pages_are_pulled_one_at_a_time(scripted):
+    scripted.pages = [RawPage(f"page {i}") for i in range(100)]
+    pages = iter_document("big.fake")
+    assert next(pages).text == "page 0"
+    assert scripted.pulled == 1
+    assert next(iter_pages("big.fake")) == "page 0"
+
+
+def test_headings_are_detected_unless_the_backend_gives_them(scripted):
+    scripted.pages = [RawPage("CHAPTER ONE\nSome body text here."), RawPage("INTRO\nbody", headings=[])]
+    first, second = extract_pages("doc.fake")
+    assert first.headings == ["CHAPTER ONE"]
+    assert second.headings == []
+
+
+class MissingBackend(ScriptedBackend):
+    name = "missing"
+
+    def available(self):
+        return False
+
+
+@pytest.fixture
+def registry(monkeypatch, scripted):
+    other = ScriptedBackend([RawPage("from other")])
+    other.name = "other"
+    backends = {scripted.name: scripted, other.name: other, "missing": MissingBackend()}
+    monkeypatch.setitem(extraction._REGISTRY, "fake", backends)
+    monkeypatch.delenv("FAKE_EXTRACT_BACKEND", raising=False)
+    return backends
+
+
+def test_backend_is_chosen_by_env_then_default(registry, monkeypatch):
+    assert extraction.get_backend("fake").name == "scripted"
+    monkeypatch.setenv("FAKE_EXTRACT_BACKEND", "other")
+    assert extraction.get_backend("fake").name == "other"
+    assert [p.text for p in iter_document("a.FAKE")] == ["from other"]
+    assert extraction.get_backend("fake", "scripted").name == "scripted"  # an explicit name wins
+
+
+@pytest.mark.parametrize("name", ["missing", "no-such-backend"])
+def test_unusable_backends_fall_back_to_the_default(registry, name):
+    assert extraction.get_backend("fake", name).name == "scripted"
+
+
+def test_unknown_formats_are_rejected():
+    assert extraction.supported("notes.PDF") and extraction.supported("a.docx") and extraction.supported("b.txt")
+    assert not extraction.supported("song.mp3")
+    with pytest.raises(ValueError):
+        extract_pages("song.mp3")
+
+
+def test_pdf_pages_come_from_pypdf2(tmp_path):
+    writer = PyPDF2.PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=200, height=200)
+    path = tmp_path / "blank.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    pages = extract_pages(str(path), backend="pypdf2")
+    assert [(p.number, p.text) for p in pages] == [(1, ""), (2, ""), (3, "")]
+
+
+@pytest.mark.parametrize("line, heading", [
+    ("Chapter 3 Photosynthesis", True),
+    ("2.1 Light reactions", True),
+    ("THE CALVIN CYCLE", True),
+    ("Energy And The Cell", True),
+    ("Plants make sugar from light.", False),
+    ("the light reactions take place in the thylakoid", False),
+    ("Table:", False),
+    ("42", False),
+])
+def test_heading_detection(line, heading):
+    assert bool(extraction.detect_headings(line)) is heading
+
+
+def test_heading_detection_is_capped():
+    text = "\n".join(f"SECTION {i}" for i in range(10))
+    assert extraction.detect_headings(text, limit=3) == ["SECTION 0", "SECTION 1", "SECTION 2"]
@@ -0,0 +1,275 @@
+import json
+import threading
+import time
+
+import pytest
+
+from app.services import llm_cache as lc
+from app.services.llm_cache import LLMCache, SingleFlight, _LRU, make_key, ttl_for
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """The handful of Redis commands the cache uses, backed by dicts."""
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.hashes = {}
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False, px=None):
+        self.calls += 1
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.ttls[key] = ex
+        return True
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def register_script(self, script):
+        assert script == lc._UNLOCK_LUA
+
+        def unlock(keys, args):
+            if self.data.get(keys[0]) == args[0]:
+                return self.delete(keys[0])
+            return 0
+        return unlock
+
+    def hincrby(self, name, field, amount):
+        node = self.hashes.setdefault(name, {})
+        node[field] = node.get(field, 0) + amount
+
+    def hgetall(self, name):
+        return {k: str(v) for k, v in self.hashes.get(name, {}).items()}
+
+
+class DownRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            self.calls += 1
+            raise ConnectionError("redis is down")
+        return fail
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(lc.time, "time", c)
+    return c
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+def _cache(redis=None):
+    cache = LLMCache(backend="redis" if redis is not None else "local")
+    cache._redis = redis
+    return cache
+
+
+def test_key_ignores_dict_order_but_not_sampling():
+    a = make_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.0, 100, {"x": 1, "y": 2})
+    b = make_key("gpt-4o", [{"content": "hi", "role": "user"}], 0.0, 100, {"y": 2, "x": 1})
+    assert a == b
+    assert a != make_key("gpt-4o", [{"role": "user", "content": "hi"}], 0.7, 100, {"x": 1, "y": 2})
+    assert a != make_key("gpt-4o-mini", [{"role": "user", "content": "hi"}], 0.0, 100, {"x": 1, "y": 2})
+
+
+def test_ttl_per_tool_with_env_override(monkeypatch):
+    assert ttl_for("math_visualizer") == 30 * 24 * 3600
+    assert ttl_for("web_scraper") == 6 * 3600
+    assert ttl_for("unknown_tool") == ttl_for() == lc.DEFAULT_TTL
+    monkeypatch.setenv("LLM_CACHE_TTL_SENTIMENT", "60")
+    assert ttl_for("sentiment") == 60
+
+
+def test_local_entries_expire_with_their_tool_ttl(clock, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_TTL_WEB_SCRAPER", "10")
+    cache = _cache()
+    cache.set("k1", {"text": "scraped"}, tool="web_scraper")
+    cache.set("k2", {"text": "summary"}, tool="summarizer")
+    clock.now += 11
+    assert cache.get("k1", tool="web_scraper") is None
+    assert cache.get("k2", tool="summarizer") == {"text": "summary"}
+    assert cache.stats()["process"] == {
+        "web_scraper": {"hits_local": 0, "hits_redis": 0, "misses": 1},
+        "summarizer": {"hits_local": 1, "hits_redis": 0, "misses": 0},
+    }
+
+
+def test_lru_evicts_the_least_recently_used_to_stay_under_its_bytes(clock):
+    lru = _LRU(max_bytes=30)
+    lru.set("a", "x" * 10, 60)
+    lru.set("b", "y" * 10, 60)
+    lru.set("c", "z" * 10, 60)
+    assert lru.get("a") is not None  # "b" is now the oldest
+    lru.set("d", "w" * 10, 60)
+    assert lru.get("b") is None
+    assert [lru.get(k) is not None for k in "acd"] == [True, True, True]
+    assert lru.bytes == 30
+
+    lru.set("big", "v" * 31, 60)  # larger than the whole tier: not stored
+    assert lru.get("big") is None and len(lru) == 3
+
+
+def test_oversized_responses_are_not_cached(redis, monkeypatch):
+    monkeypatch.setattr(lc, "MAX_ENTRY_BYTES", 50)
+    cache = _cache(redis)
+    cache.set("k", {"text": "x" * 100})
+    assert cache.get("k") is None
+    assert redis.data == {}
+
+
+def test_redis_hits_are_promoted_to_the_local_tier(redis):
+    _cache(redis).set("k", {"text": "shared"}, tool="quiz_creator")
+    assert redis.ttls[lc._REDIS_PREFIX + "k"] == 7 * 24 * 3600
+
+    other_worker = _cache(redis)
+    assert other_worker.get("k", tool="quiz_creator") == {"text": "shared"}
+    calls = redis.calls
+    assert other_worker.get("k", tool="quiz_creator") == {"text": "shared"}
+    assert redis.calls == calls  # served from the local tier
+    stats = other_worker.stats()
+    assert stats["process"]["quiz_creator"]["hits_redis"] == 1
+    assert stats["process"]["quiz_creator"]["hits_local"] == 1
+    assert stats["cluster"]["quiz_creator"] == {"hits_redis": 1, "hits_local": 1}
+
+
+def test_redis_outage_falls_back_to_the_local_tier():
+    down = DownRedis()
+    cache = _cache(down)
+    cache.set("k", {"text": "kept locally"})
+    assert cache.get("k") == {"text": "kept locally"}
+    assert cache.get("missing") is None
+    assert down.calls == 1  # the tier is skipped after the first failure
+
+
+def test_off_backend_caches_nothing():
+    cache = LLMCache(backend="off")
+    cache.set("k", {"text": "x"})
+    assert not cache.enabled
+    assert cache.get("k") is None
+    assert cache.stats()["local_entries"] == 0
+
+
+def _in_threads(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def test_concurrent_identical_calls_share_one_answer():
+    cache = _cache()
+    flight = SingleFlight(cache, enabled=True)
+    release = threading.Event()
+    calls, answers = [], []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return {"text": "once"}
+
+    threads = _in_threads(4, lambda: answers.append(flight.do("k", fn, wait=5, tool="summarizer")))
+    while len(flight._flights) == 0:
+        time.sleep(0.001)
+    time.sleep(0.05)  # let the followers reach the leader's flight
+    release.set()
+    for t in threads:
+        t.join()
+    assert answers == [{"text": "once"}] * 4
+    assert len(calls) == 1
+    assert cache.stats()["process"]["summarizer"]["coalesced_local"] == 3
+    assert flight._flights == {}
+
+
+def test_followers_see_the_leaders_error():
+    flight = SingleFlight(_cache(), enabled=True)
+    release = threading.Event()
+    errors = []
+
+    def fn():
+        release.wait(5)
+        raise RuntimeError("upstream failed")
+
+    def call():
+        try:
+            flight.do("k", fn, wait=5)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = _in_threads(3, call)
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert errors == ["upstream failed"] * 3
+
+
+def test_disabled_single_flight_calls_every_time():
+    flight = SingleFlight(_cache(), enabled=False)
+    calls = []
+    for _ in range(2):
+        flight.do("k", lambda: calls.append(1) or {"text": "x"}, wait=1)
+    assert len(calls) == 2
+
+
+def test_leader_publishes_its_answer_and_releases_its_lock(redis):
+    flight = SingleFlight(_cache(redis), enabled=True)
+    redis.data[lc._FLIGHT_RESULT_PREFIX + "k"] = json.dumps({"text": "stale"})
+    assert flight.do("k", lambda: {"text": "fresh"}, wait=1) == {"text": "fresh"}
+    assert json.loads(redis.data[lc._FLIGHT_RESULT_PREFIX + "k"]) == {"text": "fresh"}
+    assert redis.ttls[lc._FLIGHT_RESULT_PREFIX + "k"] == lc._FLIGHT_RESULT_TTL
+    assert lc._FLIGHT_LOCK_PREFIX + "k" not in redis.data
+
+
+def test_another_workers_answer_is_awaited(redis, monkeypatch):
+    monkeypatch.setattr(lc, "_FLIGHT_POLL_SECONDS", 0.01)
+    cache = _cache(redis)
+    flight = SingleFlight(cache, enabled=True)
+    redis.data[lc._FLIGHT_LOCK_PREFIX + "k"] = "other-worker"
+
+    def publish():
+        time.sleep(0.05)
+        redis.data[lc._FLIGHT_RESULT_PREFIX + "k"] = json.dumps({"text": "theirs"})
+
+    threading.Thread(target=publish).start()
+    assert flight.do("k", lambda: {"text": "mine"}, wait=2, tool="topics") == {"text": "theirs"}
+    assert cache.stats()["process"]["topics"]["coalesced_redis"] == 1
+    assert redis.data[lc._FLIGHT_LOCK_PREFIX + "k"] == "other-worker"  # not ours to release
+
+
+def test_a_vanished_leader_is_not_waited_for(redis, monkeypatch):
+    monkeypatch.setattr(lc, "_FLIGHT_POLL_SECONDS", 0.01)
+    flight = SingleFlight(_cache(redis), enabled=True)
+    redis.data[lc._FLIGHT_LOCK_PREFIX + "k"] = "other-worker"
+
+    def die():
+        time.sleep(0.05)
+        redis.delete(lc._FLIGHT_LOCK_PREFIX + "k")
+
+    threading.Thread(target=die).start()
+    started = time.monotonic()
+    assert flight.do("k", lambda: {"text": "mine"}, wait=5) == {"text": "mine"}
+    assert time.monotonic() - started < 1
@@ -0,0 +1,227 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from app.services import llm_gateway
+from app.services import openai_key_manager as okm
+from app.services.llm_gateway import LLMGateway, RateLimitError
+from app.services.openai_key_manager import OpenAIKeyManager
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class FakeResponse:
+    def __init__(self, status=200, body=None, lines=(), headers=None, on_line=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self._body = body
+        self._lines = lines
+        self._on_line = on_line
+        self.closed = False
+        self.text = json.dumps(body) if body is not None else ""
+
+    def json(self):
+        return self._body
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self._lines:
+            if isinstance(line, Exception):
+                raise line
+            if self._on_line:
+                self._on_line(line)
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Answers each POST with the next scripted response (or exception) for its slot."""
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def post(self, url, headers=None, json=None, timeout=None, stream=False):
+        self.calls += 1
+        reply = self.replies.pop(0)
+        if callable(reply):
+            reply = reply()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def sse(*deltas):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': d}}]})}" for d in deltas]
+    return lines + ["data: [DONE]"]
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_API_KEYS", "key-a,key-b")
+    monkeypatch.setenv("AZURE_OPENAI_API_BASES", "http://a,http://b")
+    monkeypatch.setattr(okm, "_USE_REDIS", False)
+    return OpenAIKeyManager()
+
+
+@pytest.fixture
+def gateway(manager):
+    gw = LLMGateway(manager=manager)
+    gw.sessions = {}
+    gw._session = lambda idx: gw.sessions[idx]
+    return gw
+
+
+def _busy(manager):
+    return [s["in_flight"] for s in manager.snapshot()]
+
+
+def test_stream_holds_the_slot_until_the_last_delta(gateway, manager):
+    seen = []
+    resp = FakeResponse(lines=sse("Hel", "lo"), on_line=lambda _: seen.append(_busy(manager)))
+    gateway.sessions = {0: FakeSession([resp]), 1: FakeSession([resp])}
+    assert "".join(gateway.stream(MESSAGES, cache=False)) == "Hello"
+
+    assert all(sum(busy) == 1 for busy in seen)
+    assert sum(_busy(manager)) == 0
+    assert resp.closed
+    assert manager.ttft_p95() is not None
+    assert manager.latency_p95() is None  # stream durations are not call latencies
+    assert sum(s["requests"] for s in manager.snapshot()) == 1
+
+
+def test_stream_stopped_early_releases_without_a_failure(gateway, manager):
+    resp = FakeResponse(lines=sse("a", "b", "c"))
+    gateway.sessions = {0: FakeSession([resp]), 1: FakeSession([resp])}
+    chunks = gateway.stream(MESSAGES, cache=False)
+    assert next(chunks) == "a"
+    assert sum(_busy(manager)) == 1
+    chunks.close()
+    assert sum(_busy(manager)) == 0
+    assert sum(s["failures"] for s in manager.snapshot()) == 0
+
+
+def test_stream_broken_mid_way_counts_against_the_slot(gateway, manager):
+    resp = FakeResponse(lines=sse("a")[:1] + [requests.ConnectionError("reset")])
+    gateway.sessions = {0: FakeSession([resp]), 1: FakeSession([resp])}
+    with pytest.raises(requests.ConnectionError):
+        list(gateway.stream(MESSAGES, cache=False))
+    assert sum(s["failures"] for s in manager.snapshot()) == 1
+    assert sum(_busy(manager)) == 0
+
+
+def test_stream_rotates_slots_before_the_first_byte(gateway, manager, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "MAX_ATTEMPTS", 2)
+    throttled = FakeResponse(status=429, headers={"Retry-After": "1"}, body={"error": "busy"})
+    gateway.sessions = {0: FakeSession([throttled]), 1: FakeSession([FakeResponse(lines=sse("ok"))])}
+    assert list(gateway.stream(MESSAGES, cache=False)) == ["ok"]  # a fresh manager starts on slot 0
+    assert gateway.sessions[0].calls == gateway.sessions[1].calls == 1
+
+    gateway.sessions = {0: FakeSession([throttled]), 1: FakeSession([throttled])}
+    with pytest.raises(RateLimitError):
+        list(gateway.stream(MESSAGES, cache=False))
+
+
+def _reply(text):
+    return FakeResponse(body={"choices": [{"message": {"role": "assistant", "content": text}}]})
+
+
+def test_throttled_call_moves_to_another_slot(gateway, manager):
+    throttled = FakeResponse(status=429, body={"error": "busy"})
+    gateway.sessions = {0: FakeSession([throttled]), 1: FakeSession([_reply("  hi  ")])}
+    assert gateway.chat(MESSAGES, cache=False, hedge=False) == "hi"
+    snap = manager.snapshot()
+    assert snap[0]["failures"] == 1 and snap[1]["failures"] == 0
+    assert sum(_busy(manager)) == 0
+
+
+def test_connection_errors_are_retried_up_to_max_attempts(gateway, manager, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "MAX_ATTEMPTS", 2)
+    down = requests.ConnectionError("refused")
+    gateway.sessions = {0: FakeSession([down]), 1: FakeSession([FakeResponse(status=503, body={})])}
+    with pytest.raises(llm_gateway.TransientError):
+        gateway.create(MESSAGES, cache=False, hedge=False)
+    assert gateway.sessions[0].calls == gateway.sessions[1].calls == 1
+    assert sum(s["failures"] for s in manager.snapshot()) == 2
+
+
+def test_bad_requests_are_neither_retried_nor_held_against_the_slot(gateway, manager):
+    gateway.sessions = {0: FakeSession([FakeResponse(status=400, body={"error": "bad"})]), 1: FakeSession([])}
+    with pytest.raises(llm_gateway.LLMError) as exc:
+        gateway.create(MESSAGES, cache=False, hedge=False)
+    assert exc.value.status == 400
+    assert gateway.sessions[1].calls == 0
+    assert sum(s["failures"] for s in manager.snapshot()) == 0
+
+
+def test_requests_carry_the_slot_credentials(gateway):
+    seen = []
+
+    class Recording(FakeSession):
+        def post(self, url, headers=None, **kwargs):
+            seen.append((url, headers["api-key"]))
+            return super().post(url, headers=headers, **kwargs)
+
+    gateway.sessions = {0: Recording([_reply("a")] * 3), 1: Recording([_reply("b")] * 3)}
+    for _ in range(3):
+        gateway.chat(MESSAGES, deployment="gpt-4o", cache=False, hedge=False)
+    assert len(seen) == 3
+    for url, key in seen:
+        base = {"key-a": "http://a", "key-b": "http://b"}[key]
+        assert url == f"{base}/openai/deployments/gpt-4o/chat/completions?api-version={gateway.api_version}"
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(llm_gateway, "HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(llm_gateway, "HEDGE_MAX_RATIO", 0.5)
+    gate = threading.Event()
+    yield lambda text: (lambda: gate.wait(5) and _reply(text))
+    gate.set()
+
+
+def _wait_idle(manager):
+    deadline = time.monotonic() + 5
+    while sum(_busy(manager)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return sum(_busy(manager)) == 0
+
+
+def test_slow_primary_is_hedged_and_the_first_answer_wins(gateway, manager, hedging):
+    gateway.sessions = {0: FakeSession([hedging("slow")]), 1: FakeSession([_reply("fast")])}
+    assert gateway.chat(MESSAGES, cache=False, hedge=True) == "fast"
+    stats = gateway.hedge_stats()
+    assert stats["hedged"] == 1 and stats["wins_hedge"] == 1
+
+
+def test_fast_primary_is_not_hedged(gateway, hedging):
+    gateway.sessions = {0: FakeSession([_reply("fast")]), 1: FakeSession([])}
+    assert gateway.chat(MESSAGES, cache=False, hedge=True) == "fast"
+    assert gateway.hedge_stats()["hedged"] == 0
+    assert gateway.hedge_stats()["wins_primary"] == 1
+
+
+def test_hedges_stay_within_the_ratio_cap(gateway, manager, hedging, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "HEDGE_MAX_RATIO", 0.0)  # only the idle allowance of one
+    late = lambda: time.sleep(0.2) or _reply("late")
+    gateway.sessions = {0: FakeSession([hedging("slow"), late]), 1: FakeSession([_reply("fast")])}
+    assert gateway.chat(MESSAGES, cache=False, hedge=True) == "fast"
+    manager._health[1].latency_ewma = 100.0  # keep the next primary on slot 0
+    assert gateway.chat(MESSAGES, cache=False, hedge=True) == "late"  # waited instead of hedging
+    stats = gateway.hedge_stats()
+    assert stats["hedged"] == 1 and stats["capped"] == 1 and stats["eligible"] == 2
+
+
+def test_no_hedge_without_another_healthy_slot(gateway, manager, hedging, monkeypatch):
+    monkeypatch.setattr(okm, "BREAKER_THRESHOLD", 1)
+    manager.release(1, ok=False)  # slot 1's breaker is open
+    gate = threading.Event()
+    gateway.sessions = {0: FakeSession([lambda: gate.wait(0.3) or _reply("slow")]), 1: FakeSession([])}
+    assert gateway.chat(MESSAGES, cache=False, hedge=True) == "slow"
+    assert gateway.hedge_stats()["no_slot"] == 1
+    assert gateway.sessions[1].calls == 0
+    assert _wait_idle(manager)
@@ -0,0 +1,126 @@
+import pytest
+
+from app.services import openai_key_manager as okm
+from app.services.openai_key_manager import OpenAIKeyManager, _TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(okm.time, "monotonic", c)
+    return c
+
+
+@pytest.fixture
+def manager(monkeypatch, clock):
+    monkeypatch.setenv("AZURE_OPENAI_API_KEYS", "key-a,key-b")
+    monkeypatch.setenv("AZURE_OPENAI_API_BASES", "http://a,http://b")
+    monkeypatch.setattr(okm, "_USE_REDIS", False)
+    monkeypatch.setattr(okm, "BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(okm, "BREAKER_COOLDOWN", 30.0)
+    monkeypatch.setattr(okm, "BREAKER_MAX_COOLDOWN", 300.0)
+    return OpenAIKeyManager()
+
+
+def test_bucket_spends_then_waits_for_refill(clock):
+    bucket = _TokenBucket(60)  # one token per second
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(2) == pytest.approx(3.0)  # queued behind the previous reservation
+    clock.now += 3.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_refills_only_up_to_capacity(clock):
+    bucket = _TokenBucket(60)
+    bucket.reserve(30)
+    clock.now += 3600
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_caps_oversized_requests(clock):
+    bucket = _TokenBucket(60)
+    assert bucket.reserve(500) == 0.0  # more than a minute of quota: takes the whole bucket
+    assert bucket.reserve(60) == pytest.approx(60.0)
+
+
+def _fail(manager, idx, times):
+    for _ in range(times):
+        manager.release(idx, ok=False)
+
+
+def _healthy(manager, idx):
+    other = 1 - idx
+    got = manager.acquire(exclude={other}, healthy_only=True)
+    return got is not None and got[2] == idx
+
+
+def test_breaker_opens_after_threshold(manager):
+    _fail(manager, 0, 2)
+    assert _healthy(manager, 0)
+    manager.release(0, ok=True)
+    assert manager.snapshot()[0]["state"] == "closed"  # a success resets the count
+
+    _fail(manager, 0, 3)
+    assert manager.snapshot()[0]["state"] == "open"
+    assert not _healthy(manager, 0)
+    assert {manager.acquire()[2] for _ in range(4)} == {1}
+
+
+def test_half_open_lets_one_trial_call_through(manager, clock):
+    _fail(manager, 0, 3)
+    clock.now += 31
+    assert manager.snapshot()[0]["state"] == "half_open"
+    trial = manager.acquire(exclude={1}, healthy_only=True)
+    assert trial[2] == 0 and trial[3]    # the trial call
+    assert not _healthy(manager, 0)      # everyone else waits for its answer
+    manager.release(0, ok=True, probe=True)
+    assert manager.snapshot()[0]["state"] == "closed"
+    assert _healthy(manager, 0) and _healthy(manager, 0)
+
+
+def test_failed_trial_call_reopens_for_longer(manager, clock):
+    _fail(manager, 0, 3)
+    clock.now += 31
+    assert _healthy(manager, 0)
+    manager.release(0, ok=False, probe=True)
+    snap = manager.snapshot()[0]
+    assert snap["state"] == "open"
+    assert snap["reopens_in_s"] == pytest.approx(60.0)
+
+
+def test_only_the_trial_call_gives_the_probe_lease_back(manager, clock):
+    _fail(manager, 0, 3)
+    clock.now += 31
+    assert _healthy(manager, 0)
+    manager.release(0, ok=False)  # a call from before the trip fails late
+    clock.now += 61               # past the doubled cooldown
+    assert not _healthy(manager, 0)  # the trial call still holds the lease
+    manager.release(0, ok=True, probe=True)
+    assert _healthy(manager, 0)
+
+
+def test_expired_trial_lease_lets_another_call_probe(manager, clock, monkeypatch):
+    monkeypatch.setattr(okm, "BREAKER_PROBE_LEASE", 120.0)
+    _fail(manager, 0, 3)
+    clock.now += 31
+    assert _healthy(manager, 0)  # claimed, but its caller never releases
+    clock.now += 121
+    assert _healthy(manager, 0)
+
+
+def test_all_open_falls_back_to_the_slot_reopening_soonest(manager, clock):
+    _fail(manager, 0, 3)
+    clock.now += 10
+    _fail(manager, 1, 3)
+    assert manager.acquire(healthy_only=True) is None
+    assert manager.acquire()[2] == 0
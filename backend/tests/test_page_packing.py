@@ -0,0 +1,101 @@
+import json
+import re
+
+import pytest
+
+from app.services import page_packing
+from app.services.page_packing import extract_json, pack_pages, parse_keyed_array, run_packed
+from app.services.stages.discover.sentiment_service import SentimentService
+
+
+def _packed_reply(messages, **kwargs):
+    ids = re.findall(r"### PAGE id=(\S+)", messages[-1]["content"])
+    return json.dumps([{"id": i, "label": "positive", "score": 0.5, "rationale": "ok"} for i in ids])
+
+
+def test_blank_pages_are_reported_with_the_rest(monkeypatch):
+    svc = SentimentService()
+    monkeypatch.setattr(svc, "_chat", _packed_reply)
+    pages = [(1, "Good news."), (2, ""), (3, "More good news."), (4, "   ")]
+    reported = {}
+    results = svc._analyze_pages(pages, on_batch=reported.update)
+    assert set(reported) == set(results) == {1, 2, 3, 4}
+    assert reported[2]["label"] == "neutral" and reported[1]["label"] == "positive"
+
+
+@pytest.fixture
+def words(monkeypatch):
+    monkeypatch.setattr(page_packing, "count_tokens", lambda text: len(text.split()))
+
+
+def _pages(*sizes):
+    return [(i, " ".join(["w"] * n)) for i, n in enumerate(sizes, 1)]
+
+
+def _keys(batches):
+    return [[key for key, _ in batch] for batch in batches]
+
+
+def test_pages_are_packed_in_order_within_the_prompt_budget(words):
+    batches = pack_pages(_pages(40, 40, 40, 100, 10), out_tokens_per_page=10, prompt_tokens=100)
+    assert _keys(batches) == [[1, 2], [3], [4], [5]]  # an oversized page still gets its own batch
+
+
+def test_pages_per_batch_are_capped_by_count_and_output_budget(words):
+    pages = _pages(*[1] * 10)
+    assert _keys(pack_pages(pages, 10, max_pages=4)) == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    assert _keys(pack_pages(pages, 100, max_pages=16, max_output_tokens=300)) == \
+        [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10]]
+    assert len(pack_pages(pages, 1000, max_output_tokens=300)) == 10
+
+
+def test_json_is_found_among_fences_and_chatter():
+    assert extract_json('Sure!\n```json\n{"a": [1, 2]}\n```') == {"a": [1, 2]}
+    assert extract_json('Here: [{"id": 1}] done', list) == [{"id": 1}]
+    assert extract_json('{"a": 1}', list) is None
+    assert extract_json("no json at all") is None
+    assert extract_json('{"a": ') is None
+    assert extract_json(None) is None
+
+
+def test_keyed_array_skips_items_without_an_id():
+    raw = '[{"id": 1, "v": "a"}, {"v": "b"}, "junk", {"id": "p2", "v": "c"}]'
+    assert parse_keyed_array(raw) == {"1": {"id": 1, "v": "a"}, "p2": {"id": "p2", "v": "c"}}
+    assert parse_keyed_array("not an array") == {}
+
+
+def test_missing_and_bad_items_are_retried_alone(words):
+    sent, singles, reported = [], [], []
+
+    def call_batch(batch, max_tokens):
+        sent.append(([key for key, _ in batch], max_tokens))
+        return json.dumps([{"id": 1, "v": "one"}, {"id": 2}, {"id": 4, "v": "four"}])
+
+    def parse_item(item):
+        return item["v"].upper()
+
+    def single(text):
+        singles.append(text)
+        return "alone"
+
+    pages = [(1, "a"), (2, "b"), (3, "c"), (4, "d")]
+    results = run_packed(pages, call_batch, parse_item, single, out_tokens_per_page=10, on_batch=reported.append)
+    assert sent == [([1, 2, 3, 4], 90)]
+    assert results == {1: "ONE", 2: "alone", 3: "alone", 4: "FOUR"}
+    assert singles == ["b", "c"]
+    assert reported == [results]
+
+
+def test_a_lone_page_skips_the_packed_prompt(words):
+    def call_batch(batch, max_tokens):
+        raise AssertionError("a single page is not packed")
+
+    assert run_packed([(7, "a")], call_batch, dict, str.upper, out_tokens_per_page=10) == {7: "A"}
+
+
+def test_failed_packed_requests_are_raised(words):
+    def call_batch(batch, max_tokens):
+        raise RuntimeError("rate limited")
+
+    with pytest.raises(RuntimeError):
+        run_packed([(1, "a"), (2, "b")], call_batch, dict, lambda text: "alone", out_tokens_per_page=10)
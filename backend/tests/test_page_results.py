@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from flask import Flask
+
+from app.db import db
+from app.models import PageResult
+from app.services import page_results
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://")
+    db.init_app(app)
+    with app.app_context():
+        PageResult.__table__.create(db.engine)
+        yield app
+        db.drop_all()
+
+
+class Counter:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.values[min(self.calls, len(self.values)) - 1]
+
+
+def test_second_call_reads_the_stored_result(app):
+    compute = Counter(["a"], ["b"])
+    assert page_results.cached("tool/v1", "page text", compute) == ["a"]
+    assert page_results.cached("tool/v1", "page text", compute) == ["a"]
+    assert compute.calls == 1
+
+
+def test_key_covers_params_and_model(app):
+    compute = Counter(["a"], ["b"], ["c"])
+    page_results.cached("tool/v1", "page text", compute, params={"k": 5})
+    page_results.cached("tool/v1", "page text", compute, params={"k": 6})
+    page_results.cached("tool/v1", "page text", compute, params={"k": 5}, model="other")
+    assert compute.calls == 3
+
+
+def test_refresh_recomputes_and_replaces_the_entry(app):
+    compute = Counter(["old"], ["new"])
+    page_results.cached("tool/v1", "page text", compute)
+    assert page_results.cached("tool/v1", "page text", compute, refresh=True) == ["new"]
+    assert page_results.cached("tool/v1", "page text", compute) == ["new"]
+    assert compute.calls == 2
+
+
+def test_empty_results_are_not_stored(app):
+    compute = Counter([], ["x"])
+    assert page_results.cached("tool/v1", "blank", compute) == []
+    assert page_results.cached("tool/v1", "blank", compute) == ["x"]
+
+
+def test_cached_pages_only_computes_missing_pages(app):
+    seen, batches = [], []
+
+    def compute(todo, save):
+        seen.extend(pid for pid, _ in todo)
+        batch = {pid: {"n": len(text)} for pid, text in todo}
+        save(batch)
+        return batch
+
+    page_results.cached_pages("packed/v1", [(1, "one"), (2, "three")], compute)
+    out = page_results.cached_pages("packed/v1", [(1, "one"), (2, "three"), (3, "seven")], compute,
+                                    on_batch=batches.append)
+    assert out == {1: {"n": 3}, 2: {"n": 5}, 3: {"n": 5}}
+    assert seen == [1, 2, 3]
+    assert batches == [{1: {"n": 3}, 2: {"n": 5}}, {3: {"n": 5}}]
+
+    page_results.cached_pages("packed/v1", [(1, "one")], compute, refresh=True)
+    assert seen == [1, 2, 3, 1]
+
+
+def test_sampled_tool_results_expire(app, monkeypatch):
+    compute = Counter("first summary", "second summary")
+    assert page_results.ttl_for("summarizer/v1") == 7 * 24 * 3600
+    assert page_results.ttl_for("segmenter/v1") is None
+    page_results.cached("summarizer/v1", "page text", compute)
+    assert page_results.cached("summarizer/v1", "page text", compute) == "first summary"
+
+    monkeypatch.setenv("PAGE_RESULT_TTL_SUMMARIZER", "0")
+    assert page_results.cached("summarizer/v1", "page text", compute) == "second summary"
+    monkeypatch.delenv("PAGE_RESULT_TTL_SUMMARIZER")
+    assert page_results.cached("summarizer/v1", "page text", compute) == "second summary"  # replaced
+    assert compute.calls == 2
+
+
+def test_unstored_results_are_returned_but_not_kept(app):
+    compute = Counter(page_results.unstored({"label": "neutral", "rationale": "garbled"}), {"label": "positive"})
+    first = page_results.cached("tool/v1", "page text", compute)
+    assert first == {"label": "neutral", "rationale": "garbled"}
+    assert json.loads(json.dumps(first)) == first  # still a plain dict to callers
+    assert page_results.cached("tool/v1", "page text", compute) == {"label": "positive"}
+    assert page_results.cached("tool/v1", "page text", compute) == {"label": "positive"}
+    assert compute.calls == 2
+
+
+def test_parse_failure_fallbacks_are_not_kept(app, monkeypatch):
+    from app.services.stages.discover.sentiment_service import SentimentService
+    from app.services.stages.discover.segmenter_service import SegmenterService
+
+    replies = iter(["not json at all", '{"label": "positive", "score": 0.5, "rationale": "ok"}'])
+    sentiment = SentimentService()
+    monkeypatch.setattr(sentiment, "_chat", lambda *a, **kw: next(replies))
+    assert sentiment.analyze_pages([(1, "a page")])[1]["rationale"] == "not json at all"
+    assert sentiment.analyze_pages([(1, "a page")])[1]["label"] == "positive"
+    assert sentiment.analyze_pages([(1, "a page")])[1]["label"] == "positive"  # stored now
+
+    replies = iter(["- Intro: the start", '[{"heading": "Intro", "level": 1, "summary": "s", "tags": []}]'])
+    segmenter = SegmenterService()
+    monkeypatch.setattr(segmenter, "_chat", lambda *a, **kw: next(replies))
+    assert segmenter.segment_page("a page")[0]["level"] == 2
+    assert segmenter.segment_page("a page")[0]["level"] == 1
+    assert segmenter.segment_page("a page")[0]["level"] == 1
+
+
+def test_unstored_rejects_other_types():
+    with pytest.raises(TypeError):
+        page_results.unstored(None)
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import sys
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import fake_blob_server as fb  # noqa: E402
+
+from app.db import db  # noqa: E402
+from app.models.files import UploadedFile, UploadSession  # noqa: E402
+from app.routes import upload  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+@pytest.fixture(scope="module")
+def blob_server():
+    srv = fb.serve()
+    saved = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+    os.environ["AZURE_STORAGE_CONNECTION_STRING"] = fb.connection_string(srv.server_port)
+    yield fb.Store
+    srv.shutdown()
+    if saved is None:
+        os.environ.pop("AZURE_STORAGE_CONNECTION_STRING", None)
+    else:
+        os.environ["AZURE_STORAGE_CONNECTION_STRING"] = saved
+
+
+@pytest.fixture
+def client(blob_server, monkeypatch):
+    blob_server.containers["scoolish"] = {}
+    monkeypatch.setattr(upload, "RESUMABLE_CHUNK_SIZE", CHUNK)
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://", JWT_SECRET_KEY="test-secret-key-at-least-32-bytes")
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(upload.upload_bp, url_prefix="/api/upload")
+    with app.app_context():
+        UploadedFile.__table__.create(db.engine)
+        UploadSession.__table__.create(db.engine)
+        c = app.test_client()
+        c.headers = {u: {"Authorization": f"Bearer {create_access_token(identity=u)}"} for u in ("u1", "u2")}
+        yield c
+        db.drop_all()
+
+
+def _upload(c, user, data, name="lecture.mp4"):
+    r = c.post("/api/upload/uploads", headers=c.headers[user], json={"filename": name, "size": len(data)})
+    assert r.status_code == 201, r.json
+    uid = r.json["upload_id"]
+    for i in range(0, len(data), CHUNK):
+        r = c.put(f"/api/upload/uploads/{uid}/chunks/{i // CHUNK}", data=data[i:i + CHUNK],
+                  headers={**c.headers[user], "Upload-Offset": str(i)})
+        assert r.status_code == 200, r.json
+    return uid, c.post(f"/api/upload/uploads/{uid}/commit", headers=c.headers[user])
+
+
+def test_commit_records_the_sha256_of_the_blob(client, blob_server):
+    data = os.urandom(3 * CHUNK + 777)
+    uid, r = _upload(client, "u1", data)
+    assert r.status_code == 200 and r.json["message"] == "File uploaded successfully"
+    (stored,) = blob_server.containers["scoolish"].values()
+    assert stored[0] == data
+    assert UploadedFile.query.one().hash == hashlib.sha256(data).hexdigest()
+
+    again = client.post(f"/api/upload/uploads/{uid}/commit", headers=client.headers["u1"])
+    assert again.json == r.json
+
+
+def test_content_already_in_the_vault_is_not_kept(client, blob_server):
+    data = os.urandom(2 * CHUNK)
+    _upload(client, "u1", data)
+    _, r = _upload(client, "u2", data, name="copy.mp4")
+    assert r.json["message"] == "File already uploaded previously"
+    assert len(blob_server.containers["scoolish"]) == 1
+    assert UploadedFile.query.count() == 1
+
+
+def test_chunks_must_arrive_in_order(client):
+    r = client.post("/api/upload/uploads", headers=client.headers["u1"], json={"filename": "a.bin", "size": 2 * CHUNK})
+    uid = r.json["upload_id"]
+    out_of_order = client.put(f"/api/upload/uploads/{uid}/chunks/1", data=b"x" * CHUNK,
+                              headers={**client.headers["u1"], "Upload-Offset": str(CHUNK)})
+    assert out_of_order.status_code == 409
+    assert client.post(f"/api/upload/uploads/{uid}/commit", headers=client.headers["u1"]).status_code == 409
+    assert client.get(f"/api/upload/uploads/{uid}", headers=client.headers["u2"]).status_code == 404
@@ -0,0 +1,89 @@
+import docx
+import pytest
+
+from app.utils.extraction import extract_pages, segment
+from app.utils.extraction.segment import Block, is_heading_line, pack_blocks
+
+
+@pytest.fixture(autouse=True)
+def words(monkeypatch):
+    monkeypatch.setattr(segment, "count_tokens", lambda text: len(text.split()))
+
+
+def para(n, word="w"):
+    return Block(" ".join([word] * n))
+
+
+def sentences(count, size=10):
+    return " ".join(" ".join(["w"] * (size - 1)) + " end." for _ in range(count))
+
+
+def _sizes(pages):
+    return [len(p.text.split()) for p in pages]
+
+
+def test_paragraphs_are_packed_up_to_the_target():
+    pages = list(pack_blocks([para(30) for _ in range(7)], target=100))
+    assert _sizes(pages) == [90, 90, 30]
+    assert pages[0].text == "\n\n".join([para(30).text] * 3)
+    assert pages[0].headings == []
+
+
+def test_a_heading_starts_a_new_page_once_the_page_is_half_full():
+    blocks = [para(60), Block("# Methods", heading=True), para(10)]
+    pages = list(pack_blocks(blocks, target=100))
+    assert [p.headings for p in pages] == [[], ["Methods"]]
+
+    blocks = [para(20), Block("Methods", heading=True), para(10)]
+    (page,) = pack_blocks(blocks, target=100)
+    assert page.headings == ["Methods"]
+
+
+def test_a_heading_is_not_left_at_the_bottom_of_a_page():
+    blocks = [para(40), Block("Results", heading=True), para(70)]
+    pages = list(pack_blocks(blocks, target=100))
+    assert pages[0].text == para(40).text
+    assert pages[1].text.startswith("Results\n\n") and pages[1].headings == ["Results"]
+
+
+def test_long_paragraphs_are_split_at_sentence_ends():
+    pages = list(pack_blocks([para(20), Block(sentences(25))], target=100))
+    assert all(size <= 100 for size in _sizes(pages))
+    assert sum(_sizes(pages)) == 270
+    assert _sizes(pages)[0] == 100  # the first piece fills the page it starts on
+    assert all(p.text.endswith("end.") for p in pages)
+
+
+def test_a_sentence_longer_than_a_page_is_split_at_spaces():
+    pages = list(pack_blocks([para(250)], target=100))
+    assert len(pages) == 3 and sum(_sizes(pages)) == 250
+    assert all(size <= 100 for size in _sizes(pages))
+
+
+def test_heading_lines():
+    assert is_heading_line("## Background")
+    assert is_heading_line("Cell Structure")
+    assert not is_heading_line("Cell Structure", markdown_only=True)
+    assert not is_heading_line("Cells are the basic unit of life.")
+
+
+def test_text_files_are_paged_at_their_headings(tmp_path):
+    body = sentences(segment.PAGE_TARGET_TOKENS // 40 + 1)  # two fill half a page
+    path = tmp_path / "notes.txt"
+    path.write_text(f"# Introduction\n{body}\n\n{body}\n\nCell Structure\n{body}\n", encoding="utf-8")
+    pages = extract_pages(str(path))
+    assert [p.headings for p in pages] == [["Introduction"], ["Cell Structure"]]
+    assert pages[1].text.startswith("Cell Structure\n\n")
+
+
+def test_docx_headings_come_from_paragraph_styles(tmp_path):
+    document = docx.Document()
+    document.add_heading("Photosynthesis", level=1)
+    document.add_paragraph("Plants turn light into sugar.")
+    document.add_paragraph("")
+    document.add_paragraph("Summary Of Findings")  # title-like, but not styled as a heading
+    path = tmp_path / "notes.docx"
+    document.save(str(path))
+    (page,) = extract_pages(str(path))
+    assert page.headings == ["Photosynthesis"]
+    assert page.text == "Photosynthesis\nPlants turn light into sugar.\nSummary Of Findings"
@@ -0,0 +1,63 @@
+import re
+
+import pytest
+
+from app.utils import token_budget
+from app.utils.token_budget import _Encoder, fit_text
+
+
+class Recorder:
+    """A fake tokenizer that remembers how much text it was asked to encode."""
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern, re.S)
+        self.encoded = []
+
+    def encoder(self):
+        return _Encoder("fake", self.encode, "".join)
+
+    def encode(self, text):
+        self.encoded.append(len(text))
+        return self.pattern.findall(text)
+
+
+@pytest.fixture
+def chars(monkeypatch):
+    rec = Recorder(r".")  # one token per character
+    monkeypatch.setattr(token_budget, "get_encoder", lambda deployment=None: rec.encoder())
+    return rec
+
+
+@pytest.fixture
+def words(monkeypatch):
+    rec = Recorder(r"\S+\s*")  # one token per word
+    monkeypatch.setattr(token_budget, "get_encoder", lambda deployment=None: rec.encoder())
+    return rec
+
+
+def test_short_text_is_kept_whole(chars):
+    fitted = fit_text("A short page.", 100)
+    assert fitted == ("A short page.", 13, 13)
+    assert not fitted.truncated
+
+
+def test_long_text_is_not_encoded_past_the_budget(chars):
+    text = "This is one sentence. " * 50000
+    fitted = fit_text(text, 100)
+    assert max(chars.encoded) <= 100 * token_budget._FIT_CHARS_PER_TOKEN
+    assert text.startswith(fitted.text) and fitted.text.endswith(".")
+    assert fitted.tokens <= 100
+    assert fitted.original_tokens == len(text)
+    assert fitted.truncated_tokens == len(text) - fitted.tokens
+
+
+def test_window_grows_when_tokens_are_long(words):
+    text = " ".join(f"word{i:016d}" for i in range(1000))
+    fitted = fit_text(text, 10)
+    assert fitted.text.split() == text.split()[:10]
+    assert fitted.original_tokens == pytest.approx(1000, rel=0.05)
+    assert max(words.encoded) < len(text) / 10
+
+
+def test_text_that_just_fits_needs_no_cut(words):
+    text = " ".join(f"word{i:016d}" for i in range(10))
+    assert fit_text(text, 10) == (text, 10, 10)
@@ -0,0 +1,64 @@
+import pytest
+
+from app.services.transcription_service import _stitch, plan_chunks
+
+pytest.importorskip("pydub")
+from pydub import AudioSegment  # noqa: E402
+from pydub.generators import Sine  # noqa: E402
+
+
+def _tone(ms):
+    return Sine(440, sample_rate=8000).to_audio_segment(duration=ms, volume=-6)
+
+
+def _silence(ms):
+    return AudioSegment.silent(duration=ms, frame_rate=8000)
+
+
+def test_short_recording_is_one_chunk():
+    assert plan_chunks(_tone(800), max_ms=1000) == [(0, 800)]
+
+
+def test_cuts_land_in_the_middle_of_pauses():
+    audio = _tone(900) + _silence(600) + _tone(900) + _silence(600) + _tone(500)  # 3500 ms
+    spans = plan_chunks(audio, max_ms=2000)
+    assert spans == [(0, 1200), (1200, 2700), (2700, 3500)]
+
+
+def test_hard_cut_without_pauses():
+    assert plan_chunks(_tone(2500), max_ms=1000) == [(0, 1000), (1000, 2000), (2000, 2500)]
+
+
+def test_spans_cover_the_recording():
+    audio = _tone(700) + _silence(500) + _tone(1900) + _silence(450) + _tone(300)
+    spans = plan_chunks(audio, max_ms=1500)
+    assert spans[0][0] == 0 and spans[-1][1] == len(audio)
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+    assert all(end - start <= 1500 for start, end in spans)
+
+
+def test_stitch_shifts_segments_to_the_recording_clock():
+    spans = [(0, 9500), (9500, 19500), (19500, 25000)]
+    results = [
+        {"text": " first part ", "segments": [{"start": 0.0, "end": 4.0, "text": " first"},
+                                              {"start": 4.0, "end": 9.1, "text": "part "}]},
+        {"text": "second", "segments": [{"start": 0.25, "end": 8.0, "text": "second"},
+                                        {"start": 8.0, "end": 9.0, "text": "  "}]},
+        {"text": "third"},  # no segments: one segment spanning the chunk
+    ]
+    t = _stitch(spans, results)
+    assert t.chunks == ["first part", "second", "third"]
+    assert t.text == "first part second third"
+    assert t.segments == [
+        {"start": 0.0, "end": 4.0, "text": "first"},
+        {"start": 4.0, "end": 9.1, "text": "part"},
+        {"start": 9.75, "end": 17.5, "text": "second"},
+        {"start": 19.5, "end": 25.0, "text": "third"},
+    ]
+
+
+def test_stitch_keeps_empty_chunks_in_place():
+    t = _stitch([(0, 1000), (1000, 2000)], [{"text": ""}, {"text": "words"}])
+    assert t.chunks == ["", "words"]
+    assert t.text == "words"
+    assert t.segments == [{"start": 1.0, "end": 2.0, "text": "words"}]
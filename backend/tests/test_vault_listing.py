@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from app.db import db
+from app.models.files import UploadedFile
+from app.routes.upload import upload_bp
+from app.tasks import vault_tasks
+
+T0 = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://", JWT_SECRET_KEY="test-secret-key-at-least-32-bytes")
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(upload_bp, url_prefix="/api/upload")
+    with app.app_context():
+        UploadedFile.__table__.create(db.engine)
+        for i in range(11):
+            video = i % 2 == 1
+            name = f"{'Lecture' if video else 'notes'}_{i}.{'mp4' if video else 'pdf'}"
+            db.session.add(UploadedFile(
+                user_id="u1", original_file_name=name, stored_file_name=f"s{i}", file_path=f"u1/uploads/s{i}",
+                file_type="video/mp4" if video else "application/pdf",
+                created_at=T0 + timedelta(minutes=i // 3),  # groups of three share a timestamp
+                hash=f"{i:064d}", status=None if i == 4 else "pending",
+            ))
+        db.session.add(UploadedFile(user_id="u1", original_file_name="gone.pdf", stored_file_name="gone",
+                                    file_path="u1/uploads/gone", file_type="application/pdf", hash="e" * 64,
+                                    created_at=T0, status="missing"))
+        db.session.add(UploadedFile(user_id="u2", original_file_name="other.pdf", stored_file_name="other",
+                                    file_path="u2/uploads/other", file_type="application/pdf", hash="f" * 64,
+                                    created_at=T0))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        token = create_access_token(identity="u1")
+    c = app.test_client()
+    c.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return c
+
+
+def _names(resp):
+    assert resp.status_code == 200, resp.json
+    return [f["stored_name"] for f in resp.json["files"]]
+
+
+def test_unpaged_listing_is_newest_first_and_hides_missing(client):
+    names = _names(client.get("/api/upload/files"))
+    assert len(names) == 11
+    assert "gone" not in names and "other" not in names
+    assert "s4" in names  # NULL status still listed
+    assert set(names[:2]) == {"s9", "s10"}  # same timestamp: id breaks the tie
+    assert set(names[-3:]) == {"s0", "s1", "s2"}
+
+
+def test_cursor_pages_cover_every_file_once(client):
+    everything = _names(client.get("/api/upload/files"))
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+        resp = client.get("/api/upload/files", query_string=params)
+        page = _names(resp)
+        assert len(page) <= 4
+        seen += page
+        pages += 1
+        cursor = resp.json["next_cursor"]
+        if not cursor:
+            break
+    assert seen == everything
+    assert pages == 3
+
+
+def test_cursor_composes_with_filters(client):
+    first = client.get("/api/upload/files", query_string={"type": "video", "limit": 2})
+    rest = client.get("/api/upload/files", query_string={"type": "video", "cursor": first.json["next_cursor"]})
+    assert _names(first) + _names(rest) == _names(client.get("/api/upload/files", query_string={"type": "video"}))
+    assert len(_names(first) + _names(rest)) == 5
+
+
+def test_name_prefix_is_literal(client):
+    assert len(_names(client.get("/api/upload/files", query_string={"q": "lec"}))) == 5
+    assert _names(client.get("/api/upload/files", query_string={"q": "%"})) == []
+
+
+def test_bad_params(client):
+    assert client.get("/api/upload/files", query_string={"cursor": "zz"}).status_code == 400
+    assert client.get("/api/upload/files", query_string={"limit": 0}).status_code == 400
+
+
+class _Container:
+    def __init__(self, names):
+        self.names = names
+
+    def list_blobs(self, name_starts_with=None):
+        return [SimpleNamespace(name=n) for n in self.names if n.startswith(name_starts_with or "")]
+
+
+def _reconcile(app, monkeypatch, blobs):
+    service = SimpleNamespace(get_container_client=lambda name: _Container(blobs))
+    monkeypatch.setattr(vault_tasks, "get_blob_service_client", lambda: service)
+    with app.app_context():
+        result = vault_tasks.reconcile_vault.run("u1")
+        return result, {f.stored_file_name: (f.status, f.status_before_missing) for f in UploadedFile.query}
+
+
+def test_reconcile_marks_missing_and_restores_the_previous_status(app, monkeypatch):
+    everything = [f"u1/uploads/s{i}" for i in range(11)]
+    result, rows = _reconcile(app, monkeypatch, everything[1:5])
+    assert result["marked_missing"] == 7 and result["restored"] == 0
+    assert rows["s0"] == ("missing", "pending")
+    assert rows["s3"] == ("pending", None)
+
+    result, rows = _reconcile(app, monkeypatch, everything + ["u1/uploads/gone"])
+    assert result["restored"] == 8 and result["marked_missing"] == 0
+    assert rows["s0"] == ("pending", None)
+    assert rows["gone"] == (None, None)  # marked before its old status was kept
+
+
+def test_reconcile_leaves_rows_newer_than_the_run_alone(app, monkeypatch):
+    with app.app_context():
+        db.session.add(UploadedFile(user_id="u1", original_file_name="new.pdf", stored_file_name="new",
+                                    file_path="u1/uploads/new", file_type="application/pdf", hash="d" * 64,
+                                    created_at=datetime.utcnow() + timedelta(seconds=5)))
+        db.session.commit()
+    _, rows = _reconcile(app, monkeypatch, [f"u1/uploads/s{i}" for i in range(11)])
+    assert rows["new"] == ("pending", None)
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axiosInstance from '../../utils/axiosInstance';
+import { uploadVaultFile } from '../../utils/resumableUpload';
 import '../../stages/StagesHome.css';
 
 // --- Tiny progress bar used inline when modal is closed ---
@@ -416,14 +417,11 @@ useEffect(() => {
     if (!file) return;
     setUploading(true);
     setError('');
-    const formData = new FormData();
-    formData.append('file', file);
 
     try {
-      const response = await axiosInstance.post('/upload/upload', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
-      });
-      const storedAs = response.data.name || response.data.stored_as;
+      // large recordings go up in resumable chunks instead of one long request
+      const data = await uploadVaultFile(file);
+      const storedAs = data.name || data.stored_as;
       await fetchVaultFiles();
       setSelectedVaultFile(storedAs);
     } catch (err) {
@@ -549,13 +547,9 @@ useEffect(() => {
 // Batch API helper
 const batchApi = {
   uploadToVault: async (file) => {
-    const formData = new FormData();
-    formData.append("file", file);
-    const r = await axiosInstance.post("/upload/upload", formData, {
-      headers: { "Content-Type": "multipart/form-data" },
-    });
-    if (!r.data?.stored_as) throw new Error(r.data?.error || "Upload failed");
-    return r.data.stored_as;
+    const data = await uploadVaultFile(file);
+    if (!data?.stored_as) throw new Error(data?.error || "Upload failed");
+    return data.stored_as;
   },
 
   // Start batch (vault-only)
@@ -0,0 +1,111 @@
+// src/utils/resumableUpload.js
+// Chunked, resumable vault upload (backend: /api/upload/uploads). The upload id
+// is remembered per file, so retrying the same file after a dropped connection
+// or a page reload continues from the last chunk the server acknowledged.
+import axiosInstance from './axiosInstance';
+
+// Files at least this large (and all audio/video) go through the resumable protocol
+export const RESUMABLE_THRESHOLD = 32 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+const storageKey = (file) => `resumable-upload:${file.name}:${file.size}:${file.lastModified}`;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export const shouldUploadResumably = (file) =>
+  file.size >= RESUMABLE_THRESHOLD || /^(audio|video)\//.test(file.type || '');
+
+async function withRetries(fn) {
+  for (let attempt = 0; ; attempt += 1) {
+    try {
+      return await fn();
+    } catch (err) {
+      const status = err.response?.status;
+      // 4xx (other than rate limiting) won't succeed on retry, nor will a server without resumable uploads
+      const permanent = (status && status < 500 && status !== 429) || err.response?.data?.resumable === false;
+      if (attempt >= MAX_RETRIES || permanent) throw err;
+      await sleep(Math.min(30000, 1000 * 2 ** attempt));
+    }
+  }
+}
+
+async function resumeOrStart(file) {
+  const saved = localStorage.getItem(storageKey(file));
+  if (saved) {
+    try {
+      const r = await axiosInstance.get(`/upload/uploads/${saved}`);
+      return r.data;
+    } catch (err) {
+      localStorage.removeItem(storageKey(file)); // expired or unknown: start over
+    }
+  }
+  const r = await axiosInstance.post('/upload/uploads', {
+    filename: file.name,
+    size: file.size,
+    content_type: file.type || 'application/octet-stream',
+  });
+  localStorage.setItem(storageKey(file), r.data.upload_id);
+  return r.data;
+}
+
+// Uploads a file to the vault: resumably when shouldUploadResumably(file), else
+// (or when the server has no resumable uploads) as one multipart POST /upload/upload.
+// Resolves with that route's payload ({ stored_as, ... }).
+export async function uploadVaultFile(file, { onProgress } = {}) {
+  if (shouldUploadResumably(file)) {
+    try {
+      return await uploadResumable(file, { onProgress });
+    } catch (err) {
+      if (err.response?.data?.resumable !== false) throw err;
+      localStorage.removeItem(storageKey(file));
+    }
+  }
+  const formData = new FormData();
+  formData.append('file', file);
+  const r = await axiosInstance.post('/upload/upload', formData, {
+    headers: { 'Content-Type': 'multipart/form-data' },
+    onUploadProgress: onProgress && ((e) => e.total && onProgress(e.loaded / e.total)),
+  });
+  return r.data;
+}
+
+// Resolves with the same payload as POST /upload/upload ({ stored_as, ... }).
+// onProgress(fraction) is called after every acknowledged chunk.
+export async function uploadResumable(file, { onProgress } = {}) {
+  try {
+    return await sendChunks(file, onProgress);
+  } catch (err) {
+    // the server dropped the upload (expired, or it can't continue it): start over once
+    if (err.response?.status !== 410) throw err;
+    localStorage.removeItem(storageKey(file));
+    return sendChunks(file, onProgress);
+  }
+}
+
+async function sendChunks(file, onProgress) {
+  let status = await withRetries(() => resumeOrStart(file));
+  const { upload_id: uploadId, chunk_size: chunkSize } = status;
+
+  while (!status.committed && status.offset < file.size) {
+    const index = status.next_chunk;
+    const start = index * chunkSize;
+    const chunk = file.slice(start, Math.min(start + chunkSize, file.size));
+    status = await withRetries(async () => {
+      try {
+        const r = await axiosInstance.put(`/upload/uploads/${uploadId}/chunks/${index}`, chunk, {
+          headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': String(start) },
+        });
+        return r.data;
+      } catch (err) {
+        // the server is ahead of or behind us: continue from its offset
+        if (err.response?.status === 409 && err.response.data?.next_chunk !== undefined) return err.response.data;
+        throw err;
+      }
+    });
+    if (onProgress) onProgress(status.offset / file.size);
+  }
+
+  const r = await withRetries(() => axiosInstance.post(`/upload/uploads/${uploadId}/commit`));
+  localStorage.removeItem(storageKey(file));
+  return r.data;
+}
@@ -0,0 +1,75 @@
+"""file_pages.clean_text, page_results, extracted_documents and upload_sessions
+
+Revision ID: 3f1c2a9d7b10
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+Databases created before this revision came from db.create_all(), which may
+already have made some of these tables (it never adds columns to existing
+ones), so every step checks first.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    tables = set(insp.get_table_names())
+
+    if 'clean_text' not in {c['name'] for c in insp.get_columns('file_pages')}:
+        op.add_column('file_pages', sa.Column('clean_text', sa.Text(), nullable=True))
+
+    if 'extracted_documents' not in tables:
+        op.create_table(
+            'extracted_documents',
+            sa.Column('hash', sa.String(length=64), primary_key=True),
+            sa.Column('extractor', sa.String(length=32), nullable=False),
+            sa.Column('page_count', sa.Integer(), nullable=False),
+            sa.Column('pages', sa.LargeBinary(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+
+    if 'page_results' not in tables:
+        op.create_table(
+            'page_results',
+            sa.Column('key', sa.String(length=64), primary_key=True),
+            sa.Column('tool', sa.String(length=64), nullable=False),
+            sa.Column('model', sa.String(length=100), nullable=True),
+            sa.Column('result', sa.JSON(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+
+    if 'upload_sessions' not in tables:
+        op.create_table(
+            'upload_sessions',
+            sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column('user_id', sa.String(), nullable=False),
+            sa.Column('original_file_name', sa.Text(), nullable=False),
+            sa.Column('blob_path', sa.Text(), nullable=False),
+            sa.Column('content_type', sa.Text(), nullable=False),
+            sa.Column('total_size', sa.BigInteger(), nullable=False),
+            sa.Column('chunk_size', sa.Integer(), nullable=False),
+            sa.Column('received', sa.BigInteger(), nullable=False),
+            sa.Column('hash_state', sa.LargeBinary(), nullable=False),
+            sa.Column('file_id', postgresql.UUID(as_uuid=True),
+                      sa.ForeignKey('uploaded_files.id', ondelete='SET NULL'), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('upload_sessions')
+    op.drop_table('page_results')
+    op.drop_table('extracted_documents')
+    op.drop_column('file_pages', 'clean_text')
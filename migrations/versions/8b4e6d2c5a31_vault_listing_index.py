@@ -0,0 +1,47 @@
+"""uploaded_files: listing index, non-null created_at, status_before_missing
+
+Revision ID: 8b4e6d2c5a31
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-18 09:30:00.000000
+
+The vault listing pages by (created_at, id), which needs every row to have a
+created_at. Rows from before the column had a default get the time their
+first page was stored, else the oldest upload's, so they sort at the end.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e6d2c5a31'
+down_revision: Union[str, None] = '3f1c2a9d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+
+    op.execute("""
+        UPDATE uploaded_files SET created_at = COALESCE(
+            (SELECT MIN(p.created_at) FROM file_pages p WHERE p.file_id = uploaded_files.id),
+            (SELECT MIN(u.created_at) FROM uploaded_files u),
+            CURRENT_TIMESTAMP)
+        WHERE created_at IS NULL
+    """)
+    with op.batch_alter_table('uploaded_files') as batch:
+        batch.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        if 'status_before_missing' not in {c['name'] for c in insp.get_columns('uploaded_files')}:
+            batch.add_column(sa.Column('status_before_missing', sa.Text(), nullable=True))
+
+    if 'ix_uploaded_files_user_created' not in {i['name'] for i in insp.get_indexes('uploaded_files')}:
+        op.create_index('ix_uploaded_files_user_created', 'uploaded_files', ['user_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_uploaded_files_user_created', table_name='uploaded_files')
+    with op.batch_alter_table('uploaded_files') as batch:
+        batch.drop_column('status_before_missing')
+        batch.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
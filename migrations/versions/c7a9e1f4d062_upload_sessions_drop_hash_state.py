@@ -0,0 +1,34 @@
+"""upload_sessions: drop hash_state
+
+Revision ID: c7a9e1f4d062
+Revises: 8b4e6d2c5a31
+Create Date: 2026-10-18 10:00:00.000000
+
+Resumable uploads are hashed from the committed blob now, so no running hash
+state is kept between chunks.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a9e1f4d062'
+down_revision: Union[str, None] = '8b4e6d2c5a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'hash_state' in {c['name'] for c in insp.get_columns('upload_sessions')}:
+        with op.batch_alter_table('upload_sessions') as batch:
+            batch.drop_column('hash_state')
+
+
+def downgrade() -> None:
+    # uploads in progress can't be given a hash state they never had
+    op.execute("DELETE FROM upload_sessions WHERE file_id IS NULL")
+    with op.batch_alter_table('upload_sessions') as batch:
+        batch.add_column(sa.Column('hash_state', sa.LargeBinary(), nullable=False, server_default=sa.text("''")))